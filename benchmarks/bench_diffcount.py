@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+'''
+bench_diffcount.py
+Copyright (C) 2009 Nitin Bhide (nitinbhide@gmail.com)
+
+This module is part of SVNPlot (http://code.google.com/p/svnplot) and is released under
+the New BSD License: http://www.opensource.org/licenses/bsd-license.php
+--------------------------------------------------------------------------------------
+
+Microbenchmark of the diff line counting (svnlogclient.getDiffLineCountDict) against the
+earlier implementation (unicode conversion of the complete diff + StringIO + prefix checks).
+
+usage : bench_diffcount.py [diff size in MB] [repeat count]
+'''
+
+import sys
+import os
+import time
+import random
+import tempfile
+import logging
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'svnplot'))
+
+from svnlogclient import getDiffLineCountDict
+from util import makeunicode
+
+
+def getDiffLineCountDictOld(diff_log):
+    '''
+    earlier implementation of getDiffLineCountDict (for comparison)
+    '''
+    diff_log = makeunicode(diff_log)
+    diffio = StringIO(diff_log)
+    addlnCount = 0
+    dellnCount = 0
+    curfile = None
+    diffCountDict = dict()
+    newfilediffstart = 'Index: '
+    newfilepropdiffstart = 'Property changes on: '
+    for diffline in diffio:
+        diffline = diffline.rstrip()
+        if(diffline.find(newfilediffstart) == 0):
+            if(curfile != None):
+                diffCountDict[curfile] = (addlnCount, dellnCount)
+            addlnCount = 0
+            dellnCount = 0
+            logging.debug(diffline)
+            curfile = u'/' + diffline[len(newfilediffstart):]
+        elif(diffline.find(newfilepropdiffstart) == 0):
+            if(curfile != None):
+                diffCountDict[curfile] = (addlnCount, dellnCount)
+            curfile = u'/' + diffline[len(newfilepropdiffstart):]
+            if(curfile not in diffCountDict):
+                diffCountDict[curfile] = (0, 0)
+        elif(diffline.find('---') == 0 or diffline.find('+++') == 0 or diffline.find('@@') == 0 or diffline.find('===') == 0):
+            continue
+        elif(diffline.find('-') == 0):
+            dellnCount = dellnCount + 1
+        elif(diffline.find('+') == 0):
+            addlnCount = addlnCount + 1
+
+    if(curfile != None):
+        diffCountDict[curfile] = (addlnCount, dellnCount)
+    return(diffCountDict)
+
+
+def makeDiff(sizemb, seed=1):
+    '''
+    create synthetic svn diff output of approximately given size.
+    '''
+    rnd = random.Random(seed)
+    parts = []
+    size = 0
+    fileno = 0
+    while size < sizemb * 1024 * 1024:
+        fileno = fileno + 1
+        lines = ['Index: trunk/src/module%d/file%d.c\n' % (fileno % 50, fileno),
+                 '=' * 67 + '\n',
+                 '--- trunk/src/module%d/file%d.c\t(revision 100)\n' % (fileno % 50, fileno),
+                 '+++ trunk/src/module%d/file%d.c\t(revision 101)\n' % (fileno % 50, fileno)]
+        for hunk in range(rnd.randint(1, 5)):
+            lines.append('@@ -%d,7 +%d,8 @@\n' % (hunk * 100, hunk * 100))
+            for lineno in range(rnd.randint(5, 40)):
+                prefix = rnd.choice(' +-')
+                lines.append('%s    value = compute(value, %d); /* %s */\n' %
+                             (prefix, lineno, 'x' * rnd.randint(0, 40)))
+        chunk = ''.join(lines)
+        parts.append(chunk)
+        size = size + len(chunk)
+    return(''.join(parts))
+
+
+def timeit(func, arg, repeat):
+    best = None
+    result = None
+    for idx in range(0, repeat):
+        starttime = time.time()
+        result = func(arg)
+        elapsed = time.time() - starttime
+        if(best == None or elapsed < best):
+            best = elapsed
+    return(best, result)
+
+
+def RunMain():
+    sizemb = 50
+    repeat = 3
+    if(len(sys.argv) > 1):
+        sizemb = int(sys.argv[1])
+    if(len(sys.argv) > 2):
+        repeat = int(sys.argv[2])
+
+    diff_log = makeDiff(sizemb)
+    sizemb = len(diff_log) / (1024.0 * 1024.0)
+    print "diff size : %.1f MB, %d lines" % (sizemb, diff_log.count('\n'))
+
+    oldtime, oldresult = timeit(getDiffLineCountDictOld, diff_log, repeat)
+    print "old (unicode + StringIO)  : %.3f sec (%.1f MB/s)" % (oldtime, sizemb / oldtime)
+    newtime, newresult = timeit(getDiffLineCountDict, diff_log, repeat)
+    print "new (bytes)               : %.3f sec (%.1f MB/s)" % (newtime, sizemb / newtime)
+    assert(newresult == oldresult)
+
+    fd, diffpath = tempfile.mkstemp(suffix='.diff')
+    os.write(fd, diff_log)
+    os.close(fd)
+    try:
+        def countfile(path):
+            with open(path, 'rb') as difffile:
+                return(getDiffLineCountDict(difffile))
+        filetime, fileresult = timeit(countfile, diffpath, repeat)
+        print "new (streamed from file)  : %.3f sec (%.1f MB/s)" % (filetime, sizemb / filetime)
+        assert(fileresult == oldresult)
+    finally:
+        os.unlink(diffpath)
+    print "speedup : %.2fx" % (oldtime / newtime)
+
+if(__name__ == "__main__"):
+    RunMain()
@@ -0,0 +1,585 @@
+'''
+svndumpiter.py
+Copyright (C) 2009 Nitin Bhide (nitinbhide@gmail.com)
+
+This module is part of SVNPlot (http://code.google.com/p/svnplot) and is released under
+the New BSD License: http://www.opensource.org/licenses/bsd-license.php
+--------------------------------------------------------------------------------------
+
+Iterator over the revisions in a 'svnadmin dump' stream. Revision properties, changed paths,
+node kinds, copy from information, mime-types and line counts are derived directly from the
+dump records. Hence no calls to the repository are required.
+
+The dump is parsed incrementally (one record at a time) and file contents are never kept in memory.
+For line count computations only the 'hash' of every line of the current file versions is kept in
+memory. Older versions of files (which may be required later as 'copy from' source) are moved
+to a temporary sqlite database.
+Dumps created with '--deltas' option are not supported.
+'''
+
+import logging
+import os
+import tempfile
+import sqlite3
+import difflib
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from svnofflinelog import SVNOfflineRevLog
+from util import *
+
+READ_CHUNK_SIZE = 64 * 1024
+# line hashes are stored in array('l'). C long is 32 bit on 64 bit windows while hash() is 64 bit.
+# Hence the hashes are masked to fit in 32 bits on all platforms.
+LINEHASH_MASK = 0x7fffffff
+
+
+class SVNDumpError(Exception):
+    pass
+
+
+def difflinecount(oldlines, newlines):
+    '''
+    compute number of lines added and deleted between two versions of file. oldlines and newlines
+    are sequences of line hashes.
+    '''
+    # skip the common lines at the start and end of the file. Typically only few lines
+    # in the middle are changed. Hence this reduces the work done by SequenceMatcher
+    start = 0
+    oldend = len(oldlines)
+    newend = len(newlines)
+    while start < oldend and start < newend and oldlines[start] == newlines[start]:
+        start = start + 1
+    while oldend > start and newend > start and oldlines[oldend - 1] == newlines[newend - 1]:
+        oldend = oldend - 1
+        newend = newend - 1
+
+    added = 0
+    deleted = 0
+    if(start == oldend or start == newend):
+        added = newend - start
+        deleted = oldend - start
+    else:
+        matcher = difflib.SequenceMatcher(
+            None, oldlines[start:oldend], newlines[start:newend], autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if(tag != 'equal'):
+                deleted = deleted + (i2 - i1)
+                added = added + (j2 - j1)
+    return(added, deleted)
+
+
+class SVNDumpNode(object):
+
+    '''
+    one version of a file or directory. Same node object is shared between the paths when a
+    path is copied without modifications.
+    '''
+    __slots__ = ('kind', 'props', 'lines', 'linecount', 'blobid')
+
+    def __init__(self, kind, props, lines=None):
+        self.kind = kind
+        self.props = props
+        self.lines = lines
+        self.linecount = 0
+        if(lines != None):
+            self.linecount = len(lines)
+        self.blobid = None
+
+
+class SVNDumpPathHistory(object):
+
+    '''
+    changes of one path. revs/nodes are the revisions in which path is changed and the node after
+    the change. subtreerevs/links are the revisions in which the path is copied (link is the
+    (copy from path, copy from revision)) or deleted (link is None). These apply to the paths
+    inside the directory also.
+    '''
+    __slots__ = ('revs', 'nodes', 'subtreerevs', 'links')
+
+    def __init__(self):
+        self.revs = []
+        self.nodes = []
+        self.subtreerevs = []
+        self.links = []
+
+
+def _lastindex(revs, revno):
+    '''
+    index of the last revision in sorted list 'revs' which is less than or same as revno (or last
+    index if revno is None). Returns -1 if there is no such revision.
+    '''
+    if(revno == None):
+        return(len(revs) - 1)
+    return(bisect_right(revs, revno) - 1)
+
+
+class SVNDumpTree(object):
+
+    '''
+    versioned tree of the repository nodes, rebuilt from the dump records. For every changed path the
+    list of (revision number, node) is kept, so that the 'copy from' sources from older revisions
+    can be found. Directory copy (e.g. branch or tag) is recorded only for the copied directory as a
+    link to the 'copy from' path and revision. Directory deletion is recorded only for the deleted
+    directory. Nodes of the paths inside these directories are found through the link when required.
+    Line hashes of the replaced file versions are stored in a temporary database.
+    '''
+
+    def __init__(self, tempdir=None):
+        self.__history = dict()
+        self.__children = dict()
+        self.__spillpath = None
+        self.__spillcon = None
+        self.__tempdir = tempdir
+        # repository root directory is not included in the dump.
+        self.setNode('', 0, SVNDumpNode('D', dict()))
+
+    def close(self):
+        if(self.__spillcon != None):
+            self.__spillcon.close()
+            self.__spillcon = None
+            os.unlink(self.__spillpath)
+
+    def getNode(self, path, revno=None):
+        '''
+        return the node at given path in given revision (or latest node if revno is None). If a parent
+        directory is copied or deleted after the last change of the path, node is taken from the
+        'copy from' path of the parent (or None if the parent is deleted).
+        '''
+        node = None
+        noderev = -1
+        hist = self.__history.get(path)
+        if(hist != None):
+            idx = _lastindex(hist.revs, revno)
+            if(idx >= 0):
+                node = hist.nodes[idx]
+                noderev = hist.revs[idx]
+        # latest copy/delete of the parent directories. In case of same revision, change of the
+        # path (or nearest parent) is used.
+        linkparent = None
+        link = None
+        parent = path
+        while(parent != ''):
+            parent = parent.rpartition('/')[0]
+            hist = self.__history.get(parent)
+            if(hist != None and len(hist.subtreerevs) > 0):
+                idx = _lastindex(hist.subtreerevs, revno)
+                if(idx >= 0 and hist.subtreerevs[idx] > noderev):
+                    noderev = hist.subtreerevs[idx]
+                    link = hist.links[idx]
+                    linkparent = parent
+        if(linkparent != None):
+            node = None
+            if(link != None):
+                srcpath, srcrevno = link
+                relpath = path[len(linkparent):].lstrip('/')
+                if(srcpath != ''):
+                    relpath = srcpath + '/' + relpath
+                node = self.getNode(relpath, srcrevno)
+        return(node)
+
+    def getLines(self, node):
+        '''
+        return the line hashes of the file node.
+        '''
+        lines = node.lines
+        if(lines == None):
+            lines = array('l')
+            if(node.blobid != None):
+                row = self.__spillcon.execute(
+                    "SELECT hashes FROM Lines WHERE id=?", (node.blobid,)).fetchone()
+                lines.fromstring(str(row[0]))
+        return(lines)
+
+    def __getHistory(self, path):
+        hist = self.__history.get(path)
+        if(hist == None):
+            hist = SVNDumpPathHistory()
+            self.__history[path] = hist
+            if(path != ''):
+                parent = path.rpartition('/')[0]
+                self.__children.setdefault(parent, set()).add(path)
+        return(hist)
+
+    def setNode(self, path, revno, node):
+        hist = self.__getHistory(path)
+        if(len(hist.nodes) > 0 and not self.sameContents(hist.nodes[-1], node)):
+            self.__spill(hist.nodes[-1])
+        if(len(hist.revs) > 0 and hist.revs[-1] == revno):
+            hist.nodes[-1] = node
+        else:
+            hist.revs.append(revno)
+            hist.nodes.append(node)
+
+    def __setSubtree(self, path, revno, link):
+        '''
+        record the copy (link is (copy from path, copy from revision)) or deletion (link is None) of
+        the directory for the paths inside it.
+        '''
+        hist = self.__getHistory(path)
+        if(len(hist.subtreerevs) > 0 and hist.subtreerevs[-1] == revno):
+            hist.links[-1] = link
+        else:
+            hist.subtreerevs.append(revno)
+            hist.links.append(link)
+
+    def sameContents(self, node1, node2):
+        '''
+        check if the contents of two file nodes are same without comparing the lines
+        '''
+        same = (node1 is node2)
+        if(not same and node1 != None and node2 != None):
+            same = (node1.lines != None and node1.lines is node2.lines) or \
+                (node1.blobid != None and node1.blobid == node2.blobid)
+        return(same)
+
+    def delete(self, path, revno):
+        '''
+        delete the path (and all its children) in the given revision. Line hashes of the changed
+        files inside the directory are moved to the temporary database.
+        '''
+        stack = list(self.__children.get(path, ()))
+        while len(stack) > 0:
+            childpath = stack.pop()
+            hist = self.__history[childpath]
+            if(len(hist.nodes) > 0):
+                self.__spill(hist.nodes[-1])
+            stack.extend(self.__children.get(childpath, ()))
+        self.setNode(path, revno, None)
+        self.__setSubtree(path, revno, None)
+
+    def copy(self, srcpath, srcrevno, destpath, revno):
+        '''
+        copy the srcpath (and all its children) from srcrevno to destpath. Returns the copied node.
+        '''
+        srcnode = self.getNode(srcpath, srcrevno)
+        if(srcnode != None):
+            self.setNode(destpath, revno, srcnode)
+            if(srcnode.kind == 'D'):
+                self.__setSubtree(destpath, revno, (srcpath, srcrevno))
+        return(srcnode)
+
+    def commit(self):
+        if(self.__spillcon != None):
+            self.__spillcon.commit()
+
+    def __spill(self, node):
+        '''
+        file node is replaced by another node. Move its line hashes to temporary database
+        '''
+        if(node != None and node.lines != None and node.blobid == None and node.linecount > 0):
+            if(self.__spillcon == None):
+                fd, self.__spillpath = tempfile.mkstemp(
+                    suffix='.db', prefix='svndump', dir=self.__tempdir)
+                os.close(fd)
+                self.__spillcon = sqlite3.connect(self.__spillpath)
+                self.__spillcon.execute("PRAGMA synchronous=OFF")
+                self.__spillcon.execute("PRAGMA journal_mode=OFF")
+                self.__spillcon.execute(
+                    "CREATE TABLE Lines(id INTEGER PRIMARY KEY, hashes BLOB)")
+            cur = self.__spillcon.execute("INSERT INTO Lines(hashes) VALUES(?)",
+                                          (buffer(node.lines.tostring()),))
+            node.blobid = cur.lastrowid
+            node.lines = None
+
+
+class SVNDumpIter(object):
+
+    '''
+    iterate over the revisions in the svnadmin dump stream. Returns SVNOfflineRevLog objects.
+    dumpfile - file object (or path of the dump file)
+    binaryext - list of binary file extensions. Line counts are not computed for these files.
+    '''
+
+    def __init__(self, dumpfile, binaryext=[], tempdir=None):
+        if(isinstance(dumpfile, basestring)):
+            dumpfile = openinputfile(dumpfile)
+        self.dumpfile = dumpfile
+        self.binaryextlist = binaryexttuple(binaryext)
+        self.tree = SVNDumpTree(tempdir)
+        self.__revprops = None
+        self.__revno = None
+        self.__changes = None
+
+    def __iter__(self):
+        return(self.next())
+
+    def next(self):
+        try:
+            while True:
+                headers = self.__readHeaders()
+                if(headers == None):
+                    break
+                if('Revision-number' in headers):
+                    if(self.__revno != None):
+                        yield self.__endRevision()
+                    self.__startRevision(headers)
+                elif('Node-path' in headers):
+                    self.__addNode(headers)
+                elif('SVN-fs-dump-format-version' in headers):
+                    if(int(headers['SVN-fs-dump-format-version']) > 3):
+                        raise SVNDumpError, "unsupported dump format version %s" % headers[
+                            'SVN-fs-dump-format-version']
+                else:
+                    # skip the contents of unknown records (e.g. UUID)
+                    self.__skip(int(headers.get('Content-length', 0)))
+            if(self.__revno != None):
+                yield self.__endRevision()
+        finally:
+            self.tree.close()
+
+    def __readHeaders(self):
+        '''
+        read the header block of the next record. Returns None at the end of dump.
+        '''
+        headers = dict()
+        while True:
+            line = self.dumpfile.readline()
+            if(line == ''):
+                # end of file
+                if(len(headers) > 0):
+                    return(headers)
+                return(None)
+            line = line.rstrip('\n')
+            if(line == ''):
+                if(len(headers) > 0):
+                    return(headers)
+                continue
+            key, sep, value = line.partition(': ')
+            headers[key] = value
+
+    def __skip(self, length):
+        while length > 0:
+            data = self.dumpfile.read(min(length, READ_CHUNK_SIZE))
+            if(data == ''):
+                raise SVNDumpError, "unexpected end of dump"
+            length = length - len(data)
+
+    def __readProps(self, length):
+        '''
+        read the properties block. Returns the dictionary of properties and list of deleted
+        properties (for incremental properties)
+        '''
+        data = self.dumpfile.read(length)
+        if(len(data) != length):
+            raise SVNDumpError, "unexpected end of dump"
+        props = dict()
+        deleted = []
+        pos = 0
+        while True:
+            end = data.index('\n', pos)
+            line = data[pos:end]
+            pos = end + 1
+            if(line == 'PROPS-END'):
+                break
+            tag, keylen = line.split(' ', 1)
+            keylen = int(keylen)
+            key = data[pos:pos + keylen]
+            pos = pos + keylen + 1
+            if(tag == 'K'):
+                end = data.index('\n', pos)
+                vallen = int(data[pos:end].split(' ', 1)[1])
+                pos = end + 1
+                props[key] = data[pos:pos + vallen]
+                pos = pos + vallen + 1
+            elif(tag == 'D'):
+                deleted.append(key)
+        return(props, deleted)
+
+    def __readText(self, length):
+        '''
+        read the file contents and return the array of line hashes. Contents are read in chunks
+        and only line hashes are stored.
+        '''
+        lines = array('l')
+        partial = ''
+        while length > 0:
+            data = self.dumpfile.read(min(length, READ_CHUNK_SIZE))
+            if(data == ''):
+                raise SVNDumpError, "unexpected end of dump"
+            length = length - len(data)
+            chunklines = data.split('\n')
+            chunklines[0] = partial + chunklines[0]
+            partial = chunklines.pop()
+            lines.extend([hash(line) & LINEHASH_MASK for line in chunklines])
+        if(partial != ''):
+            # last line is without newline. Its hash should be different from same line
+            # with the newline.
+            lines.append(hash((partial,)) & LINEHASH_MASK)
+        return(lines)
+
+    def __startRevision(self, headers):
+        self.__revno = int(headers['Revision-number'])
+        self.__revprops = dict()
+        self.__changes = OrderedDict()
+        proplen = int(headers.get('Prop-content-length', 0))
+        if(proplen > 0):
+            self.__revprops, deleted = self.__readProps(proplen)
+        self.__skip(int(headers.get('Content-length', proplen)) - proplen)
+
+    def __endRevision(self):
+        revno = self.__revno
+        revprops = self.__revprops
+        date = None
+        if('svn:date' in revprops):
+            date = svndate2seconds(revprops['svn:date'])
+        changed_paths = [self.__changedPath(change)
+                         for change in self.__changes.values()]
+        self.tree.commit()
+        self.__revno = None
+        self.__changes = None
+        logging.debug("dump revision %d : %d changed paths" %
+                      (revno, len(changed_paths)))
+        return(SVNOfflineRevLog(revno, makeunicode(revprops.get('svn:author')), date,
+                                revprops.get('svn:log', ''), changed_paths))
+
+    def __addNode(self, headers):
+        path = headers['Node-path'].strip('/')
+        action = headers['Node-action']
+        kind = headers.get('Node-kind')
+        if(kind != None):
+            kind = 'D' if kind == 'dir' else 'F'
+        revno = self.__revno
+
+        proplen = int(headers.get('Prop-content-length', 0))
+        textlen = headers.get('Text-content-length')
+        if(headers.get('Text-delta') == 'true'):
+            raise SVNDumpError, "dump file created with --deltas option is not supported (path %s revision %d)" % (
+                path, revno)
+        props = None
+        deletedprops = []
+        if(proplen > 0):
+            props, deletedprops = self.__readProps(proplen)
+        lines = None
+        if(textlen != None):
+            textlen = int(textlen)
+            lines = self.__readText(textlen)
+        else:
+            textlen = 0
+        self.__skip(int(headers.get('Content-length', proplen + textlen)) - proplen - textlen)
+
+        change = self.__changes.get(path)
+        if(change == None):
+            change = dict(path=path, action=None, before=self.tree.getNode(path),
+                          copyfrom_path=None, copyfrom_revision=None)
+            self.__changes[path] = change
+
+        if(action == 'delete' or action == 'replace'):
+            if(self.tree.getNode(path) == None):
+                logging.warn("deleted path %s not found in revision %d" %
+                             (path, revno))
+            self.tree.delete(path, revno)
+            if(change['action'] == 'A'):
+                # path added and deleted in same revision. Ignore it.
+                del self.__changes[path]
+                return
+            change['action'] = 'D'
+
+        if(action == 'add' or action == 'replace'):
+            basenode = None
+            copyfrom_path = headers.get('Node-copyfrom-path')
+            if(copyfrom_path != None):
+                copyfrom_path = copyfrom_path.strip('/')
+                copyfrom_rev = int(headers['Node-copyfrom-rev'])
+                basenode = self.tree.copy(
+                    copyfrom_path, copyfrom_rev, path, revno)
+                if(basenode == None):
+                    logging.warn("copy source %s@%d not found for %s" %
+                                 (copyfrom_path, copyfrom_rev, path))
+                change['copyfrom_path'] = copyfrom_path
+                change['copyfrom_revision'] = copyfrom_rev
+            if(kind == None and basenode != None):
+                kind = basenode.kind
+            if(change['action'] == 'D' or action == 'replace'):
+                change['action'] = 'R'
+            else:
+                change['action'] = 'A'
+            self.__updateNode(path, kind, basenode, props, deletedprops,
+                              lines, headers.get('Prop-delta') == 'true')
+        elif(action == 'change'):
+            basenode = self.tree.getNode(path)
+            if(basenode == None):
+                raise SVNDumpError, "changed path %s not found in revision %d" % (
+                    path, revno)
+            if(change['action'] == None):
+                change['action'] = 'M'
+            self.__updateNode(path, basenode.kind, basenode, props, deletedprops,
+                              lines, headers.get('Prop-delta') == 'true')
+
+    def __updateNode(self, path, kind, basenode, props, deletedprops, lines, propdelta):
+        '''
+        set the new node for the path, with the properties and contents from the record. Contents
+        and properties not in the record are taken from basenode.
+        '''
+        node = basenode
+        if(props != None or lines != None or basenode == None or basenode.kind != kind):
+            newprops = dict()
+            if(basenode != None and (props == None or propdelta)):
+                newprops.update(basenode.props)
+            if(props != None):
+                newprops.update(props)
+                for key in deletedprops:
+                    newprops.pop(key, None)
+            if(kind == 'F'):
+                if(lines == None and basenode != None):
+                    lines = self.tree.getLines(basenode)
+                elif(lines == None):
+                    lines = array('l')
+            else:
+                lines = None
+            node = SVNDumpNode(kind, newprops, lines)
+        self.tree.setNode(path, self.__revno, node)
+
+    def __isBinary(self, path, node):
+        '''
+        detect if the file node is binary file using the file extension or svn:mime-type
+        property (same as svnlogclient)
+        '''
+        binary = path.endswith(self.binaryextlist)
+        if(binary == False):
+            mimetype = node.props.get('svn:mime-type')
+            if(mimetype != None and isTextMimeType(mimetype) == False):
+                binary = True
+            elif('svn:special' in node.props):
+                # symbolic links
+                binary = True
+        return(binary)
+
+    def __changedPath(self, change):
+        '''
+        create the changed path dictionary (as required by SVNOfflineRevLog) with the path type
+        and line counts from the nodes before and after the change.
+        '''
+        path = makeunicode(change['path'])
+        action = change['action']
+        before = change['before']
+        after = self.tree.getNode(change['path'])
+        node = after
+        if(action == 'D'):
+            node = before
+        pathtype = 'F'
+        if(node != None and node.kind == 'D'):
+            pathtype = 'D'
+        added = 0
+        deleted = 0
+        binary = False
+        if(pathtype == 'F' and node != None):
+            binary = self.__isBinary(path, node)
+            if(binary == False):
+                if(action == 'A' or (action == 'R' and (before == None or before.kind != 'F'))):
+                    added = after.linecount
+                elif(action == 'D'):
+                    deleted = before.linecount
+                elif(not self.tree.sameContents(before, after)):
+                    added, deleted = difflinecount(
+                        self.tree.getLines(before), self.tree.getLines(after))
+
+        copyfrom_path = change['copyfrom_path']
+        if(copyfrom_path != None):
+            copyfrom_path = u'/' + makeunicode(copyfrom_path)
+        path = u'/' + path
+        if(pathtype == 'D'):
+            path = path + u'/'
+        return(dict(path=path, action=action, copyfrom_path=copyfrom_path,
+                    copyfrom_revision=change['copyfrom_revision'], pathtype=pathtype,
+                    lc_added=added, lc_deleted=deleted, binary=binary))
@@ -19,12 +19,20 @@ import sys
 import os
 import logging
 import traceback
+import multiprocessing
 #from optparse import OptionParser
 
 import svnlogiter
 from svnlogclient import makeunicode
 from configoptparse import ConfigOptionParser
 from svnlogdb import SVNLogDB
+from svnlogpipeline import SVNLogPipeline
+from svnlogcache import SVNPathInfoCache
+from svnlogprofile import SVNProfiler
+from svndumpiter import SVNDumpIter
+from svnxmllogiter import SVNXmlLogIter
+from svnofflinelog import SVNLogDBIter, getDBRevLog
+from util import seconds2datetime
 
 BINARYFILEXT = ['doc', 'xls', 'ppt', 'docx', 'xlsx', 'pptx', 'dot', 'dotx', 'ods', 'odm', 'odt', 'ott', 'pdf',
                 'o', 'a', 'obj', 'lib', 'dll', 'so', 'exe',
@@ -40,27 +48,69 @@ class SVNLog2Sqlite:
     def __init__(self, svnrepopath, sqlitedbpath, verbose=False, **kwargs):
         username = kwargs.pop('username', None)
         password = kwargs.pop('password', None)
+        numworkers = kwargs.pop('numworkers', 1)
+        maxretry = kwargs.pop('maxretry', 5)
+        # record the repository responses in the archive file or replay them from the archive
+        recordpath = kwargs.pop('record', None)
+        replaypath = kwargs.pop('replay', None)
+        propbatchdepth = kwargs.pop('propbatchdepth', 0)
+        bulk = kwargs.pop('bulk', False)
+        # report time zone for the local commit time columns (None means keep the existing time zone)
+        timezone = kwargs.pop('timezone', None)
         logging.info("Repo url : " + svnrepopath)
         self.svnclient = svnlogiter.SVNLogClient(
-            svnrepopath, BINARYFILEXT, username=username, password=password)
-        self.db = SVNLogDB(dbpath=sqlitedbpath)
+            svnrepopath, BINARYFILEXT, username=username, password=password, numworkers=numworkers,
+            maxretry=maxretry, archivepath=replaypath or recordpath, replay=(replaypath != None),
+            propbatchdepth=propbatchdepth)
+        self.db = SVNLogDB(dbpath=sqlitedbpath, bulk=bulk, timezone=timezone)
+        self.pathinfocache = SVNPathInfoCache(
+            sqlitedbpath, kwargs.pop('pathcache_size', 100000))
+        self.svnclient.setPathInfoCache(self.pathinfocache)
+        self.db.setPathInfoCache(self.pathinfocache)
+        # timings of repository calls and database operations (written to json file given
+        # with 'profile' option)
+        self.profiler = None
+        profilepath = kwargs.pop('profile', None)
+        if(profilepath != None):
+            self.profiler = SVNProfiler(profilepath)
+            self.svnclient.setProfiler(self.profiler)
+            self.db.setProfiler(self.profiler)
         self.verbose = verbose
         self.commit_after_numrev = kwargs.pop('commit_after_numrev', 10)
         self.filediff = kwargs.pop('filediff', False)
+        self.pipeline_workers = kwargs.pop('pipeline_workers', 0)
+        # dummy entries for copied/deleted directories require the earlier revisions in the same
+        # database. Hence these are disabled when converting the revision shards.
+        self.add_dummy = kwargs.pop('add_dummy', True)
+        # bounds of the adaptive revision log batch size (see SVNRevLogIter)
+        self.logbatch_min = kwargs.pop('logbatch_min', 1)
+        self.logbatch_max = kwargs.pop('logbatch_max', 500)
+        self.logbatch_maxpaths = kwargs.pop('logbatch_maxpaths', 50000)
+        self.revcount = 0
+        self.lastrevno = 0
         if self.commit_after_numrev < 1:
             self.commit_after_numrev = 1
 
-    def convert(self, svnrevstartdate, svnrevenddate, bUpdLineCount=True, maxtrycount=3):
+    def convert(self, svnrevstartdate, svnrevenddate, bUpdLineCount=True, maxtrycount=3, revrange=None):
+        '''
+        convert the revisions between start and end dates. If revrange (tuple of start and end
+        revision number) is given, then convert only that revision range. In case of errors,
+        conversion is tried again (upto 'maxtrycount' times) from the last stored revision.
+        Returns True if all the revisions are converted successfully.
+        '''
         # First check if this a full conversion or a partial conversion
         self.db.connect()
-        self.CreateTables()
+        success = False
         for trycount in range(0, maxtrycount):
             try:
-                laststoredrev = self.getLastStoredRev()
                 rootUrl = self.svnclient.getRootUrl()
                 self.printVerbose("Root url found : %s" % rootUrl)
-                (startrevno, endrevno) = self.svnclient.findStartEndRev(
-                    svnrevstartdate, svnrevenddate)
+                if(revrange == None):
+                    # start and end revisions are found only once.
+                    revrange = self.svnclient.findStartEndRev(
+                        svnrevstartdate, svnrevenddate)
+                (startrevno, endrevno) = revrange
+                laststoredrev = self.getLastStoredRev()
                 startrevno = max(startrevno, laststoredrev + 1)
                 if startrevno <= endrevno:
                     self.printVerbose(
@@ -68,22 +118,35 @@ class SVNLog2Sqlite:
                     self.ConvertRevs(startrevno, endrevno, bUpdLineCount)
                     # every thing is ok. Commit the changes.
                     self.db.commit()
+                success = True
+                break
             except Exception, expinst:
                 logging.exception("Found Error")
                 self.svnexception_handler(expinst)
                 print "Trying again (%d)" % (trycount + 1)
 
         self.closedb()
+        self.printVerbose(self.pathinfocache.statsString())
+        return(success)
 
     def closedb(self):
+        # read only connection of path info cache is closed first, since the journal mode cannot
+        # be changed at the end of bulk load while other connections are open.
+        self.pathinfocache.close()
+        self.db.endBulkLoad()
         self.db.close()
+        self.svnclient.close()
+        if(self.profiler != None):
+            self.profiler.writeSummary()
 
     def svnexception_handler(self, expinst):
         '''
         decide to continue or exit on the svn exception.
         '''
-        self.db.rollback()
-        print "Found Error. Rolled back recent changes"
+        # changes of the failed revision are already rolled back (see _addRevLog). Commit the
+        # revisions converted before the error, so that next try continues from the failed revision.
+        self.db.commit()
+        print "Found Error. Rolled back changes of the failed revision"
         # print "Error type %s" % type(expinst)
         if(isinstance(expinst, AssertionError)):
             exit(1)
@@ -110,61 +173,96 @@ class SVNLog2Sqlite:
             logging.info("Updating revision from %d to %d" %
                          (startrev, endrev))
             svnloglist = svnlogiter.SVNRevLogIter(
-                self.svnclient, startrev, endrev, bUseFileDiff=self.filediff)
-            revcount = 0
-            lc_updated = 'N'
-            if(bUpdLineCount == True):
-                lc_updated = 'Y'
-            lastrevno = 0
-            bAddDummy = True
+                self.svnclient, startrev, endrev, bUseFileDiff=self.filediff,
+                mincachesize=self.logbatch_min, maxcachesize=self.logbatch_max,
+                maxchangedpaths=self.logbatch_maxpaths)
+            self.revcount = 0
+            self.lastrevno = 0
+            if(self.profiler != None):
+                self.profiler.setTotalRevisions(endrev - startrev + 1)
+
+            if(self.pipeline_workers > 0):
+                self.__convertRevsPipelined(svnloglist, bUpdLineCount)
+            else:
+                for revlog in svnloglist:
+                    self._addRevLog(revlog, bUpdLineCount, self.add_dummy)
 
-            for revlog in svnloglist:
-                logging.debug("Revision author:%s" % revlog.author)
-                logging.debug("Revision date:%s" % revlog.date)
-                logging.debug("Revision msg:%s" % revlog.message)
-                revcount = revcount + 1
+            if(self.verbose == False):
+                print "Number revisions converted : %d (Rev no : %d)" % (self.revcount, self.lastrevno)
 
-                addedfiles, changedfiles, deletedfiles = revlog.changedFileCount()
-                if(revlog.isvalid() == True):
-                    logging.debug("Adding revision %s files (%d, %d, %d)" % (
-                        revlog.revno, addedfiles, changedfiles, deletedfiles))
-                    self.db.addRevision(
-                        revlog, addedfiles, changedfiles, deletedfiles)
-
-                    for change in revlog.getDiffLineCount(bUpdLineCount):
-                        self.db.addRevisionDetails(
-                            revlog.revno, change, lc_updated)
-
-                    if(bUpdLineCount == True and bAddDummy == True):
-                        # dummy entries may add additional added/deleted file
-                        # entries.
-                        (addedfiles1, deletedfiles1) = self.addDummyLogDetail(
-                            revlog)
-                        addedfiles = addedfiles + addedfiles1
-                        deletedfiles = deletedfiles + deletedfiles1
-                        self.db.updateNumFiles(
-                            revlog.revno, addedfiles, deletedfiles)
-
-                        # print "%d : %s : %s : %d : %d " % (revlog.revno,
-                        # filename, changetype, linesadded, linesdeleted)
-                    lastrevno = revlog.revno
-                    # commit after every 10 revisions or number revisions is
-                    # less than 10, commit after every revision
-                    if(revcount % self.commit_after_numrev == 0):
-                        self.db.commit()
-                        self.printVerbose(
-                            "Number revisions converted : %d (Rev no : %d)" % (revcount, lastrevno))
-                logging.debug(
-                    "Number revisions converted : %d (Rev no : %d)" % (revcount, lastrevno))
+    def __convertRevsPipelined(self, svnloglist, bUpdLineCount):
+        '''
+        fetch the revision logs, query the line counts and write to the database in
+        parallel stages. Revisions are still written to the database in revision order.
+        '''
+        def enrich(revlog):
+            revlog.fetchDetails(bUpdLineCount)
 
-            if(self.verbose == False):
-                print "Number revisions converted : %d (Rev no : %d)" % (revcount, lastrevno)
+        def write(revlog):
+            self._addRevLog(revlog, bUpdLineCount, self.add_dummy)
+
+        def progress(pipeline):
+            self.printVerbose(pipeline.formatStats())
+
+        pipeline = SVNLogPipeline(
+            svnloglist, enrich, write, numworkers=self.pipeline_workers)
+        pipeline.run(progress)
+        self.printVerbose(pipeline.formatStats())
 
-    def __createRevFileListForDir(self, revno, dirname):
+    def _addRevLog(self, revlog, bUpdLineCount, bAddDummy=True):
         '''
-        create the file list for a revision in a temporary table.
+        add the revision and its change details to the database.
         '''
-        self.db.createRevFileListForDir(revno, dirname)
+        logging.debug("Revision author:%s" % revlog.author)
+        logging.debug("Revision date:%s" % revlog.date)
+        logging.debug("Revision msg:%s" % revlog.message)
+        self.revcount = self.revcount + 1
+        lc_updated = 'N'
+        if(bUpdLineCount == True):
+            lc_updated = 'Y'
+
+        addedfiles, changedfiles, deletedfiles = revlog.changedFileCount()
+        if(revlog.isvalid() == True):
+            logging.debug("Adding revision %s files (%d, %d, %d)" % (
+                revlog.revno, addedfiles, changedfiles, deletedfiles))
+            # revision is added inside a savepoint. In case of errors only the changes of this
+            # revision are rolled back and earlier revisions can still be committed.
+            self.db.savepoint('svnrevision')
+            try:
+                self.db.addRevision(
+                    revlog, addedfiles, changedfiles, deletedfiles)
+
+                self.db.addRevisionDetails(
+                    revlog.revno, revlog.getDiffLineCount(bUpdLineCount), lc_updated)
+
+                if(bUpdLineCount == True and bAddDummy == True):
+                    # dummy entries may add additional added/deleted file
+                    # entries.
+                    (addedfiles1, deletedfiles1) = self.addDummyLogDetail(
+                        revlog)
+                    addedfiles = addedfiles + addedfiles1
+                    deletedfiles = deletedfiles + deletedfiles1
+                    self.db.updateNumFiles(
+                        revlog.revno, addedfiles, deletedfiles)
+
+                    # print "%d : %s : %s : %d : %d " % (revlog.revno,
+                    # filename, changetype, linesadded, linesdeleted)
+                self.db.updateLiveTree(revlog.revno)
+            except:
+                self.db.rollbackToSavepoint('svnrevision')
+                raise
+            self.db.releaseSavepoint('svnrevision')
+            self.lastrevno = revlog.revno
+            if(self.profiler != None):
+                self.profiler.addRevision(addedfiles + changedfiles + deletedfiles)
+            # commit after every 10 revisions or number revisions is
+            # less than 10, commit after every revision
+            if(self.revcount % self.commit_after_numrev == 0):
+                self.db.commit()
+                self.printVerbose(
+                    "Number revisions converted : %d (Rev no : %d)" % (self.revcount, self.lastrevno))
+        logging.debug(
+            "Number revisions converted : %d (Rev no : %d)" % (self.revcount, self.lastrevno))
 
     def addDummyLogDetail(self, revlog):
         '''
@@ -195,39 +293,329 @@ class SVNLog2Sqlite:
                 for deleted_dir in deleted_dirlist:
                     deletedfiles = deletedfiles + \
                         self.db.addDummyDeletionDetails(
-                            revlog.revno, deleted_dir.filepath())
+                            revlog.revno, deleted_dir.filepath_unicode())
 
         return(addedfiles, deletedfiles)
 
-    def UpdateLineCountData(self):
-        self.initdb()
+    def UpdateLineCountData(self, chunksize=1000):
+        '''
+        update the line count data of the revisions converted without line count (i.e. SVNLogDetail
+        rows with lc_updated='N'). Rows are processed in chunks of 'chunksize' rows and updated rows
+        are committed after every 'commit_after_numrev' revisions. Hence the update can be stopped
+        and started again at any time. Dummy entries for copied/deleted directories are created
+        after the line counts of all the earlier revisions are updated.
+        '''
+        self.db.connect()
         try:
-            self.__updateLineCountData()
+            self.__updateLineCountData(chunksize)
+            # line counts of the earlier revisions are changed. Hence live tree is rebuilt after
+            # the dummy entries are created.
+            self.db.invalidateLiveTree()
+            self.__updateDummyLogDetails()
+            self.db.rebuildLiveTree()
         except Exception, expinst:
             logging.exception("Error %s" % expinst)
+            self.db.rollback()
             print "Error %s" % expinst
-        self.closedb()
+        finally:
+            # line counts updated so far are committed (e.g. if stopped with Ctrl-C)
+            self.closedb()
 
-    def __updateLineCountData(self):
+    def __updateLineCountData(self, chunksize):
         '''Update the line count data in SVNLogDetail where lc_update flag is 'N'.
         This function is to be used with incremental update of only 'line count' data.
         '''
-        # first create temporary table from SVNLogDetail where only the lc_updated status is 'N'
-        # Set the autocommit on so that update cursor inside the another cursor
-        # loop works.
-
-        for revno, changedpath, changetype in self.getRevsLineCountNotUpdated():
-            linesadded = 0
-            linesdeleted = 0
-            self.printVerbose(
-                "getting diff count for %d:%s" % (revno, changedpath))
+        rootUrl = self.svnclient.getRootUrl()
+        self.printVerbose("Root url found : %s" % rootUrl)
+        # path types are required to find the revisions with copied/deleted directories.
+        self.__updateUnknownPathTypes()
+        self.db.addDummyUpdatePending()
+        self.revcount = 0
+        lastrowid = 0
+        while True:
+            rows = self.db.getLineCountNotUpdated(lastrowid, chunksize)
+            if(len(rows) == 0):
+                break
+            lastrowid = rows[-1][0]
+            revrows = dict()
+            for row in rows:
+                revrows.setdefault(row[1], []).append(row)
+            self.__updateLineCountChunk(revrows)
+            self.db.commit()
+            self.printVerbose("Line count updated for %d revisions (Rev no : %d)" %
+                              (self.revcount, rows[-1][1]))
 
-            linesadded, linesdeleted = self.svnclient.getDiffLineCountForPath(
-                revno, changedpath, changetype)
-            self.updateLineCount(revno, changedpath, linesadded, linesdeleted)
+        if(self.verbose == False):
+            print "Line count updated for %d revisions" % self.revcount
 
+    def __updateUnknownPathTypes(self):
+        '''
+        check the path types which are not known (e.g. converted from 'svn log --xml' output of older
+        subversion servers) with the repository. Deleted paths are checked in the previous revision.
+        '''
+        rows = self.db.getUnknownPathTypes()
+        if(len(rows) == 0):
+            return
+        self.printVerbose("Checking path types of %d paths" % len(rows))
+        pathrevs = []
+        for rowid, revno, path, changetype, copyfrompath in rows:
+            if(changetype == 'D'):
+                revno = revno - 1
+            pathrevs.append((path, revno))
+        dirflags = self.svnclient.getDirectoryFlags(pathrevs)
+        unknown = [pathrev for pathrev in pathrevs if pathrev not in dirflags]
+        isdirs = self.svnclient.mapParallel(lambda pathrev: self.svnclient.isDirectory(pathrev[1], pathrev[0]), unknown)
+        dirflags.update(zip(unknown, isdirs))
+        self.db.updatePathTypes([(rowid, revno, path, copyfrompath, 'D' if dirflags[pathrev] else 'F')
+                                 for (rowid, revno, path, changetype, copyfrompath), pathrev in zip(rows, pathrevs)])
         self.db.commit()
 
+    def __updateLineCountChunk(self, revrows):
+        '''
+        compute the line counts of one chunk of rows. revrows is dictionary of revno -> list of rows.
+        Revision logs are fetched in batches and line counts are computed in parallel in the
+        pipeline. Updates are written in revision order.
+        '''
+        revnos = sorted(revrows)
+
+        def getrevlogs():
+            svnloglist = svnlogiter.SVNRevLogIter(
+                self.svnclient, revnos[0], revnos[-1], bUseFileDiff=self.filediff,
+                mincachesize=self.logbatch_min, maxcachesize=self.logbatch_max,
+                maxchangedpaths=self.logbatch_maxpaths)
+            for revlog in svnloglist:
+                if(revlog.revno in revrows):
+                    # path types are already stored in the database.
+                    revlog.setPathTypes(dict([(path, pathtype) for rowid, revno, path, changetype, pathtype
+                                              in revrows[revlog.revno]]))
+                    yield revlog
+
+        def enrich(revlog):
+            revlog.fetchDetails(True)
+
+        def write(revlog):
+            linecounts = dict([(change.filepath(), (change.lc_added(), change.lc_deleted()))
+                               for change in revlog.getDiffLineCount(True)])
+            updates = []
+            for rowid, revno, path, changetype, pathtype in revrows.pop(revlog.revno):
+                if(path in linecounts):
+                    linesadded, linesdeleted = linecounts[path]
+                    updates.append((linesadded, linesdeleted, rowid))
+                else:
+                    logging.warning("Line count not found for %s (Rev no : %d)" % (path, revno))
+            self.db.updateLineCounts(updates)
+            self.revcount = self.revcount + 1
+            if(self.profiler != None):
+                self.profiler.addRevision(len(updates))
+            if(self.revcount % self.commit_after_numrev == 0):
+                self.db.commit()
+
+        numworkers = self.pipeline_workers
+        if(numworkers < 1):
+            numworkers = self.svnclient.numworkers
+        pipeline = SVNLogPipeline(getrevlogs(), enrich, write, numworkers=numworkers)
+        pipeline.run()
+        for revno in revrows:
+            logging.warning("Revision log not found for revision %d. Line count not updated" % revno)
+
+    def __updateDummyLogDetails(self):
+        '''
+        create the dummy entries for copied/deleted directories of the revisions for which the line
+        count data is updated.
+        '''
+        for revno in self.db.getDummyUpdatePending():
+            revlog = getDBRevLog(self.db, revno)
+            self.db.deleteDummyDetails(revno)
+            addedfiles, changedfiles, deletedfiles = revlog.changedFileCount()
+            (addedfiles1, deletedfiles1) = self.addDummyLogDetail(revlog)
+            self.db.updateNumFiles(
+                revno, addedfiles + addedfiles1, deletedfiles + deletedfiles1)
+            self.db.removeDummyUpdatePending(revno)
+            self.db.commit()
+            self.printVerbose("Dummy entries updated for revision %d" % revno)
+
+    def printVerbose(self, msg):
+        logging.info(msg)
+        if(self.verbose == True):
+            print msg
+
+
+class SVNOffline2Sqlite(SVNLog2Sqlite):
+
+    '''
+    convert the revision logs from an 'offline' source (e.g. svnadmin dump file) to the sqlite
+    database. revlogiter is an iterable returning SVNOfflineRevLog objects. No calls are made
+    to the repository. Revisions must be in revision order if line counts are updated (since the dummy
+    entries for branches/tags are computed from earlier revisions)
+    '''
+
+    def __init__(self, revlogiter, sqlitedbpath, verbose=False, **kwargs):
+        self.revlogiter = revlogiter
+        self.svnclient = None
+        self.db = SVNLogDB(dbpath=sqlitedbpath, bulk=kwargs.pop('bulk', False),
+                           timezone=kwargs.pop('timezone', None))
+        # in case of sharded conversion, bulk load is finished after all the shards are merged.
+        self.finish_bulk = kwargs.pop('finish_bulk', True)
+        self.profiler = None
+        self.verbose = verbose
+        self.commit_after_numrev = max(1, kwargs.pop('commit_after_numrev', 10))
+        self.revcount = 0
+        self.lastrevno = 0
+
+    def convert(self, svnrevstartdate, svnrevenddate, bUpdLineCount=True):
+        '''
+        convert the revisions. Returns True if all the revisions are converted successfully.
+        '''
+        self.db.connect()
+        success = False
+        try:
+            laststoredrev = self.getLastStoredRev()
+            startdate = None
+            enddate = None
+            if(svnrevstartdate != None):
+                startdate = seconds2datetime(svnrevstartdate)
+            if(svnrevenddate != None):
+                enddate = seconds2datetime(svnrevenddate)
+            self.printVerbose("Conversion started")
+            self.revcount = 0
+            self.lastrevno = 0
+            for revlog in self.revlogiter:
+                # revisions before the last stored revision are still read from the source
+                # since offline sources (e.g. dump file) have to be read sequentially.
+                if(revlog.revno <= laststoredrev):
+                    continue
+                if(revlog.isvalid() == True):
+                    if(startdate != None and revlog.date < startdate):
+                        continue
+                    if(enddate != None and revlog.date > enddate):
+                        continue
+                self._addRevLog(revlog, bUpdLineCount)
+            self.db.commit()
+            success = True
+            if(self.verbose == False):
+                print "Number revisions converted : %d (Rev no : %d)" % (self.revcount, self.lastrevno)
+        except Exception, expinst:
+            logging.exception("Found Error")
+            # only the changes of failed revision are rolled back (see _addRevLog)
+            self.db.commit()
+            print "Found Error. Rolled back changes of the failed revision"
+            print "Error %s" % expinst
+        self.closedb()
+        return(success)
+
+    def closedb(self):
+        if(self.finish_bulk == True):
+            self.db.endBulkLoad()
+        self.db.close()
+
+
+def convertShard(shardargs):
+    '''
+    convert one revision shard into its own database. Called in the worker process of
+    SVNSharded2Sqlite
+    '''
+    svnrepopath, shardpath, startrevno, endrevno, bUpdLineCount, kwargs = shardargs
+    if(kwargs.get('profile') != None):
+        # every shard writes its own profile
+        kwargs = dict(kwargs)
+        kwargs['profile'] = "%s.shard%d-%d" % (kwargs['profile'], startrevno, endrevno)
+    try:
+        conv = SVNLog2Sqlite(svnrepopath, shardpath, add_dummy=False, **kwargs)
+        if(conv.convert(None, None, bUpdLineCount, revrange=(startrevno, endrevno)) == False):
+            raise RuntimeError, "conversion of revisions %d-%d failed" % (
+                startrevno, endrevno)
+    except SystemExit:
+        # svnexception_handler exits on fatal errors. Report the error to the coordinator
+        # process instead of terminating the worker process.
+        raise RuntimeError, "conversion of revisions %d-%d failed" % (
+            startrevno, endrevno)
+    return(shardpath)
+
+
+class SVNSharded2Sqlite(object):
+
+    '''
+    convert the revisions using multiple worker processes. The revision range is split into
+    'shards' and each shard is converted by a worker process into its own sqlite database
+    (without the dummy entries for copied/deleted directories). Shards are merged into the
+    target database in the revision order as soon as they are ready. Path ids are remapped and
+    the dummy entries are created during the merge (see SVNOffline2Sqlite).
+    Total number of repository connections is processes * numworkers.
+    '''
+
+    def __init__(self, svnrepopath, sqlitedbpath, verbose=False, **kwargs):
+        self.svnrepopath = svnrepopath
+        self.sqlitedbpath = sqlitedbpath
+        self.verbose = verbose
+        self.processes = kwargs.pop('processes', multiprocessing.cpu_count())
+        self.shardsize = kwargs.pop('shardsize', 0)
+        # remaining options are passed to SVNLog2Sqlite in the worker processes
+        self.kwargs = kwargs
+
+    def getShards(self, startrevno, endrevno):
+        '''
+        split the revision range into list of (start, end) revision ranges. By default range is
+        split into 4 shards per process, so that the processes remain busy even if some shards
+        take longer than others.
+        '''
+        shardsize = self.shardsize
+        if(shardsize <= 0):
+            numshards = self.processes * 4
+            shardsize = (endrevno - startrevno + numshards) / numshards
+        shardsize = max(1, shardsize)
+        return [(revno, min(revno + shardsize - 1, endrevno))
+                for revno in range(startrevno, endrevno + 1, shardsize)]
+
+    def getShardPath(self, startrevno, endrevno):
+        return("%s.shard%d-%d" % (self.sqlitedbpath, startrevno, endrevno))
+
+    def convert(self, svnrevstartdate, svnrevenddate, bUpdLineCount=True):
+        db = SVNLogDB(dbpath=self.sqlitedbpath)
+        db.connect()
+        laststoredrev = db.getLastStoredRev()
+        db.close()
+
+        replaypath = self.kwargs.get('replay')
+        svnclient = svnlogiter.SVNLogClient(self.svnrepopath, BINARYFILEXT, username=self.kwargs.get('username'),
+                                            password=self.kwargs.get('password'),
+                                            archivepath=replaypath or self.kwargs.get('record'),
+                                            replay=(replaypath != None))
+        (startrevno, endrevno) = svnclient.findStartEndRev(
+            svnrevstartdate, svnrevenddate)
+        svnclient.close()
+        startrevno = max(startrevno, laststoredrev + 1)
+        if(startrevno > endrevno):
+            print "No new revisions to convert"
+            return
+
+        bulk = self.kwargs.get('bulk', False)
+        timezone = self.kwargs.get('timezone')
+        shards = self.getShards(startrevno, endrevno)
+        self.printVerbose("Converting revisions %d to %d in %d shards using %d processes" %
+                          (startrevno, endrevno, len(shards), self.processes))
+        shardargs = [(self.svnrepopath, self.getShardPath(start, end), start, end, bUpdLineCount, self.kwargs)
+                     for start, end in shards]
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            # imap returns the shards in order. Hence each shard is merged as soon as it and all
+            # earlier shards are converted while the workers continue with the later shards.
+            for shardpath in pool.imap(convertShard, shardargs):
+                self.printVerbose("Merging %s" % shardpath)
+                conv = SVNOffline2Sqlite(SVNLogDBIter([shardpath]), self.sqlitedbpath, verbose=self.verbose,
+                                         bulk=bulk, finish_bulk=False, timezone=timezone)
+                if(conv.convert(None, None, bUpdLineCount) == False):
+                    print "Error in merging %s. Stopping the conversion" % shardpath
+                    break
+                os.unlink(shardpath)
+        finally:
+            pool.terminate()
+            pool.join()
+            if(bulk == True):
+                db = SVNLogDB(dbpath=self.sqlitedbpath, bulk=True)
+                db.connect()
+                db.endBulkLoad()
+                db.close()
+
     def printVerbose(self, msg):
         logging.info(msg)
         if(self.verbose == True):
@@ -280,7 +668,9 @@ def getquotedurl(url):
 
 
 def RunMain():
-    usage = "usage: %prog [options] <svnrepo root url> <sqlitedbpath>"
+    usage = "usage: %prog [options] <svnrepo root url> <sqlitedbpath>\n" + \
+        "       %prog [options] --dump <dumpfile> <sqlitedbpath>\n" + \
+        "       %prog [options] --xmllog <xmllogfile> <sqlitedbpath>"
     parser = ConfigOptionParser(usage)
     parser.set_defaults(updlinecount=False)
 
@@ -298,10 +688,46 @@ def RunMain():
                       help="Commit to sqlite database after given number of revisions (Default 10)")
     parser.add_option("", "--filediff", dest="filediff", default=False, action="store_true",
                       help="Force use file diff to calculate line count (will be slow)")
+    parser.add_option("", "--pipeline", dest="pipeline_workers", default=0, action="store", type="int",
+                      help="Fetch logs, compute line counts and write the database in parallel stages using given number of line count workers (Default 0 i.e. disabled)")
+    parser.add_option("-w", "--workers", dest="numworkers", default=1, action="store", type="int",
+                      help="Number of parallel repository connections used for line count computation (Default 1)")
+    parser.add_option("", "--logbatch", dest="logbatch_max", default=500, action="store", type="int",
+                      help="Maximum number of revision logs queried from the repository in one call. Batch size is adjusted based on the query time (Default 500)")
+    parser.add_option("", "--logbatchpaths", dest="logbatch_maxpaths", default=50000, action="store", type="int",
+                      help="Maximum number of changed paths expected in one batch of revision logs (Default 50000)")
+    parser.add_option("", "--dump", dest="dumpfile", default=None, action="store", type="string",
+                      help="Read the revisions from 'svnadmin dump' file (can be gzip compressed, '-' for standard input) instead of the repository. Line counts are always extracted.")
+    parser.add_option("", "--xmllog", dest="xmllogfile", default=None, action="store", type="string",
+                      help="Read the revisions from 'svn log --xml -v' output file instead of the repository. Line counts are not extracted (they can be updated later).")
+    parser.add_option("", "--retry", dest="maxretry", default=5, action="store", type="int",
+                      help="Number of times a repository call failing with network error is retried. Delay between the retries is doubled every time starting with 1 second (Default 5)")
+    parser.add_option("", "--record", dest="record", default=None, action="store", type="string",
+                      help="Record the responses of the repository calls in the given archive file (to be used later with --replay)")
+    parser.add_option("", "--replay", dest="replay", default=None, action="store", type="string",
+                      help="Replay the responses of the repository calls from the archive file created with --record. Repository is not accessed.")
+    parser.add_option("", "--propbatch", dest="propbatchdepth", default=0, action="store", type="int",
+                      help="Query the properties (for binary file detection) of all the changed files of a revision in one recursive call if the files are at most given number of levels below their common parent directory (Default 0 i.e. disabled)")
+    parser.add_option("", "--profile", dest="profile", default=None, action="store", type="string",
+                      help="Record the time taken by repository calls and database operations and write the summary to given json file. Progress with ETA is printed on stderr.")
+    parser.add_option("", "--bulk", dest="bulk", default=False, action="store_true",
+                      help="Bulk load mode for initial import. Some indices are created only at the end and changes are not synced to the disk (database may get corrupted if the computer crashes)")
+    parser.add_option("", "--timezone", dest="timezone", default=None, action="store", type="string",
+                      help="Time zone for the commit date, weekday and hour statistics. 'local', 'UTC', offset like '+05:30' or time zone name (requires pytz). (Default : time zone of the existing database or 'local')")
+    parser.add_option("", "--backfill", dest="backfill", default=False, action="store_true",
+                      help="Update the line counts of the revisions converted earlier without -l option. New revisions are not converted. Can be stopped and restarted.")
+    parser.add_option("", "--shards", dest="processes", default=0, action="store", type="int",
+                      help="Split the revisions in shards and convert them in given number of worker processes. Each process uses --workers repository connections (Default 0 i.e. disabled)")
 
     (options, args) = parser.parse_args()
 
-    if(len(args) < 2):
+    if(options.dumpfile != None):
+        convertOffline(options, args, options.dumpfile, SVNDumpIter(
+            options.dumpfile, BINARYFILEXT), True)
+    elif(options.xmllogfile != None):
+        convertOffline(options, args, options.xmllogfile,
+                       SVNXmlLogIter(options.xmllogfile), False)
+    elif(len(args) < 2):
         print "Invalid number of arguments. Use svnlog2sqlite.py --help to see the details."
     else:
         svnrepopath = args[0]
@@ -322,8 +748,8 @@ def RunMain():
         print "Updating the subversion log"
         print "Repository : " + svnrepopath
         print "SVN Log database filepath : %s" % sqlitedbpath
-        print "Extract Changed Line Count : %s" % options.updlinecount
-        if(not options.updlinecount):
+        print "Extract Changed Line Count : %s" % (options.updlinecount or options.backfill)
+        if(not options.updlinecount and not options.backfill):
             print "\t\tplease use -l option. if you want to extract linecount information."
         if(svnrevstartdate):
             print "Repository startdate: %s" % (svnrevstartdate)
@@ -340,10 +766,66 @@ def RunMain():
 
         filediff = options.filediff
         conv = None
-        conv = SVNLog2Sqlite(svnrepopath, sqlitedbpath, verbose=options.verbose,
-                             username=options.username, password=options.password,
-                             commit_after_numrev=options.commit_after_numrev, filediff=filediff)
+        if(options.backfill == True):
+            conv = SVNLog2Sqlite(svnrepopath, sqlitedbpath, verbose=options.verbose,
+                                 username=options.username, password=options.password,
+                                 commit_after_numrev=options.commit_after_numrev, filediff=filediff,
+                                 numworkers=options.numworkers, pipeline_workers=options.pipeline_workers,
+                                 logbatch_max=options.logbatch_max, logbatch_maxpaths=options.logbatch_maxpaths,
+                                 maxretry=options.maxretry, record=options.record, replay=options.replay,
+                                 profile=options.profile,
+                                 propbatchdepth=options.propbatchdepth, timezone=options.timezone)
+            conv.UpdateLineCountData()
+            return
+        if(options.processes > 0):
+            conv = SVNSharded2Sqlite(svnrepopath, sqlitedbpath, verbose=options.verbose,
+                                     username=options.username, password=options.password,
+                                     commit_after_numrev=options.commit_after_numrev, filediff=filediff,
+                                     numworkers=options.numworkers, pipeline_workers=options.pipeline_workers,
+                                     logbatch_max=options.logbatch_max, logbatch_maxpaths=options.logbatch_maxpaths,
+                                     maxretry=options.maxretry, record=options.record, replay=options.replay,
+                                     profile=options.profile, propbatchdepth=options.propbatchdepth,
+                                     bulk=options.bulk, processes=options.processes, timezone=options.timezone)
+        else:
+            conv = SVNLog2Sqlite(svnrepopath, sqlitedbpath, verbose=options.verbose,
+                                 username=options.username, password=options.password,
+                                 commit_after_numrev=options.commit_after_numrev, filediff=filediff,
+                                 numworkers=options.numworkers, pipeline_workers=options.pipeline_workers,
+                                 logbatch_max=options.logbatch_max, logbatch_maxpaths=options.logbatch_maxpaths,
+                                 maxretry=options.maxretry, record=options.record, replay=options.replay,
+                                 profile=options.profile,
+                                 propbatchdepth=options.propbatchdepth, bulk=options.bulk, timezone=options.timezone)
         conv.convert(svnrevstartdate, svnrevenddate, options.updlinecount)
 
+def convertOffline(options, args, filepath, revlogiter, bUpdLineCount):
+    '''
+    convert the revision logs from offline source file (e.g. dump file specified with --dump
+    option or xml log specified with --xmllog option)
+    '''
+    if(len(args) < 1):
+        print "Invalid number of arguments. Use svnlog2sqlite.py --help to see the details."
+        return
+    sqlitedbpath = args[0]
+    svnrevstartdate = None
+    svnrevenddate = None
+    if(len(args) > 2):
+        svnrevstartdate = parse_svndate(args[1])
+        svnrevenddate = parse_svndate(args[2])
+
+    print "Updating the subversion log from file : %s" % filepath
+    print "SVN Log database filepath : %s" % sqlitedbpath
+    if(options.enablelogging == True):
+        logfile = getLogfileName(sqlitedbpath)
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(levelname)s %(message)s',
+                            filename=logfile,
+                            filemode='w')
+        print "Debug Logging to file %s" % logfile
+
+    conv = SVNOffline2Sqlite(revlogiter, sqlitedbpath, verbose=options.verbose,
+                             commit_after_numrev=options.commit_after_numrev, bulk=options.bulk,
+                             timezone=options.timezone)
+    conv.convert(svnrevstartdate, svnrevenddate, bUpdLineCount)
+
 if(__name__ == "__main__"):
     RunMain()
@@ -0,0 +1,380 @@
+'''
+svnlogarchive.py
+Copyright (C) 2009 Nitin Bhide (nitinbhide@gmail.com)
+
+This module is part of SVNPlot (http://code.google.com/p/svnplot) and is released under
+the New BSD License: http://www.opensource.org/licenses/bsd-license.php
+--------------------------------------------------------------------------------------
+
+Record/replay of the repository calls made by SVNLogClient. In 'record' mode, responses of
+the pysvn client calls (log, diff, info2, proplist, cat, list and export) are stored in a local
+archive file. In 'replay' mode, calls are answered from the archive without connecting to the
+repository (e.g. for re-creating the svnlog database with a new schema or for benchmarking the
+conversion without a server).
+
+Archive is an sqlite database.
+   SVNObjects(objectid, data) - zlib compressed responses. objectid is sha1 of the response. Hence
+      identical responses (e.g. same properties of many files) are stored only once.
+   SVNCalls(callkey, objectid) - callkey is sha1 of the method name and the arguments.
+   SVNLogEntries(url, detailed, revno, objectid) and SVNLogRanges(url, detailed, startrevno, endrevno) -
+      log entries are stored per revision along with the revision ranges covered by the recorded log
+      calls. Hence log queries can be replayed even if the batch sizes are different (see SVNRevLogIter).
+
+Replay requires the same repository url and the same options affecting the repository calls (e.g.
+--filediff) as the recording run.
+'''
+
+import logging
+import threading
+import sqlite3
+import hashlib
+import zlib
+import cPickle
+
+from util import isPathNotFoundError
+
+try:
+    import pysvn
+except:
+    pass
+
+# repository calls stored in the archive.
+ARCHIVED_CALLS = ('log', 'diff', 'info2', 'proplist', 'cat', 'list', 'export')
+
+# pysvn enumerations which can appear in the arguments and responses
+PYSVN_ENUMS = (('node_kind', ('none', 'file', 'dir', 'unknown')),
+               ('opt_revision_kind', ('unspecified', 'number', 'date', 'committed', 'previous',
+                                      'base', 'working', 'head')),
+               ('depth', ('unknown', 'exclude', 'empty', 'files', 'immediates', 'infinity')))
+
+# log call arguments for which the log entries can be assembled from the stored revisions.
+LOG_RANGE_ARGS = set(['revision_start', 'revision_end', 'limit', 'discover_changed_paths'])
+
+# commit the archive after these many new responses
+ARCHIVE_COMMIT_COUNT = 20
+
+
+class SVNArchiveMissError(RuntimeError):
+    pass
+
+
+def getEnumName(value):
+    '''
+    return (enumeration name, value name) of a pysvn enumeration value or None
+    '''
+    for enumname, names in PYSVN_ENUMS:
+        enumtype = getattr(pysvn, enumname, None)
+        for name in names:
+            member = getattr(enumtype, name, None)
+            if(member is not None and type(member) is type(value) and member == value):
+                return((enumname, name))
+    return(None)
+
+
+def encodeValue(value, keymode=False):
+    '''
+    convert the pysvn responses/arguments to python built in types, so that they can be pickled.
+    In keymode unicode strings are converted to utf-8 (to get same key for str and unicode paths).
+    '''
+    if(value is None or isinstance(value, (bool, int, long, float, str))):
+        return(value)
+    if(isinstance(value, unicode)):
+        if(keymode):
+            return(value.encode('utf-8'))
+        return(value)
+    if(isinstance(value, list)):
+        return(('L', [encodeValue(item, keymode) for item in value]))
+    if(isinstance(value, tuple)):
+        return(('T', [encodeValue(item, keymode) for item in value]))
+    if(isinstance(value, type(pysvn.Revision(pysvn.opt_revision_kind.head)))):
+        kindname = getEnumName(value.kind)[1]
+        number = None
+        date = None
+        if(kindname == 'number'):
+            number = value.number
+        elif(kindname == 'date'):
+            date = value.date
+        return(('R', kindname, number, date))
+    if(isinstance(value, pysvn.PysvnDictBase)):
+        return(('P', value.__class__.__name__, encodeValue(dict(value.items()), keymode)))
+    if(isinstance(value, dict)):
+        return(('D', [(encodeValue(key, keymode), encodeValue(item, keymode)) for key, item in value.items()]))
+    enumname = getEnumName(value)
+    if(enumname != None):
+        return(('E',) + enumname)
+    logging.debug("storing unknown type %s as string" % type(value))
+    return(('S', repr(value)))
+
+
+def decodeValue(value):
+    '''
+    convert the values encoded with encodeValue back to pysvn types
+    '''
+    if(not isinstance(value, tuple)):
+        return(value)
+    tag = value[0]
+    if(tag == 'L'):
+        return([decodeValue(item) for item in value[1]])
+    if(tag == 'T'):
+        return(tuple([decodeValue(item) for item in value[1]]))
+    if(tag == 'R'):
+        tag, kindname, number, date = value
+        kind = getattr(pysvn.opt_revision_kind, kindname)
+        if(kindname == 'number'):
+            return(pysvn.Revision(kind, number))
+        elif(kindname == 'date'):
+            return(pysvn.Revision(kind, date))
+        return(pysvn.Revision(kind))
+    if(tag == 'P'):
+        tag, classname, data = value
+        return(getattr(pysvn, classname)(decodeValue(data)))
+    if(tag == 'D'):
+        return(dict([(decodeValue(key), decodeValue(item)) for key, item in value[1]]))
+    if(tag == 'E'):
+        return(getattr(getattr(pysvn, value[1]), value[2]))
+    return(value[1])
+
+
+def getCallKey(name, args, kwargs):
+    '''
+    key of the repository call. Local paths (temporary directory of diff, destination path
+    of export) are not part of the key.
+    '''
+    args = list(args)
+    kwargs = dict(kwargs)
+    if(name == 'diff' and len(args) > 0):
+        args = args[1:]
+    elif(name == 'export'):
+        if(len(args) > 1):
+            del args[1]
+        kwargs.pop('dest_path', None)
+    key = repr((name, encodeValue(args, True), sorted(encodeValue(kwargs, True)[1])))
+    return(hashlib.sha1(key).hexdigest())
+
+
+def getLogRange(args, kwargs):
+    '''
+    return (url, detailed, startrevno, endrevno, limit) if the log entries for the log call can be
+    assembled from stored revisions (i.e. start and end revisions are revision numbers).
+    '''
+    if(len(args) != 1 or not set(kwargs.keys()).issubset(LOG_RANGE_ARGS)):
+        return(None)
+    startrev = kwargs.get('revision_start')
+    endrev = kwargs.get('revision_end')
+    for rev in (startrev, endrev):
+        if(rev is None or rev.kind != pysvn.opt_revision_kind.number):
+            return(None)
+    url = encodeValue(args[0], True)
+    return((url, bool(kwargs.get('discover_changed_paths', False)), startrev.number, endrev.number,
+            kwargs.get('limit', 0)))
+
+
+class SVNCallArchive(object):
+
+    '''
+    sqlite archive of the repository responses. Archive can be used from multiple threads.
+    '''
+
+    def __init__(self, archivepath):
+        self.archivepath = archivepath
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        self.__newcount = 0
+        # archive can be shared by the shard conversion processes. Hence wait for the locks.
+        self.__dbcon = sqlite3.connect(
+            archivepath, check_same_thread=False, timeout=60)
+        self.__dbcon.text_factory = str
+        self.__dbcon.execute(
+            "CREATE TABLE IF NOT EXISTS SVNObjects(objectid text PRIMARY KEY, data blob)")
+        self.__dbcon.execute(
+            "CREATE TABLE IF NOT EXISTS SVNCalls(callkey text PRIMARY KEY, objectid text)")
+        self.__dbcon.execute("CREATE TABLE IF NOT EXISTS SVNLogEntries(url text, detailed integer, revno integer, \
+                            objectid text, PRIMARY KEY(url, detailed, revno))")
+        self.__dbcon.execute("CREATE TABLE IF NOT EXISTS SVNLogRanges(url text, detailed integer, startrevno integer, \
+                            endrevno integer)")
+        self.__dbcon.commit()
+
+    def close(self):
+        with self.__lock:
+            if(self.__dbcon != None):
+                self.__dbcon.commit()
+                self.__dbcon.close()
+                self.__dbcon = None
+
+    def statsString(self):
+        return("Repository archive : hits %d, misses %d" % (self.hits, self.misses))
+
+    def get(self, callkey):
+        '''
+        return (found, encoded response) for the call key.
+        '''
+        with self.__lock:
+            row = self.__dbcon.execute("SELECT data FROM SVNCalls, SVNObjects WHERE callkey=? \
+                        and SVNCalls.objectid=SVNObjects.objectid", (callkey,)).fetchone()
+            self.__updateStats(row != None)
+            if(row == None):
+                return((False, None))
+            return((True, self.__loadObject(row[0])))
+
+    def put(self, callkey, value):
+        with self.__lock:
+            objectid = self.__storeObject(value)
+            self.__dbcon.execute(
+                "INSERT OR REPLACE INTO SVNCalls(callkey, objectid) VALUES(?,?)", (callkey, objectid))
+            self.__updateCommit()
+
+    def getLogEntries(self, logrange):
+        '''
+        return list of encoded log entries if the revision range is covered by the recorded log
+        calls. Otherwise return None.
+        '''
+        url, detailed, startrevno, endrevno, limit = logrange
+        with self.__lock:
+            row = self.__dbcon.execute("SELECT count(*) FROM SVNLogRanges WHERE url=? and detailed=? and \
+                        startrevno <= ? and endrevno >= ?", (url, detailed, min(startrevno, endrevno),
+                                                             max(startrevno, endrevno))).fetchone()
+            self.__updateStats(row[0] > 0)
+            if(row[0] == 0):
+                return(None)
+            order = 'ASC'
+            if(startrevno > endrevno):
+                order = 'DESC'
+            sqlquery = "SELECT data FROM SVNLogEntries, SVNObjects WHERE url=? and detailed=? and revno >= ? \
+                        and revno <= ? and SVNLogEntries.objectid=SVNObjects.objectid ORDER BY revno %s" % order
+            params = (url, detailed, min(startrevno, endrevno),
+                      max(startrevno, endrevno))
+            if(limit > 0):
+                sqlquery = sqlquery + " LIMIT ?"
+                params = params + (limit,)
+            return([self.__loadObject(data) for data, in self.__dbcon.execute(sqlquery, params)])
+
+    def putLogEntries(self, logrange, entries):
+        '''
+        store the log entries (list of (revno, encoded entry)) returned by the log call.
+        '''
+        url, detailed, startrevno, endrevno, limit = logrange
+        lowrevno = min(startrevno, endrevno)
+        highrevno = max(startrevno, endrevno)
+        if(limit > 0 and len(entries) >= limit):
+            # only the revisions upto the last returned revision are covered.
+            lastrevno = entries[-1][0]
+            if(startrevno <= endrevno):
+                highrevno = lastrevno
+            else:
+                lowrevno = lastrevno
+        with self.__lock:
+            for revno, value in entries:
+                objectid = self.__storeObject(value)
+                self.__dbcon.execute("INSERT OR REPLACE INTO SVNLogEntries(url, detailed, revno, objectid) \
+                            VALUES(?,?,?,?)", (url, detailed, revno, objectid))
+            # merge the overlapping and adjacent ranges.
+            params = (url, detailed, highrevno + 1, lowrevno - 1)
+            row = self.__dbcon.execute("SELECT min(startrevno), max(endrevno) FROM SVNLogRanges WHERE url=? \
+                        and detailed=? and startrevno <= ? and endrevno >= ?", params).fetchone()
+            if(row[0] != None):
+                lowrevno = min(lowrevno, row[0])
+                highrevno = max(highrevno, row[1])
+            self.__dbcon.execute("DELETE FROM SVNLogRanges WHERE url=? and detailed=? and startrevno <= ? \
+                        and endrevno >= ?", params)
+            self.__dbcon.execute("INSERT INTO SVNLogRanges(url, detailed, startrevno, endrevno) VALUES(?,?,?,?)",
+                                 (url, detailed, lowrevno, highrevno))
+            self.__updateCommit()
+
+    def __updateStats(self, found):
+        if(found):
+            self.hits = self.hits + 1
+        else:
+            self.misses = self.misses + 1
+
+    def __updateCommit(self):
+        self.__newcount = self.__newcount + 1
+        if(self.__newcount % ARCHIVE_COMMIT_COUNT == 0):
+            self.__dbcon.commit()
+
+    def __storeObject(self, value):
+        data = cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+        objectid = hashlib.sha1(data).hexdigest()
+        self.__dbcon.execute("INSERT OR IGNORE INTO SVNObjects(objectid, data) VALUES(?,?)",
+                             (objectid, sqlite3.Binary(zlib.compress(data))))
+        return(objectid)
+
+    def __loadObject(self, data):
+        return(cPickle.loads(zlib.decompress(data)))
+
+
+class SVNArchiveClient(object):
+
+    '''
+    pysvn client like object which answers the repository calls (see ARCHIVED_CALLS) from the
+    archive. If a call is not found in the archive and 'client' is given (record mode), the call
+    is made with the client and its response is added to the archive. In replay mode (client is None)
+    SVNArchiveMissError is raised for the calls not found in the archive.
+    '''
+
+    def __init__(self, archive, client=None):
+        self.archive = archive
+        self.client = client
+
+    def __getattr__(self, name):
+        if(name in ARCHIVED_CALLS):
+            def archivecall(*args, **kwargs):
+                return(self.__call(name, args, kwargs))
+            return(archivecall)
+        if(self.client == None):
+            raise AttributeError, "%s is not available in replay mode" % name
+        return(getattr(self.client, name))
+
+    def is_url(self, path):
+        if(self.client != None):
+            return(self.client.is_url(path))
+        return('://' in path)
+
+    def __call(self, name, args, kwargs):
+        logrange = None
+        if(name == 'log'):
+            logrange = getLogRange(args, kwargs)
+        if(logrange != None):
+            entries = self.archive.getLogEntries(logrange)
+            if(entries != None):
+                return([decodeValue(entry) for entry in entries])
+        else:
+            callkey = getCallKey(name, args, kwargs)
+            found, value = self.archive.get(callkey)
+            if(found):
+                return(self.__replay(name, args, kwargs, value))
+
+        if(self.client == None):
+            raise SVNArchiveMissError, "svn %s%s not found in archive %s" % (
+                name, repr(args), self.archive.archivepath)
+        try:
+            response = getattr(self.client, name)(*args, **kwargs)
+        except pysvn.ClientError, exp:
+            # 'path not found' errors are part of the response. Other errors (e.g. network errors
+            # left after the retries) are not stored, so the call is made again in the next run.
+            if(logrange == None and isPathNotFoundError(exp)):
+                self.archive.put(callkey, ('X', encodeValue(exp.args)))
+            raise
+        if(logrange != None):
+            self.archive.putLogEntries(logrange, [(entry.revision.number, encodeValue(entry))
+                                                  for entry in response])
+        else:
+            value = encodeValue(response)
+            if(name == 'export'):
+                value = ('F', open(self.__getDestPath(args, kwargs), 'rb').read(), value)
+            self.archive.put(callkey, value)
+        return(response)
+
+    def __replay(self, name, args, kwargs, value):
+        if(isinstance(value, tuple) and value[0] == 'X'):
+            raise pysvn.ClientError(*decodeValue(value[1]))
+        if(name == 'export'):
+            tag, contents, value = value
+            with open(self.__getDestPath(args, kwargs), 'wb') as destfile:
+                destfile.write(contents)
+        return(decodeValue(value))
+
+    def __getDestPath(self, args, kwargs):
+        if(len(args) > 1):
+            return(args[1])
+        return(kwargs['dest_path'])
@@ -0,0 +1,212 @@
+'''
+svnlogcache.py
+Copyright (C) 2009 Nitin Bhide (nitinbhide@gmail.com)
+
+This module is part of SVNPlot (http://code.google.com/p/svnplot) and is released under
+the New BSD License: http://www.opensource.org/licenses/bsd-license.php
+--------------------------------------------------------------------------------------
+
+Cache for the repository path information queries (e.g. is path a directory, is file
+binary) made during the conversion. Information of a path at a given revision never
+changes. Hence the results are kept in a bounded in memory LRU cache and are also
+stored in the SVNPathInfoCache table of the svnlog database, so that the re-runs of
+svnlog2sqlite donot query the repository again.
+
+SVNFilePropCache keeps the file property flags (binary, special) as intervals of revisions
+in which the file is not changed, so that the properties queried once can be reused for
+other revisions in the same interval (e.g. file deletions).
+'''
+
+import logging
+import threading
+import sqlite3
+import bisect
+from collections import OrderedDict
+
+# path information types stored in the cache
+PATHINFO_ISDIR = 'D'
+PATHINFO_BINARY = 'B'
+PATHINFO_SPECIAL = 'S'
+
+
+class SVNPathInfoCache(object):
+
+    '''
+    LRU cache of (infotype, path, revno) -> integer value backed by the SVNPathInfoCache table.
+    Lookups can be done from multiple threads. New entries are kept in the 'pending' list
+    till they are written to database by SVNLogDB (on the next commit).
+    '''
+
+    def __init__(self, dbpath=None, maxsize=100000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.diskhits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        self.__entries = OrderedDict()
+        self.__pending = dict()
+        self.__dbcon = None
+        if(dbpath != None and dbpath != ':memory:'):
+            # separate read only connection, so that lookups from worker threads donot
+            # interfere with the transactions of the main database connection.
+            self.__dbcon = sqlite3.connect(dbpath, check_same_thread=False)
+
+    def close(self):
+        with self.__lock:
+            if(self.__dbcon != None):
+                self.__dbcon.close()
+                self.__dbcon = None
+
+    def lookup(self, infotype, path, revno):
+        '''
+        return the cached value or None if the value is not in the cache
+        '''
+        key = (infotype, path, revno)
+        with self.__lock:
+            value = self.__entries.pop(key, None)
+            if(value == None):
+                value = self.__pending.get(key)
+            if(value != None):
+                self.hits = self.hits + 1
+            else:
+                value = self.__lookupdb(key)
+                if(value != None):
+                    self.diskhits = self.diskhits + 1
+                else:
+                    self.misses = self.misses + 1
+            if(value != None):
+                self.__add(key, value)
+        return(value)
+
+    def update(self, infotype, path, revno, value):
+        '''
+        add the new value in the cache. It is also added to pending entries list so that it
+        is stored in the database.
+        '''
+        key = (infotype, path, revno)
+        with self.__lock:
+            self.__add(key, value)
+            self.__pending[key] = value
+
+    def popPendingEntries(self):
+        '''
+        return the list of (path, revno, infotype, value) tuples not yet written to database.
+        '''
+        with self.__lock:
+            entries = [(path, revno, infotype, value)
+                       for (infotype, path, revno), value in self.__pending.iteritems()]
+            self.__pending.clear()
+        return(entries)
+
+    def statsString(self):
+        return("Path info cache : hits %d, database hits %d, misses %d" % (self.hits, self.diskhits, self.misses))
+
+    def __add(self, key, value):
+        self.__entries[key] = value
+        while len(self.__entries) > self.maxsize:
+            self.__entries.popitem(last=False)
+
+    def __lookupdb(self, key):
+        value = None
+        if(self.__dbcon != None):
+            infotype, path, revno = key
+            try:
+                row = self.__dbcon.execute("SELECT value FROM SVNPathInfoCache WHERE path=? and revno=? and infotype=?",
+                                           (path, revno, infotype)).fetchone()
+                if(row != None):
+                    value = row[0]
+            except sqlite3.Error:
+                # table is not yet created or database is locked. Treat it as cache miss.
+                logging.debug("path info cache lookup failed for %s@%d" %
+                              (path, revno))
+        return(value)
+
+
+class SVNFilePropCache(object):
+
+    '''
+    interval cache of file property flags (binary, special). Properties of a file can change only in
+    the revisions where the file (or one of its parent directories) is changed. The revisions are
+    registered (in revision order) with addChanges before any lookups for that revision. Each
+    path is then split into intervals between its changes and the flags queried for any revision
+    in the interval are valid for the whole interval. Lookups for revisions before the first
+    registered revision are always cache misses.
+    '''
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        self.__reset(None)
+
+    def addChanges(self, revno, changes):
+        '''
+        register the changes of the revision. changes is list of (path, action, copied) tuples
+        (e.g. from the revision log). If the revisions are not contiguous (i.e. a revision is skipped)
+        then the intervals are not known anymore and the cache is cleared.
+        '''
+        with self.__lock:
+            if(self.__lastrevno != None and revno <= self.__lastrevno):
+                # revision already registered (e.g. conversion is restarted after error)
+                return
+            if(self.__lastrevno == None or revno != self.__lastrevno + 1):
+                self.__reset(revno)
+            self.__lastrevno = revno
+            for path, action, copied in changes:
+                path = path.rstrip('/')
+                self.__changes.setdefault(path, []).append(revno)
+                if(action == 'D' or action == 'R' or copied == True):
+                    # path may be a directory. All the files in the directory are also changed.
+                    self.__changes.setdefault(path + '/', []).append(revno)
+
+    def lookup(self, path, revno):
+        '''
+        return the (binary, special) flags of the path at revno or None if not known
+        '''
+        with self.__lock:
+            value = None
+            key = self.__getIntervalKey(path, revno)
+            if(key != None):
+                value = self.__values.get(key)
+            if(value != None):
+                self.hits = self.hits + 1
+            else:
+                self.misses = self.misses + 1
+        return(value)
+
+    def update(self, path, revno, binary, special):
+        with self.__lock:
+            key = self.__getIntervalKey(path, revno)
+            if(key != None):
+                self.__values[key] = (binary, special)
+
+    def statsString(self):
+        return("File properties cache : hits %d, misses %d" % (self.hits, self.misses))
+
+    def __reset(self, startrevno):
+        self.__startrevno = startrevno
+        self.__lastrevno = None
+        self.__changes = dict()
+        self.__values = dict()
+
+    def __getIntervalKey(self, path, revno):
+        '''
+        return (path, start revision of the interval) of the interval containing revno.
+        '''
+        if(self.__startrevno == None or revno < self.__startrevno or revno > self.__lastrevno):
+            return(None)
+        path = path.rstrip('/')
+        # last change of the path or its parent directories on or before revno
+        startrevno = self.__startrevno - 1
+        keys = [path]
+        parent = path
+        while '/' in parent:
+            parent = parent.rsplit('/', 1)[0]
+            keys.append(parent + '/')
+        for key in keys:
+            changes = self.__changes.get(key)
+            if(changes != None):
+                idx = bisect.bisect_right(changes, revno)
+                if(idx > 0):
+                    startrevno = max(startrevno, changes[idx - 1])
+        return((path, startrevno))
@@ -20,11 +20,15 @@ import getpass
 import traceback
 import types
 import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
 from os.path import normpath
 from operator import itemgetter
-from StringIO import StringIO
 
 from util import *
+from svnlogcache import PATHINFO_ISDIR, PATHINFO_BINARY, PATHINFO_SPECIAL, SVNFilePropCache
+from svnlogarchive import SVNCallArchive, SVNArchiveClient
+from svnlogprofile import SVNProfileClient
 
 try:
     import pysvn
@@ -34,98 +38,411 @@ except:
 
 SVN_HEADER_ENCODING = 'utf-8'
 
+# svn error codes of the (usually temporary) network errors. (e.g. SVN_ERR_RA_DAV_REQUEST_FAILED,
+# SVN_ERR_RA_DAV_CONN_TIMEOUT, SVN_ERR_RA_CANNOT_CREATE_SESSION, SVN_ERR_RA_SVN_CONNECTION_CLOSED,
+# SVN_ERR_RA_SVN_IO_ERROR, connection reset and timeout errors on unix and windows)
+SVN_TRANSIENT_ERRCODES = (175002, 175012, 170013, 210002, 210003, 104, 110, 730054, 730060)
+
+
+def isTransientError(exp):
+    '''
+    check if the pysvn.ClientError is a network error and hence the call can be retried.
+    (exception_style of pysvn client is 1)
+    '''
+    transient = False
+    if(len(exp.args) > 1):
+        for errmsg, code in exp.args[1]:
+            if(code in SVN_TRANSIENT_ERRCODES):
+                transient = True
+    return(transient)
+
+
+class SVNRetryClient(object):
+
+    '''
+    wrapper over pysvn.Client. Repository calls failing with network errors (see isTransientError)
+    are retried 'maxretry' times. Delay between the retries is doubled after every retry starting with
+    'retrydelay' seconds.
+    '''
+
+    def __init__(self, client, maxretry=5, retrydelay=1.0):
+        self.client = client
+        self.maxretry = maxretry
+        self.retrydelay = retrydelay
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if(callable(attr)):
+            def retrycall(*args, **kwargs):
+                return(self.__call(attr, name, args, kwargs))
+            return(retrycall)
+        return(attr)
+
+    def __call(self, func, name, args, kwargs):
+        delay = self.retrydelay
+        for trycount in range(0, self.maxretry + 1):
+            try:
+                return(func(*args, **kwargs))
+            except pysvn.ClientError, exp:
+                if(trycount >= self.maxretry or not isTransientError(exp)):
+                    raise
+                logging.warning("svn %s failed (%s). Retrying after %.1f seconds" %
+                                (name, exp.args[0], delay))
+                time.sleep(delay)
+                delay = delay * 2
+
+
+# states of the diff line counter
+DIFF_HEADER = 0
+DIFF_HUNK = 1
+DIFF_PROPS = 2
+DIFF_INDEX_PREFIX = 'Index: '
+DIFF_PROPS_PREFIX = 'Property changes on: '
+DIFF_READ_CHUNK_SIZE = 1024 * 1024
+
+
+def getFilePropFlags(propdict):
+    '''
+    return (binary, special) flags of the file from its properties dictionary.
+    Binary file is detected using same heuristic as subversion. If the file
+    has no svn:mime-type  property, or has a mime-type that is textual (e.g. text/*),
+    Subversion assumes it is text. Otherwise it is treated as binary file.
+    'special' file is a symbolic link.
+    '''
+    binary = False
+    if('svn:mime-type' in propdict):
+        # mime type is not a 'text' mime type.
+        binary = not isTextMimeType(propdict['svn:mime-type'])
+    special = 'svn:special' in propdict
+    return(binary, special)
+
+
+def getCommonParentDir(filepaths):
+    '''
+    return the common parent directory (with trailing '/') of the file paths
+    '''
+    parent = os.path.commonprefix(list(filepaths))
+    return(parent[:parent.rfind(u'/') + 1])
+
+
+def decodeDiffPath(header):
+    '''
+    decode the path from diff header line. Index line entry doesnot have '/' as start of file path.
+    Hence add the '/' so that path entries in revision log list match with the names in
+    the 'diff count' dictionary
+    '''
+    header = header.rstrip()
+    try:
+        path = header.decode(SVN_HEADER_ENCODING)
+    except UnicodeDecodeError:
+        path = header.decode('latin_1')
+    return(u'/' + path)
+
+
+class SVNDiffLineCounter(object):
+
+    '''
+    count the lines added and deleted for each file in the svn diff output. Diff is processed as
+    bytes. Only the first byte of every line is checked and only the 'Index:' and 'Property changes on:'
+    header lines are decoded. Diff can be fed in chunks, hence the complete diff need not be
+    in memory.
+    '''
+
+    def __init__(self):
+        self.diffCountDict = dict()
+        self.curfile = None
+        self.added = 0
+        self.deleted = 0
+        self.state = DIFF_HEADER
+
+    def feed(self, data, final=False):
+        '''
+        process the complete lines in data (str or any object supporting find and slicing e.g. mmap).
+        Returns the position after last processed line. If 'final' is True, then the last line
+        without newline is also processed.
+        '''
+        end = len(data)
+        find = data.find
+        added = self.added
+        deleted = self.deleted
+        state = self.state
+        pos = 0
+        while pos < end:
+            eol = find('\n', pos)
+            if(eol < 0):
+                if(final == False):
+                    break
+                eol = end
+            ch = data[pos]
+            if(ch == '+'):
+                # '+++' and '---' lines before the first '@@' line are file headers.
+                if(state == DIFF_HUNK):
+                    added = added + 1
+            elif(ch == '-'):
+                if(state == DIFF_HUNK):
+                    deleted = deleted + 1
+            elif(ch == '@'):
+                if(state == DIFF_HEADER):
+                    state = DIFF_HUNK
+            elif(ch == 'I' and data[pos:pos + len(DIFF_INDEX_PREFIX)] == DIFF_INDEX_PREFIX):
+                # diff for new file has started update the old filename.
+                self.__endFile(added, deleted)
+                self.curfile = decodeDiffPath(
+                    data[pos + len(DIFF_INDEX_PREFIX):eol])
+                logging.debug("diff of %s" % self.curfile)
+                added = 0
+                deleted = 0
+                state = DIFF_HEADER
+            elif(ch == 'P' and data[pos:pos + len(DIFF_PROPS_PREFIX)] == DIFF_PROPS_PREFIX):
+                # property modification diff has started. Ignore it.
+                self.__endFile(added, deleted)
+                self.curfile = None
+                filepath = decodeDiffPath(
+                    data[pos + len(DIFF_PROPS_PREFIX):eol])
+                # only properties are modified. there is no content change. hence
+                # set the line count to 0,0
+                if(filepath not in self.diffCountDict):
+                    self.diffCountDict[filepath] = (0, 0)
+                added = 0
+                deleted = 0
+                state = DIFF_PROPS
+            pos = eol + 1
+        self.added = added
+        self.deleted = deleted
+        self.state = state
+        return(min(pos, end))
+
+    def getDiffCountDict(self):
+        '''
+        return dictionary of filepath -> (lines added, lines deleted)
+        '''
+        # update last file stat in the dictionary.
+        self.__endFile(self.added, self.deleted)
+        self.curfile = None
+        return(self.diffCountDict)
+
+    def __endFile(self, added, deleted):
+        if(self.curfile != None):
+            self.diffCountDict[self.curfile] = (added, deleted)
+
 
 def getDiffLineCountDict(diff_log):
-    diff_log = makeunicode(diff_log)
-    diffio = StringIO(diff_log)
-    addlnCount = 0
-    dellnCount = 0
-    curfile = None
-    diffCountDict = dict()
-    newfilediffstart = 'Index: '
-    newfilepropdiffstart = 'Property changes on: '
-    for diffline in diffio:
-        # remove the newline characters near the end of line
-        diffline = diffline.rstrip()
-        if(diffline.find(newfilediffstart) == 0):
-            # diff for new file has started update the old filename.
-            if(curfile != None):
-                diffCountDict[curfile] = (addlnCount, dellnCount)
-            # reset the linecounts and current filename
-            addlnCount = 0
-            dellnCount = 0
-            # Index line entry doesnot have '/' as start of file path. Hence add the '/'
-            # so that path entries in revision log list match with the names in
-            # the 'diff count' dictionary
-            logging.debug(diffline)
-            curfile = u'/' + diffline[len(newfilediffstart):]
-        elif(diffline.find(newfilepropdiffstart) == 0):
-            # property modification diff has started. Ignore it.
-            if(curfile != None):
-                diffCountDict[curfile] = (addlnCount, dellnCount)
-            curfile = u'/' + diffline[len(newfilepropdiffstart):]
-            # only properties are modified. there is no content change. hence
-            # set the line count to 0,0
-            if(curfile not in diffCountDict):
-                diffCountDict[curfile] = (0, 0)
-        elif(diffline.find('---') == 0 or diffline.find('+++') == 0 or diffline.find('@@') == 0 or diffline.find('===') == 0):
-            continue
-        elif(diffline.find('-') == 0):
-            dellnCount = dellnCount + 1
-        elif(diffline.find('+') == 0):
-            addlnCount = addlnCount + 1
-
-    # update last file stat in the dictionary.
-    if(curfile != None):
-        diffCountDict[curfile] = (addlnCount, dellnCount)
-    return(diffCountDict)
+    '''
+    return dictionary of filepath -> (lines added, lines deleted) from svn diff output.
+    diff_log can be a str, unicode, memoryview or a file object (e.g. temporary diff file). File
+    objects and memoryviews are processed in chunks without loading the complete diff in memory.
+    '''
+    counter = SVNDiffLineCounter()
+    if(isinstance(diff_log, unicode)):
+        diff_log = diff_log.encode(SVN_HEADER_ENCODING)
+    if(hasattr(diff_log, 'read') or isinstance(diff_log, memoryview)):
+        remainder = ''
+        for chunk in iterDiffChunks(diff_log):
+            data = remainder + chunk
+            pos = counter.feed(data)
+            remainder = data[pos:]
+        counter.feed(remainder, final=True)
+    elif(diff_log):
+        counter.feed(diff_log, final=True)
+    return(counter.getDiffCountDict())
+
+
+def iterDiffChunks(diff_log):
+    '''
+    iterate over the diff contents from file object or memoryview in chunks.
+    '''
+    if(isinstance(diff_log, memoryview)):
+        for pos in range(0, len(diff_log), DIFF_READ_CHUNK_SIZE):
+            yield diff_log[pos:pos + DIFF_READ_CHUNK_SIZE].tobytes()
+    else:
+        while True:
+            chunk = diff_log.read(DIFF_READ_CHUNK_SIZE)
+            if(not chunk):
+                break
+            yield chunk
+
+
+def getDiffPathCandidates(diffpath, rooturl, repopath):
+    '''
+    possible revision log paths for a path in the 'Index:' header of revision diff. Index paths
+    are relative to the url used for the diff (i.e. svnrepourl). However, depending on subversion
+    version, paths can be full urls, url quoted or with windows path separators.
+    '''
+    paths = [diffpath.replace(u'\\', u'/')]
+    if(u'%' in diffpath):
+        paths.append(decodeDiffPath(urllib.unquote(paths[0][1:].encode(SVN_HEADER_ENCODING))))
+    for path in paths:
+        if(path[1:].startswith(rooturl + u'/')):
+            yield normurlpath(path[len(rooturl) + 1:])
+        else:
+            if(repopath):
+                yield normurlpath(repopath + path)
+            yield normurlpath(path)
+
+
+def reconcileDiffPaths(diffCountDict, logpaths, rooturl, repopath=u''):
+    '''
+    map the paths in revision diff line count dictionary to the changed paths in the revision
+    log. rooturl is repository root url and repopath is the path of svnrepourl relative to the
+    root (e.g. /trunk). Returns the dictionary of logpath -> (lines added, lines deleted) for the
+    paths which are matched. Diff paths which donot match any log path are ignored (e.g. files
+    inside a copied directory)
+    '''
+    logpaths = set(logpaths)
+    rooturl = makeunicode(rooturl.rstrip('/'))
+    repopath = makeunicode(repopath.rstrip('/'))
+    pathCountDict = dict()
+    for diffpath, linecount in diffCountDict.iteritems():
+        for logpath in getDiffPathCandidates(diffpath, rooturl, repopath):
+            if(logpath in logpaths):
+                pathCountDict[logpath] = linecount
+                break
+        else:
+            logging.debug("diff path %s not found in revision log" % diffpath)
+    return(pathCountDict)
 
 
 class SVNLogClient:
 
-    def __init__(self, svnrepourl, binaryext=[], username=None, password=None):
+    def __init__(self, svnrepourl, binaryext=[], username=None, password=None, numworkers=1, maxretry=5,
+                 archivepath=None, replay=False, propbatchdepth=0):
         self.svnrooturl = None
         self.tmppath = None
         self.username = None
         self.password = None
         self._updateTempPath()
         self.svnrepourl = urllib.unquote(svnrepourl)
-        self.svnclient = pysvn.Client()
-        self.svnclient.exception_style = 1
-        self.svnclient.callback_get_login = self.get_login
-        self.svnclient.callback_ssl_server_trust_prompt = self.ssl_server_trust_prompt
-        self.svnclient.callback_ssl_client_cert_password_prompt = self.ssl_client_cert_password_prompt
+        # pysvn.Client objects cannot be shared between threads. Hence every thread
+        # (main thread and the worker pool threads) gets its own client.
+        self.numworkers = max(1, numworkers)
+        # number of retries for the repository calls failing with network errors.
+        self.maxretry = maxretry
+        self._workerpool = None
+        self._clientlocal = threading.local()
+        self._clientlist = []
+        self._clientlock = threading.RLock()
+        self.pathinfocache = None
+        # record the repository responses into the archive or replay them from the archive
+        # (see svnlogarchive.py)
+        self.archive = None
+        self.replay = replay
+        if(archivepath != None):
+            self.archive = SVNCallArchive(archivepath)
+        self.profiler = None
+        # properties of the changed files of a revision are queried with a single recursive proplist
+        # call if the files are at most 'propbatchdepth' levels below their common parent (0 to disable)
+        self.propbatchdepth = propbatchdepth
+        self.filepropcache = None
+        if(propbatchdepth > 0):
+            self.filepropcache = SVNFilePropCache()
         self.setbinextlist(binaryext)
         self.set_user_password(username, password)
 
+    @property
+    def svnclient(self):
+        '''
+        return the pysvn client for the current thread. The client is created on first use.
+        '''
+        client = getattr(self._clientlocal, 'client', None)
+        if(client == None):
+            client = self._createSvnClient()
+            self._clientlocal.client = client
+        return(client)
+
+    def _createSvnClient(self):
+        if(self.replay == True):
+            client = SVNArchiveClient(self.archive)
+        else:
+            client = pysvn.Client()
+            client.exception_style = 1
+            client.callback_get_login = self.get_login
+            client.callback_ssl_server_trust_prompt = self.ssl_server_trust_prompt
+            client.callback_ssl_client_cert_password_prompt = self.ssl_client_cert_password_prompt
+            with self._clientlock:
+                if(self.username != None):
+                    client.set_default_username(self.username)
+                if(self.password != None):
+                    client.set_default_password(self.password)
+                self._clientlist.append(client)
+            client = SVNRetryClient(client, self.maxretry)
+            if(self.archive != None):
+                client = SVNArchiveClient(self.archive, client)
+        if(self.profiler != None):
+            client = SVNProfileClient(client, self.profiler)
+        return(client)
+
+    def setProfiler(self, profiler):
+        '''
+        set the SVNProfiler to record the timings of the repository calls. It has to be set before
+        the first repository call.
+        '''
+        self.profiler = profiler
+
+    def setPathInfoCache(self, pathinfocache):
+        '''
+        set the SVNPathInfoCache used to avoid repeated directory and binary file checks
+        '''
+        self.pathinfocache = pathinfocache
+
+    def mapParallel(self, func, items):
+        '''
+        call 'func' for every item in 'items' using the worker pool and return the list of results.
+        Results are returned in the same order as 'items' irrespective of the order in which
+        the workers finish. If there is only one worker, items are processed serially.
+        '''
+        items = list(items)
+        if(self.numworkers <= 1 or len(items) <= 1):
+            return(map(func, items))
+        with self._clientlock:
+            # mapParallel is called from multiple pipeline threads. Only one pool is created.
+            if(self._workerpool == None):
+                self._workerpool = ThreadPool(self.numworkers)
+            workerpool = self._workerpool
+        return(workerpool.map(func, items))
+
+    def close(self):
+        '''
+        stop the worker pool threads (if any) and close the archive
+        '''
+        with self._clientlock:
+            workerpool = self._workerpool
+            self._workerpool = None
+        if(workerpool != None):
+            workerpool.close()
+            workerpool.join()
+        if(self.filepropcache != None):
+            logging.info(self.filepropcache.statsString())
+        if(self.archive != None):
+            logging.info(self.archive.statsString())
+            self.archive.close()
+            self.archive = None
+
     def setbinextlist(self, binextlist):
         '''
         set extensionlist for binary files with some cleanup if required.
         '''
-        binaryextlist = []
-        for binext in binextlist:
-            binext = binext.strip()
-            binext = u'.' + binext
-            binaryextlist.append(binext)
-            binext = binext.upper()
-            binaryextlist.append(binext)
-        self.binaryextlist = tuple(binaryextlist)
+        self.binaryextlist = binaryexttuple(binextlist)
 
     def set_user_password(self, username, password):
-        if(username != None and username != u''):
-            self.username = username
-            self.svnclient.set_default_username(self.username)
-        if(password != None):
-            self.password = password
-            self.svnclient.set_default_password(self.password)
+        with self._clientlock:
+            if(username != None and username != u''):
+                self.username = username
+                for client in self._clientlist:
+                    client.set_default_username(self.username)
+            if(password != None):
+                self.password = password
+                for client in self._clientlist:
+                    client.set_default_password(self.password)
 
     def get_login(self, realm, username, may_save):
         logging.debug("This is a svnclient.callback_get_login event. ")
-        if(self.username == None):
-            self.username = raw_input("username for %s:" % realm)
-        #save = True
-        if(self.password == None):
-            self.password = getpass.getpass()
+        # worker threads may ask for login at the same time. Prompt only once.
+        with self._clientlock:
+            if(self.username == None):
+                self.username = raw_input("username for %s:" % realm)
+            #save = True
+            if(self.password == None):
+                self.password = getpass.getpass()
         if(self.username == None or self.username == ''):
             retcode = False
         else:
@@ -457,25 +774,16 @@ class SVNLogClient:
         '''
         return(filepath.endswith(self.binaryextlist))
 
-    def __isTextMimeType(self, fmimetype):
+    def __queryFileProps(self, filepath, revno):
         '''
-        check if the mime-type is a text mime-type based on the standard svn text file logic.        
-        '''
-        textMimeType = False
-        if(fmimetype.startswith('text/') or fmimetype == 'image/x-xbitmap' or fmimetype == 'image/x-xpixmap'):
-            textMimeType = True
-        return(textMimeType)
-
-    def __isBinaryFile(self, filepath, revno):
-        '''
-        detect if file is a binary file using same heuristic as subversion. If the file
-        has no svn:mime-type  property, or has a mime-type that is textual (e.g. text/*),
-        Subversion assumes it is text. Otherwise it is treated as binary file.
+        query the file properties and detect if file is a binary file and if file is a 'special'
+        file (i.e. symbolic link). Returns tuple (binary, special). Both flags are also stored
+        in the path info cache.
         '''
         logging.debug(
             "Binary file check for file <%s> revision:%d" % (filepath, revno))
         # if explicit mime-type is not found always treat the file as 'text'
-        binary = False
+        propdict = dict()
         url = self.getUrl(filepath)
         rev = pysvn.Revision(pysvn.opt_revision_kind.number, revno)
 
@@ -483,16 +791,122 @@ class SVNLogClient:
         if(len(proplist) > 0):
             assert(len(proplist) == 1)
             path, propdict = proplist[0]
-            if('svn:mime-type' in propdict):
-                fmimetype = propdict['svn:mime-type']
-                # print "found mime-type file: %s mimetype : %s" % (filepath,
-                # fmimetype)
-                if(self.__isTextMimeType(fmimetype) == False):
-                    # mime type is not a 'text' mime type.
-                    binary = True
+        binary, special = getFilePropFlags(propdict)
+        self.__updateFileProps(filepath, revno, binary, special)
+        return(binary, special)
+
+    def __updateFileProps(self, filepath, revno, binary, special):
+        if(self.pathinfocache != None):
+            self.pathinfocache.update(
+                PATHINFO_BINARY, filepath, revno, int(binary))
+            self.pathinfocache.update(
+                PATHINFO_SPECIAL, filepath, revno, int(special))
+        if(self.filepropcache != None):
+            self.filepropcache.update(filepath, revno, binary, special)
+
+    def __lookupFileProps(self, filepath, revno, infotype):
+        '''
+        return the cached binary (or special) flag of the file or None if it is not in the caches.
+        '''
+        if(self.pathinfocache != None):
+            value = self.pathinfocache.lookup(infotype, filepath, revno)
+            if(value != None):
+                return(value == 1)
+        if(self.filepropcache != None):
+            flags = self.filepropcache.lookup(filepath, revno)
+            if(flags != None):
+                binary, special = flags
+                if(infotype == PATHINFO_BINARY):
+                    return(binary)
+                return(special)
+        return(None)
 
+    def __isBinaryFile(self, filepath, revno):
+        '''
+        detect if file is a binary file using the svn:mime-type property.
+        '''
+        binary = self.__lookupFileProps(filepath, revno, PATHINFO_BINARY)
+        if(binary == None):
+            binary, special = self.__queryFileProps(filepath, revno)
         return(binary)
 
+    def isSpecialFile(self, filepath, revno):
+        '''
+        check if the file is a 'special' file (i.e. symbolic link). Contents of symbolic links
+        are not counted as lines.
+        '''
+        special = self.__lookupFileProps(filepath, revno, PATHINFO_SPECIAL)
+        if(special == None):
+            binary, special = self.__queryFileProps(filepath, revno)
+        return(special)
+
+    def addRevisionChanges(self, revno, changed_paths):
+        '''
+        register the changed paths of the revision in the file property cache (see SVNFilePropCache).
+        Revisions must be registered in revision order before querying the properties.
+        '''
+        if(self.filepropcache != None):
+            self.filepropcache.addChanges(revno, [(change['path'], change['action'],
+                                                   change.get('copyfrom_path') != None)
+                                                  for change in changed_paths])
+
+    def prefetchFileProps(self, filerevs):
+        '''
+        query the properties of the files in filerevs (list of (filepath, revno) tuples) with a single
+        recursive proplist call per revision on the common parent directory of the files and store
+        the binary/special flags in the caches. Files with binary extensions and files already in
+        the cache are skipped. If the files are more than 'propbatchdepth' levels below the
+        common parent, then proplist is called on each parent directory.
+        '''
+        if(self.filepropcache == None):
+            return
+        revfiles = dict()
+        for filepath, revno in filerevs:
+            if(not self.__isBinaryFileExt(filepath) and
+               self.__lookupFileProps(filepath, revno, PATHINFO_BINARY) == None):
+                revfiles.setdefault(revno, set()).add(filepath)
+
+        for revno, filepaths in revfiles.iteritems():
+            parentdir = getCommonParentDir(filepaths)
+            maxdepth = max([filepath[len(parentdir):].count(u'/') + 1 for filepath in filepaths])
+            if(maxdepth <= self.propbatchdepth):
+                batches = [(parentdir, pysvn.depth.infinity, filepaths)]
+            else:
+                dirfiles = dict()
+                for filepath in filepaths:
+                    dirfiles.setdefault(getCommonParentDir([filepath]), []).append(filepath)
+                batches = [(dirpath, pysvn.depth.files, dirpaths)
+                           for dirpath, dirpaths in dirfiles.iteritems()]
+            for dirpath, depth, dirpaths in batches:
+                # for a single file, the query is same as the file properties query
+                if(len(dirpaths) > 1):
+                    self.__queryDirFileProps(dirpath, revno, depth, dirpaths)
+
+    def __queryDirFileProps(self, dirpath, revno, depth, filepaths):
+        logging.debug("Properties query for %d files in <%s> revision:%d" %
+                      (len(filepaths), dirpath, revno))
+        rev = pysvn.Revision(pysvn.opt_revision_kind.number, revno)
+        url = self.getRootUrl().rstrip('/')
+        if(dirpath.rstrip(u'/') != u''):
+            # urls with trailing '/' are not canonical urls.
+            url = self.getUrl(dirpath.rstrip(u'/'))
+        try:
+            proplist = self.svnclient.proplist(url, revision=rev, depth=depth)
+        except pysvn.ClientError, exp:
+            # files will be queried individually
+            logging.debug("Properties query failed for %s : %s" % (dirpath, exp))
+            return
+        propdicts = dict()
+        for propurl, propdict in proplist:
+            propdicts[self.getUrlPath(propurl)] = propdict
+        for filepath in filepaths:
+            binary, special = getFilePropFlags(propdicts.pop(filepath, {}))
+            self.__updateFileProps(filepath, revno, binary, special)
+        # properties of other files in the directory are also valid till these files change
+        for filepath, propdict in propdicts.iteritems():
+            binary, special = getFilePropFlags(propdict)
+            self.filepropcache.update(filepath, revno, binary, special)
+
     def isBinaryFile(self, filepath, revno):
         assert(filepath is not None)
         assert(revno > 0)
@@ -506,7 +920,12 @@ class SVNLogClient:
         # if the file/dir is deleted in the current revision. Then the status needs to be checked for
         # one revision before that
         logging.debug("isDirectory: path %s revno %d" % (changepath, revno))
+        if(self.pathinfocache != None):
+            isDir = self.pathinfocache.lookup(PATHINFO_ISDIR, changepath, revno)
+            if(isDir != None):
+                return(isDir == 1)
         isDir = False
+        cacheable = True
 
         try:
             entry = self.getInfo(changepath, revno)
@@ -518,38 +937,81 @@ class SVNLogClient:
             # it is possible that changedpath is deleted (even if changetype is not 'D') and
             # doesnot exist in the revno. In this case, we will get a ClientError exception.
             # this case just return isDir as 'False' and let the processing
-            # continue
-            pass
+            # continue. Other errors (e.g. network errors) should not be cached.
+            cacheable = isPathNotFoundError(expinst)
 
+        if(self.pathinfocache != None and cacheable == True):
+            self.pathinfocache.update(
+                PATHINFO_ISDIR, changepath, revno, int(isDir))
         return(isDir)
 
+    def getDirectoryFlags(self, pathrevs):
+        '''
+        check if the paths are directories with one 'list' call per parent directory instead of one
+        'info2' call per path. pathrevs is list of (path, revno) tuples. Returns the dictionary of
+        (path, revno) -> True/False (is directory) for the paths which are found. Parent directories
+        with only one path are not queried (isDirectory requires same number of calls).
+        '''
+        dirflags = dict()
+        parentpaths = dict()
+        for path, revno in pathrevs:
+            isDir = None
+            if(self.pathinfocache != None):
+                isDir = self.pathinfocache.lookup(PATHINFO_ISDIR, path, revno)
+            if(isDir != None):
+                dirflags[(path, revno)] = (isDir == 1)
+            elif(path.rstrip(u'/') != u''):
+                parentdir = getCommonParentDir([path.rstrip(u'/')])
+                parentpaths.setdefault((parentdir, revno), []).append(path)
+
+        for (parentdir, revno), paths in parentpaths.iteritems():
+            if(len(paths) < 2):
+                continue
+            logging.debug("Directory check for %d paths in <%s> revision:%d" %
+                          (len(paths), parentdir, revno))
+            rev = pysvn.Revision(pysvn.opt_revision_kind.number, revno)
+            url = self.getRootUrl().rstrip('/')
+            if(parentdir.rstrip(u'/') != u''):
+                # urls with trailing '/' are not canonical urls.
+                url = self.getUrl(parentdir.rstrip(u'/'))
+            try:
+                entrylist = self.svnclient.list(
+                    url, revision=rev, depth=pysvn.depth.immediates)
+            except pysvn.ClientError, exp:
+                # paths will be checked individually
+                logging.debug("Directory list failed for %s : %s" % (parentdir, exp))
+                continue
+            kinds = dict()
+            for entry, lock in entrylist:
+                kinds[normurlpath(makeunicode(entry['repos_path']))] = entry['kind']
+            for path in paths:
+                kind = kinds.get(path.rstrip(u'/'))
+                if(kind != None):
+                    isDir = (kind == pysvn.node_kind.dir)
+                    dirflags[(path, revno)] = isDir
+                    if(self.pathinfocache != None):
+                        self.pathinfocache.update(
+                            PATHINFO_ISDIR, path, revno, int(isDir))
+        return(dirflags)
+
     def _getLineCount(self, filepath, revno):
         linecount = 0
 
         logging.info("Trying to get linecount for %s" % (filepath))
         rev = pysvn.Revision(pysvn.opt_revision_kind.number, revno)
         url = self.getUrl(filepath)
-        #contents = self.svnclient.cat(url, revision = rev)
-        #matches = re.findall("$", contents, re.M )
-        #linecount1 = 0
-        # if( matches != None):
-        #    linecount1 = len(matches)
-        # export the file to a tempfolder url
-        outpath = tempfile.mktemp('svnplot', dir=self.tmppath)
-
-        self.svnclient.export(
-            url, dest_path=outpath, revision=rev, ignore_externals=True, recurse=False)
-        if(not os.path.islink(outpath)):
-            # now read the file and count the lines
-            with open(outpath, 'r') as f:
-                contents = f.readlines()
-            linecount = len(contents)
+        if(not self.isSpecialFile(filepath, revno)):
+            # read the file contents directly from the repository and count the newline
+            # characters. Earlier the file was exported to temp folder and then the lines
+            # were read with readlines(). That required a disk write and lot of memory for
+            # the large files.
+            contents = self.svnclient.cat(url, revision=rev)
+            linecount = countlines(contents)
             logging.debug("%s linecount : %d" % (filepath, linecount))
         else:
             linecount = 0
             logging.debug("%s is symbolic link" % filepath)
 
-        os.unlink(outpath)
         return(linecount)
 
     def getLineCount(self, filepath, revno):
@@ -577,17 +1039,18 @@ class SVNLogClient:
             break
 
     def getRootUrl(self):
-        if(self.svnrooturl == None and self.svnclient.is_url(self.svnrepourl)):
-            # for some reason 'root_url_from_path' crashes Python interpreter
-            # for http:// urls for PySVN 1.6.3 (python 2.5)
-            # hence I need to do jump through hoops to get -- Nitin
-            #self.svnrooturl = self.svnclient.root_url_from_path(self.svnrepourl)
+        with self._clientlock:
+            if(self.svnrooturl == None and self.svnclient.is_url(self.svnrepourl)):
+                # for some reason 'root_url_from_path' crashes Python interpreter
+                # for http:// urls for PySVN 1.6.3 (python 2.5)
+                # hence I need to do jump through hoops to get -- Nitin
+                #self.svnrooturl = self.svnclient.root_url_from_path(self.svnrepourl)
 
-            # Comment this line if PySVN - root_url_from_path() function works
-            # for you.
-            self.getRootUrl2()
+                # Comment this line if PySVN - root_url_from_path() function works
+                # for you.
+                self.getRootUrl2()
 
-            logging.debug("found rooturl %s" % self.svnrooturl)
+                logging.debug("found rooturl %s" % self.svnrooturl)
 
         # if the svnrooturl is None at this point, then raise an exception
         if(self.svnrooturl == None):
@@ -612,12 +1075,42 @@ class SVNLogClient:
             url = self.getRootUrl() + urllib.pathname2url(path)
         return(url)
 
+    def getUrlPath(self, url):
+        '''
+        path relative to the repository root of the url returned by the repository calls (e.g.
+        proplist).
+        '''
+        url = urllib.unquote(makeunicode(url).encode(SVN_HEADER_ENCODING))
+        rooturl = makeunicode(self.getRootUrl().rstrip('/')).encode(SVN_HEADER_ENCODING)
+        if(url.startswith(rooturl)):
+            url = url[len(rooturl):]
+        return(normurlpath(decodeDiffPath(url.lstrip('/'))))
+
     def isRepoUrlSameAsRoot(self):
         repourl = self.svnrepourl.rstrip('/')
         rooturl = self.getRootUrl()
         rooturl = rooturl.rstrip('/')
         return(repourl == rooturl)
 
+    def getRepoPath(self):
+        '''
+        path of svnrepourl relative to the repository root (e.g. /trunk). Empty string if svnrepourl
+        is same as repository root.
+        '''
+        repourl = self.svnrepourl.rstrip('/')
+        rooturl = self.getRootUrl().rstrip('/')
+        assert(repourl.startswith(rooturl))
+        return(makeunicode(repourl[len(rooturl):]))
+
+    def getRevDiffLineCountDict(self, revno, logpaths):
+        '''
+        get the line counts of changed files in the revision with a single diff call. Returns
+        dictionary of logpath -> (lines added, lines deleted) for the log paths which can be matched
+        with the paths in the diff.
+        '''
+        diffCountDict = getDiffLineCountDict(self.getRevDiff(revno))
+        return(reconcileDiffPaths(diffCountDict, logpaths, self.getRootUrl(), self.getRepoPath()))
+
     def __iter__(self):
         from svnlogiter import SVNRevLogIter
         return(SVNRevLogIter(self, 1, self.getHeadRevNo()))
@@ -12,6 +12,159 @@ i.e. basically all database operations
 import logging
 from contextlib import closing
 import sqlite3
+from svnlogprofile import profiled
+from util import makeunicode, datetime2seconds, localtimeconverter, localtimefields
+
+# indices which are not used while adding the revisions. In bulk load mode, these are dropped and
+# created again at the end of the import (see SVNLogDB.endBulkLoad)
+BULKLOAD_INDICES = [('svnlogdtlchangepathidx', 'SVNLogDetail (changedpathid ASC)'),
+                    ('svnlogdtlcopypathidx', 'SVNLogDetail (copyfrompathid ASC)')]
+
+# sqlite settings used in bulk load mode. Changes are not synced to the disk, hence database remains
+# consistent if the process is killed but it may get corrupted in case of OS crash or power failure.
+BULKLOAD_PRAGMAS = ['journal_mode=WAL', 'synchronous=OFF', 'cache_size=-262144',
+                    'temp_store=MEMORY', 'mmap_size=1073741824']
+
+# maximum number of parameters in one 'IN' query
+MAX_QUERY_PARAMS = 500
+
+# commit time columns of SVNLog table. commitepoch is seconds since epoch. commitday (date ordinal),
+# commitweekday (0 is Sunday) and commithour are the local time in the report time zone (see SVNTimeZone
+# table). Statistics are grouped on these columns.
+COMMITTIME_COLUMNS = ['commitepoch', 'commitday', 'commitweekday', 'commithour']
+
+# snapshot of the live tree (only the paths changed after the last snapshot) is added after
+# every LIVETREE_SNAPSHOT_INTERVAL revisions.
+LIVETREE_SNAPSHOT_INTERVAL = 1000
+
+# file changes to be applied to the live tree. Deletions are applied before additions in the same
+# revision (i.e. file deleted and added again in the same revision exists after the revision)
+LIVETREE_CHANGES_QUERY = "SELECT SVNLogDetail.revno, changedpathid, SVNPaths.path, changetype, linesadded, \
+            linesdeleted FROM SVNLogDetail, SVNPaths"
+LIVETREE_CHANGES_ORDER = "ORDER BY SVNLogDetail.revno, changetype='D' DESC, SVNLogDetail.rowid"
+
+# top level path (e.g. '/trunk/' for '/trunk/src/main.c') of the SVNPaths row. Same as getTopLevelPath
+TOPLEVELPATH_SQL = "CASE WHEN instr(substr(SVNPaths.path, 2), '/') > 0 \
+            THEN substr(SVNPaths.path, 1, instr(substr(SVNPaths.path, 2), '/') + 1) ELSE SVNPaths.path END"
+
+# SVNLogDetail rows (matching the condition) aggregated on commit day, author and top level path for
+# the daily rollup table SVNDailyPathStats. Commits are the revisions with real (i.e. not dummy) entries.
+DAILYSTATS_QUERY = "SELECT commitday, authorid, (SELECT min(id) FROM SVNPaths WHERE path=toppath), commits, \
+            linesadded, linesdeleted, filesadded, filesdeleted FROM \
+            (SELECT SVNLog.commitday as commitday, SVNLog.authorid as authorid, " + TOPLEVELPATH_SQL + " as toppath, \
+            count(DISTINCT CASE WHEN entrytype IS NOT 'D' THEN SVNLogDetail.revno END) as commits, \
+            total(linesadded) as linesadded, total(linesdeleted) as linesdeleted, \
+            total(pathtype='F' and changetype='A') as filesadded, total(pathtype='F' and changetype='D') as filesdeleted \
+            FROM SVNLogDetail, SVNLog, SVNPaths WHERE SVNLog.revno=SVNLogDetail.revno \
+            and SVNPaths.id=SVNLogDetail.changedpathid and %s \
+            GROUP BY SVNLog.commitday, SVNLog.authorid, toppath)"
+DAILYSTATS_COLUMNS = ['commits', 'linesadded', 'linesdeleted', 'filesadded', 'filesdeleted']
+
+
+def getPathPrefixRange(prefix):
+    '''
+    return (start, end) such that the paths starting with 'prefix' (e.g. paths inside the directory
+    '/trunk/') are start <= path < end. Used for index range scans instead of 'like' queries.
+    '''
+    prefix = makeunicode(prefix)
+    return((prefix, prefix[:-1] + unichr(ord(prefix[-1]) + 1)))
+
+
+def getParentPath(path):
+    '''
+    return the parent directory path (with trailing '/') of the file/directory path. Returns None
+    for the root directory ('/').
+    '''
+    idx = path.rfind('/', 0, len(path) - 1)
+    if(idx < 0):
+        return(None)
+    return(path[:idx + 1])
+
+
+def getPathDepth(path):
+    '''
+    number of path components (e.g. 0 for '/', 1 for '/trunk/', 2 for '/trunk/file.txt')
+    '''
+    return(path.rstrip('/').count('/'))
+
+
+def getPathName(path):
+    '''
+    last component of the path without trailing '/'
+    '''
+    return(path.rstrip('/').rsplit('/', 1)[-1])
+
+
+def getTopLevelPath(path):
+    '''
+    return the top level directory (with trailing '/') of the path (e.g. '/trunk/' for '/trunk/src/main.c').
+    Files/directories at the top level and the root directory are returned as it is.
+    '''
+    idx = path.find('/', 1)
+    if(idx < 0):
+        return(path)
+    return(path[:idx + 1])
+
+
+def getAuthorKey(author):
+    '''
+    normalised key of the author name used for matching the author names in SVNAuthors table.
+    Author names differing only in case (e.g. 'John' and 'john') are same author.
+    '''
+    if(author == None):
+        author = u''
+    return(makeunicode(author).strip().lower())
+
+
+def hasPathHierarchy(cur):
+    '''
+    check if the path hierarchy (relpathid, depth columns of SVNPaths and SVNPathAncestors table)
+    is available in the database. Databases created by older versions are migrated when opened
+    with SVNLogDB.
+    '''
+    cur.execute(
+        "SELECT count(*) FROM sqlite_master WHERE type='table' and name='SVNPathAncestors'")
+    return(cur.fetchone()[0] > 0)
+
+
+def createSearchPathTable(cur, searchpath, tablename='SearchPaths'):
+    '''
+    create a temporary table with the ids of the paths matching the search path (i.e. paths starting
+    with searchpath). If the search path is a directory, path hierarchy is used (if available).
+    Otherwise a path range scan is used. Statistics queries can then filter the SVNLogDetail rows
+    with 'changedpathid IN (SELECT pathid FROM SearchPaths)' instead of 'like' on path.
+    '''
+    searchpath = searchpath.rstrip('%')
+    cur.execute("DROP TABLE IF EXISTS %s" % tablename)
+    cur.execute("CREATE TEMP TABLE %s(pathid INTEGER PRIMARY KEY)" % tablename)
+    if(searchpath == '' or searchpath == '/'):
+        cur.execute("INSERT INTO %s(pathid) SELECT id FROM SVNPaths" % tablename)
+    elif(searchpath.endswith('/') and hasPathHierarchy(cur)):
+        cur.execute("INSERT INTO %s(pathid) SELECT pathid FROM SVNPathAncestors, SVNPaths \
+                    WHERE SVNPaths.path=? and SVNPathAncestors.ancestorid=SVNPaths.id" % tablename,
+                    (makeunicode(searchpath),))
+    else:
+        cur.execute("INSERT INTO %s(pathid) SELECT id FROM SVNPaths WHERE path >= ? and path < ?" %
+                    tablename, getPathPrefixRange(searchpath))
+
+
+def applyLiveTreeChanges(entries, changes):
+    '''
+    apply the changes (rows of LIVETREE_CHANGES_QUERY) to the live tree entries. entries is dictionary of
+    pathid -> [path, linecount, addrevno, lastrevno, alive]
+    '''
+    for revno, pathid, path, changetype, linesadded, linesdeleted in changes:
+        entry = entries.get(pathid)
+        if(entry == None):
+            entry = [path, 0, None, revno, 0]
+            entries[pathid] = entry
+        entry[1] = entry[1] + linesadded - linesdeleted
+        entry[3] = revno
+        if(changetype == 'A' or changetype == 'R'):
+            entry[2] = revno
+            entry[4] = 1
+        elif(changetype == 'D'):
+            entry[4] = 0
 
 
 class SVNLogDB(object):
@@ -28,6 +181,23 @@ class SVNLogDB(object):
         self.connection_params = dict(**connections_params)
         self._query_cur = None
         self._upd_cur = None
+        self.pathinfocache = None
+        self.profiler = None
+        self._savepoints = []
+        # bulk load mode for initial import (see endBulkLoad)
+        self.bulkload = self.connection_params.get('bulk', False)
+        # path -> id of all the paths in SVNPaths table (see getFilePathIds)
+        self.pathidcache = dict()
+        # paths added to SVNPaths in the running transaction and the count of such paths at the
+        # start of each savepoint. Used for removing the rolled back paths from the cache.
+        self.__newpaths = []
+        self.__savepointpaths = []
+        # author key -> id of the authors in SVNAuthors table (see getAuthorId). Cleared on rollback.
+        self.authoridcache = dict()
+        # report time zone for the local commit time columns. If None, time zone stored in the
+        # database is used ('local' for new database)
+        self.timezone = self.connection_params.get('timezone')
+        self.localtime = None
 
     def connect(self):
         '''
@@ -35,12 +205,95 @@ class SVNLogDB(object):
         '''
         self._connect()
         self.CreateTables()
+        self.__loadPathIdCache()
 
+    @profiled('db.commit')
     def commit(self):
         '''
-        commit the running transaction at this point
+        commit the running transaction at this point. If a savepoint is active, commit is
+        deferred till the savepoint is released.
         '''
-        self._commit()
+        if(len(self._savepoints) == 0):
+            self.__flushPathInfoCache()
+            self._commit()
+            self.__newpaths = []
+
+    def savepoint(self, name):
+        '''
+        start a savepoint. Changes after the savepoint can be rolled back without rolling back the
+        earlier uncommitted changes (e.g. changes of one revision).
+        '''
+        self.updcur.execute("SAVEPOINT %s" % name)
+        self._savepoints.append(name)
+        self.__savepointpaths.append(len(self.__newpaths))
+
+    def releaseSavepoint(self, name):
+        '''
+        keep the changes done after the savepoint as part of the running transaction.
+        '''
+        assert(self._savepoints[-1] == name)
+        self._savepoints.pop()
+        self.__savepointpaths.pop()
+        self.updcur.execute("RELEASE SAVEPOINT %s" % name)
+
+    def rollbackToSavepoint(self, name):
+        '''
+        rollback the changes done after the savepoint.
+        '''
+        assert(self._savepoints[-1] == name)
+        self._savepoints.pop()
+        self.__removeNewPaths(self.__savepointpaths.pop())
+        self.authoridcache = dict()
+        try:
+            self.updcur.execute("ROLLBACK TO SAVEPOINT %s" % name)
+            self.updcur.execute("RELEASE SAVEPOINT %s" % name)
+        except sqlite3.OperationalError:
+            # some errors (e.g. disk full) rollback the complete transaction. Hence savepoint
+            # doesnot exist anymore.
+            logging.exception("Rollback to savepoint %s failed" % name)
+            self.rollback()
+
+    def setProfiler(self, profiler):
+        '''
+        set the SVNProfiler to record the timings of the database operations
+        '''
+        self.profiler = profiler
+
+    def setPathInfoCache(self, pathinfocache):
+        '''
+        set the SVNPathInfoCache object. New entries from the cache are stored in
+        SVNPathInfoCache table on every commit.
+        '''
+        self.pathinfocache = pathinfocache
+
+    def __flushPathInfoCache(self):
+        if(self.pathinfocache != None):
+            entries = self.pathinfocache.popPendingEntries()
+            if(len(entries) > 0):
+                self.updcur.executemany("INSERT OR REPLACE INTO SVNPathInfoCache(path, revno, infotype, value) \
+                                    values(?,?,?,?)", entries)
+
+    @profiled('db.endBulkLoad')
+    def endBulkLoad(self):
+        '''
+        end the bulk load mode. Create the indices dropped during the bulk load, update the statistics
+        used by sqlite query planner (ANALYZE) and switch back to the default journal mode. If the
+        import is stopped before this, indices are created again on the next connect without bulk
+        load mode.
+        '''
+        if(self.bulkload == False):
+            return
+        self.commit()
+        self.bulkload = False
+        with closing(self._new_cursor()) as cur:
+            self.__updateBulkLoadIndices(cur)
+        self.dbcon.execute("ANALYZE")
+        self.dbcon.execute("PRAGMA synchronous=FULL")
+        try:
+            self.dbcon.execute("PRAGMA journal_mode=DELETE")
+        except sqlite3.OperationalError:
+            # another connection is using the database. Database remains in WAL mode.
+            logging.exception("Failed to reset the journal mode")
 
     def close(self):
         '''
@@ -50,8 +303,28 @@ class SVNLogDB(object):
         self._close()
 
     def rollback(self):
+        self._savepoints = []
+        self.__savepointpaths = []
+        self.__removeNewPaths(0)
+        self.authoridcache = dict()
         self._rollback()
 
+    def __loadPathIdCache(self):
+        with closing(self._new_cursor()) as cur:
+            # in case of duplicate paths (databases created by old versions), first id is used.
+            cur.execute("SELECT path, id FROM SVNPaths ORDER BY id DESC")
+            self.pathidcache = dict(cur.fetchall())
+        self.__newpaths = []
+
+    def __removeNewPaths(self, count):
+        '''
+        remove the paths added after first 'count' new paths from the path id cache (since the
+        SVNPaths rows are rolled back)
+        '''
+        for path in self.__newpaths[count:]:
+            self.pathidcache.pop(path, None)
+        del self.__newpaths[count:]
+
     @property
     def query_cur(self):
         if self._query_cur == None:
@@ -62,6 +335,7 @@ class SVNLogDB(object):
     def updcur(self):
         if self._upd_cur == None:
             self._upd_cur = self._new_cursor()
+        self._begin()
         return self._upd_cur
 
     def CreateTables(self):
@@ -70,11 +344,13 @@ class SVNLogDB(object):
         '''
         with closing(self._new_cursor()) as cur:
             cur.execute("create table if not exists SVNLog(revno integer, commitdate timestamp, author text, msg text, \
-                                addedfiles integer, changedfiles integer, deletedfiles integer)")
+                                addedfiles integer, changedfiles integer, deletedfiles integer, authorid integer, \
+                                commitepoch integer, commitday integer, commitweekday integer, commithour integer)")
             cur.execute("create table if not exists SVNLogDetail(revno integer, changedpathid integer, changetype text, copyfrompathid integer, copyfromrev integer, \
                         pathtype text, linesadded integer, linesdeleted integer, lc_updated char, entrytype char)")
             cur.execute(
-                "CREATE TABLE IF NOT EXISTS SVNPaths(id INTEGER PRIMARY KEY AUTOINCREMENT, path text, relpathid INTEGER DEFAULT null)")
+                "CREATE TABLE IF NOT EXISTS SVNPaths(id INTEGER PRIMARY KEY AUTOINCREMENT, path text, relpathid INTEGER DEFAULT null, \
+                name text, depth integer)")
             try:
                 # create VIEW IF NOT EXISTS was not supported in default sqlite
                 # version with Python 2.5
@@ -88,17 +364,93 @@ class SVNLogDB(object):
             # lc_updated - Y means line count data is updated.
             # lc_updated - N means line count data is not updated. This flag can be used to update
             # line count data later
+            # authors are stored once in SVNAuthors. authorkey is the case folded author name
+            # (see getAuthorKey) and name is the first name seen for the author.
+            cur.execute("CREATE TABLE IF NOT EXISTS SVNAuthors(id INTEGER PRIMARY KEY AUTOINCREMENT, name text, \
+                        authorkey text)")
+            cur.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS svnauthorkeyidx ON SVNAuthors (authorkey ASC)")
             cur.execute(
                 "CREATE INDEX if not exists svnlogrevnoidx ON SVNLog (revno ASC)")
             cur.execute(
                 "CREATE INDEX if not exists svnlogdtlrevnoidx ON SVNLogDetail (revno ASC)")
+            self.__updateBulkLoadIndices(cur)
             cur.execute(
-                "CREATE INDEX if not exists svnlogdtlchangepathidx ON SVNLogDetail (changedpathid ASC)")
+                "CREATE INDEX IF NOT EXISTS svnpathidx ON SVNPaths (path ASC)")
             cur.execute(
-                "CREATE INDEX if not exists svnlogdtlcopypathidx ON SVNLogDetail (copyfrompathid ASC)")
+                "CREATE INDEX IF NOT EXISTS svnpathrelpathidx ON SVNPaths (relpathid ASC)")
+            # cache of repository path information (e.g. path is directory, file is binary)
+            # at a given revision. See svnlogcache.py
+            cur.execute("CREATE TABLE IF NOT EXISTS SVNPathInfoCache(path text, revno integer, infotype char, value integer)")
             cur.execute(
-                "CREATE INDEX IF NOT EXISTS svnpathidx ON SVNPaths (path ASC)")
+                "CREATE UNIQUE INDEX IF NOT EXISTS svnpathinfocacheidx ON SVNPathInfoCache (path ASC, revno ASC, infotype ASC)")
+            # revisions where dummy entries are to be created after line count data is updated.
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS SVNDummyUpdatePending(revno integer PRIMARY KEY)")
+            # live tree - current line count and status of every file. Used for creating the dummy entries
+            # of copied/deleted directories. SVNLiveTreeRev contains the revision upto which live tree
+            # is updated.
+            cur.execute("CREATE TABLE IF NOT EXISTS SVNLiveTree(pathid INTEGER PRIMARY KEY, path text, \
+                        linecount integer, addrevno integer, lastrevno integer, alive integer)")
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS svnlivetreepathidx ON SVNLiveTree (path ASC)")
+            cur.execute("CREATE TABLE IF NOT EXISTS SVNLiveTreeSnapshot(snaprevno integer, pathid integer, path text, \
+                        linecount integer, addrevno integer, lastrevno integer, alive integer)")
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS svnlivetreesnapidx ON SVNLiveTreeSnapshot (path ASC, snaprevno ASC)")
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS SVNLiveTreeRev(revno integer)")
+            # time zone used for the local commit time columns of SVNLog table
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS SVNTimeZone(timezone text)")
+            # daily rollups used by time series statistics. SVNDailyCommits has the commit count per day
+            # and author. SVNDailyPathStats has the SVNLogDetail totals per day, author and top level path
+            # (see getTopLevelPath). Both are updated as the revisions and their details are added.
+            cur.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type='table' and name='SVNDailyPathStats'")
+            bHasDailyStats = cur.fetchone()[0] > 0
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS SVNDailyCommits(commitday integer, authorid integer, commits integer)")
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS svndailycommitsidx ON SVNDailyCommits (commitday ASC, authorid ASC)")
+            cur.execute("CREATE TABLE IF NOT EXISTS SVNDailyPathStats(commitday integer, authorid integer, toppathid integer, \
+                        commits integer, linesadded integer, linesdeleted integer, filesadded integer, filesdeleted integer)")
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS svndailypathstatsidx ON SVNDailyPathStats (commitday ASC, authorid ASC, toppathid ASC)")
             self.commit()
+        with closing(self._new_cursor()) as cur:
+            bHasPathHierarchy = hasPathHierarchy(cur)
+        if(bHasPathHierarchy == False):
+            # database created by earlier version
+            self.__buildPathHierarchy()
+        with closing(self._new_cursor()) as cur:
+            cur.execute("PRAGMA table_info(SVNLog)")
+            columns = [row[1] for row in cur.fetchall()]
+            cur.execute("SELECT timezone FROM SVNTimeZone")
+            row = cur.fetchone()
+        if('authorid' not in columns):
+            # database created by earlier version
+            self.__buildAuthors()
+        self.dbcon.execute(
+            "CREATE INDEX IF NOT EXISTS svnlogauthoridx ON SVNLog (authorid ASC)")
+        storedtimezone = None
+        if(row != None):
+            storedtimezone = row[0]
+        timezone = self.timezone or storedtimezone or 'local'
+        self.localtime = localtimeconverter(timezone)
+        if(timezone != storedtimezone or 'commitday' not in columns):
+            # new database, database created by earlier version or time zone is changed
+            self.__updateCommitTimes(columns, timezone)
+            bHasDailyStats = False
+        for column in COMMITTIME_COLUMNS:
+            self.dbcon.execute(
+                "CREATE INDEX IF NOT EXISTS svnlog%sidx ON SVNLog (%s ASC)" % (column, column))
+        if(self.getLiveTreeRev() == None):
+            # database created by earlier version or line counts are updated.
+            self.rebuildLiveTree()
+        if(bHasDailyStats == False):
+            # database created by earlier version or commit days are changed
+            self.rebuildDailyStats()
         # Table structure is changed slightly. I have added a new column in SVNLogDetail table.
         # Use the following sql to alter the old tables
         # ALTER TABLE SVNLogDetail ADD COLUMN lc_updated char
@@ -108,6 +460,17 @@ class SVNLogDB(object):
         # because of some bug in old code sometimes path contains '//' or '.'. Uncomment the line to Fix such paths
         # self.__fixPaths()
 
+    def __updateBulkLoadIndices(self, cur):
+        '''
+        drop the indices which are not required during the bulk load (see BULKLOAD_INDICES) or create
+        them, if bulk load mode is off.
+        '''
+        for indexname, indexdef in BULKLOAD_INDICES:
+            if(self.bulkload == True):
+                cur.execute("DROP INDEX IF EXISTS %s" % indexname)
+            else:
+                cur.execute("CREATE INDEX IF NOT EXISTS %s ON %s" % (indexname, indexdef))
+
     def getLastStoredRev(self):
         '''
         get last revision which stored in the database.
@@ -122,60 +485,260 @@ class SVNLogDB(object):
 
         return(lastStoreRev)
 
+    def getRevisions(self, startrevno=0):
+        '''
+        iterate over (revno, commitdate, author, msg) of the stored revisions in the revision order
+        '''
+        with closing(self._new_cursor()) as cur:
+            cur.execute("select revno, commitdate, author, msg from SVNLog where revno >= ? order by revno",
+                        (startrevno,))
+            for row in cur:
+                yield row
+
+    def getRevisionDetails(self, revno):
+        '''
+        return the list of 'real' (i.e. not dummy) change entries of a revision as tuples of
+        (changedpath, changetype, copyfrompath, copyfromrev, pathtype, linesadded, linesdeleted)
+        '''
+        with closing(self._new_cursor()) as cur:
+            cur.execute("select changedpath, changetype, copyfrompath, copyfromrev, pathtype, linesadded, linesdeleted \
+                        from SVNLogDetailVw where revno=? and entrytype='R'", (revno,))
+            details = cur.fetchall()
+        return(details)
+
     def getFilePathId(self, filepath):
         '''
         File paths are stored in a seperate filepath table for reducing storage size and improve
         query efficiency. Query the file path, get the 'id' for given path.
         Add the filepath to filepath table, if entry is not there.
-        update the filepath id if required.
         '''
-        id = None
-        if(filepath):
-            with closing(self._new_cursor()) as updcur:
-                with closing(self._new_cursor()) as querycur:
-                    querycur.execute(
-                        'select id from SVNPaths where path = ?', (filepath,))
-                    resultrow = querycur.fetchone()
-                    if(resultrow == None):
-                        updcur.execute(
-                            'INSERT INTO SVNPaths(path) values(?)', (filepath,))
-                        querycur.execute(
-                            'select id from SVNPaths where path = ?', (filepath,))
-                        resultrow = querycur.fetchone()
-                    id = resultrow[0]
+        if(not filepath):
+            return(None)
+        return(self.getFilePathIds([filepath])[makeunicode(filepath)])
+
+    def getFilePathIds(self, filepaths):
+        '''
+        return the dictionary of path -> id for the given paths. Ids are taken from the path id
+        cache. Paths not in the cache (and their missing parent directories) are added to SVNPaths
+        table together and their ids are queried with one query per directory depth.
+        '''
+        pathids = dict()
+        newpaths = set()
+        for filepath in filepaths:
+            if(filepath):
+                filepath = makeunicode(filepath)
+                pathid = self.pathidcache.get(filepath)
+                if(pathid == None):
+                    newpaths.add(filepath)
+                else:
+                    pathids[filepath] = pathid
+        if(len(newpaths) > 0):
+            # parent directories are also added, if required, for path hierarchy
+            for filepath in list(newpaths):
+                parentpath = getParentPath(filepath)
+                while(parentpath != None and parentpath not in self.pathidcache and parentpath not in newpaths):
+                    newpaths.add(parentpath)
+                    parentpath = getParentPath(parentpath)
+            # paths are added in the order of depth, so that the parent ids are known
+            pathsbydepth = dict()
+            for path in newpaths:
+                pathsbydepth.setdefault(getPathDepth(path), []).append(path)
+            pathgroups = []
+            for depth in sorted(pathsbydepth.keys()):
+                paths = sorted(pathsbydepth[depth])
+                pathgroups.extend([paths[idx:idx + MAX_QUERY_PARAMS]
+                                   for idx in range(0, len(paths), MAX_QUERY_PARAMS)])
+            with closing(self._new_cursor()) as querycur:
+                for querypaths in pathgroups:
+                    self.updcur.executemany('INSERT INTO SVNPaths(path, relpathid, name, depth) values(?,?,?,?)',
+                                            [(path, self.pathidcache.get(getParentPath(path)), getPathName(path), getPathDepth(path))
+                                             for path in querypaths])
+                    querycur.execute('SELECT path, id FROM SVNPaths WHERE path IN (%s)' %
+                                     ','.join('?' * len(querypaths)), querypaths)
+                    newids = dict(querycur.fetchall())
+                    for path in querypaths:
+                        self.pathidcache[path] = newids[path]
+                        self.__newpaths.append(path)
+            newpaths = [path for querypaths in pathgroups for path in querypaths]
+            self.updcur.executemany('INSERT INTO SVNPathAncestors(ancestorid, pathid) values(?,?)',
+                                    self.__getPathAncestors(newpaths, self.pathidcache))
+            for path in newpaths:
+                pathids[path] = self.pathidcache[path]
+        return(pathids)
+
+    def __getPathAncestors(self, paths, pathidcache):
+        '''
+        return the (ancestorid, pathid) rows of the path hierarchy for given paths. Path itself is also
+        included in its ancestors.
+        '''
+        for path in paths:
+            pathid = pathidcache[path]
+            ancestorpath = path
+            while(ancestorpath != None):
+                yield((pathidcache[ancestorpath], pathid))
+                ancestorpath = getParentPath(ancestorpath)
+
+    @profiled('db.buildPathHierarchy')
+    def __buildPathHierarchy(self):
+        '''
+        build the path hierarchy for the databases created by earlier versions. Parent directory (relpathid),
+        name and depth columns of SVNPaths are updated and the ancestors of every path are added in
+        SVNPathAncestors table. Missing parent directories are added in SVNPaths.
+        '''
+        querycur = self._new_cursor()
+        querycur.execute("PRAGMA table_info(SVNPaths)")
+        columns = set([row[1].lower() for row in querycur.fetchall()])
+        for column, coltype in [('name', 'text'), ('depth', 'integer')]:
+            if(column not in columns):
+                self.updcur.execute(
+                    "ALTER TABLE SVNPaths ADD COLUMN %s %s" % (column, coltype))
+        self.updcur.execute(
+            "CREATE TABLE IF NOT EXISTS SVNPathAncestors(ancestorid integer, pathid integer)")
+        self.updcur.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS svnpathancestoridx ON SVNPathAncestors (ancestorid ASC, pathid ASC)")
+
+        querycur.execute("SELECT path, id FROM SVNPaths ORDER BY id DESC")
+        pathidcache = dict(querycur.fetchall())
+        # in case of duplicate paths (see __fixPaths), only the first id is part of the hierarchy
+        missingpaths = set()
+        for path in pathidcache.keys():
+            parentpath = getParentPath(path)
+            while(parentpath != None and parentpath not in pathidcache and parentpath not in missingpaths):
+                missingpaths.add(parentpath)
+                parentpath = getParentPath(parentpath)
+        self.updcur.executemany("INSERT INTO SVNPaths(path) values(?)",
+                                [(path,) for path in missingpaths])
+        querycur.execute("SELECT path, id FROM SVNPaths ORDER BY id DESC")
+        pathidcache = dict(querycur.fetchall())
+        querycur.close()
+
+        self.updcur.executemany("UPDATE SVNPaths SET relpathid=?, name=?, depth=? WHERE id=?",
+                                [(pathidcache.get(getParentPath(path)), getPathName(path), getPathDepth(path), pathid)
+                                 for path, pathid in pathidcache.iteritems()])
+        self.updcur.executemany('INSERT INTO SVNPathAncestors(ancestorid, pathid) values(?,?)',
+                                self.__getPathAncestors(pathidcache.keys(), pathidcache))
+        self.commit()
 
-        return(id)
+    def __buildAuthors(self):
+        '''
+        add authorid column to SVNLog table and fill the SVNAuthors table from the author names
+        (databases created by earlier versions).
+        '''
+        self.dbcon.execute("ALTER TABLE SVNLog ADD COLUMN authorid integer")
+        with closing(self._new_cursor()) as querycur:
+            querycur.execute("SELECT author FROM SVNLog GROUP BY author ORDER BY min(revno)")
+            authors = [author for author, in querycur.fetchall()]
+        authorids = dict()
+        for author in authors:
+            authorids[author] = self.getAuthorId(author)
+        # author ids are updated with one UPDATE statement (instead of one table scan per author)
+        self.updcur.execute('DROP TABLE IF EXISTS TempAuthorIds')
+        self.updcur.execute('CREATE TEMP TABLE TempAuthorIds(author text PRIMARY KEY, authorid integer)')
+        self.updcur.executemany("INSERT INTO TempAuthorIds(author, authorid) values(?,?)", authorids.iteritems())
+        self.updcur.execute("UPDATE SVNLog SET authorid=(SELECT authorid FROM TempAuthorIds \
+                    WHERE TempAuthorIds.author IS SVNLog.author)")
+        self.updcur.execute('DROP TABLE TempAuthorIds')
+        self.commit()
+
+    def __updateCommitTimes(self, columns, timezone):
+        '''
+        add the commit time columns to SVNLog table (if required) and compute the local time columns
+        of all the revisions in the given time zone.
+        '''
+        for column in COMMITTIME_COLUMNS:
+            if(column not in columns):
+                self.dbcon.execute("ALTER TABLE SVNLog ADD COLUMN %s integer" % column)
+        self.updcur.execute("UPDATE SVNLog SET commitepoch=CAST(strftime('%s', commitdate) AS integer) \
+                            WHERE commitepoch IS NULL")
+        with closing(self._new_cursor()) as querycur:
+            querycur.execute("SELECT revno, commitepoch FROM SVNLog WHERE commitepoch IS NOT NULL")
+            commitepochs = querycur.fetchall()
+        self.updcur.executemany("UPDATE SVNLog SET commitday=?, commitweekday=?, commithour=? WHERE revno=?",
+                                [self.__getLocalCommitTime(commitepoch) + (revno,) for revno, commitepoch in commitepochs])
+        self.updcur.execute("DELETE FROM SVNTimeZone")
+        self.updcur.execute("INSERT INTO SVNTimeZone(timezone) values(?)", (timezone,))
+        self.commit()
+
+    def __getLocalCommitTime(self, commitepoch):
+        '''
+        return (commitday, commitweekday, commithour) for the commit time in seconds since epoch.
+        '''
+        if(commitepoch == None):
+            return((None, None, None))
+        return(localtimefields(self.localtime(commitepoch)))
+
+    def getAuthorId(self, author):
+        '''
+        return the id of the author in SVNAuthors table. Author is added to the table if required.
+        '''
+        authorkey = getAuthorKey(author)
+        authorid = self.authoridcache.get(authorkey)
+        if(authorid == None):
+            with closing(self._new_cursor()) as querycur:
+                querycur.execute("SELECT id FROM SVNAuthors WHERE authorkey=?", (authorkey,))
+                row = querycur.fetchone()
+                if(row == None):
+                    self.updcur.execute("INSERT INTO SVNAuthors(name, authorkey) values(?,?)",
+                                        (makeunicode(author or u''), authorkey))
+                    authorid = self.updcur.lastrowid
+                else:
+                    authorid = row[0]
+            self.authoridcache[authorkey] = authorid
+        return(authorid)
 
+    @profiled('db.addRevision')
     def addRevision(self, revlog, addedfiles, changedfiles, deletedfiles):
         '''
-        add entry for a new revision in the SVNLog table
+        add entry for a new revision in the SVNLog table and update the commit count in SVNDailyCommits
         '''
-        self.updcur.execute("INSERT into SVNLog(revno, commitdate, author, msg, addedfiles, changedfiles, deletedfiles) \
-                                values(?, ?, ?, ?,?, ?, ?)",
-                            (revlog.revno, revlog.date, revlog.author, revlog.message, addedfiles, changedfiles, deletedfiles))
+        commitepoch = None
+        if(revlog.date != None):
+            commitepoch = datetime2seconds(revlog.date)
+        localcommittime = self.__getLocalCommitTime(commitepoch)
+        authorid = self.getAuthorId(revlog.author)
+        self.updcur.execute("INSERT into SVNLog(revno, commitdate, author, authorid, msg, addedfiles, changedfiles, deletedfiles, \
+                                commitepoch, commitday, commitweekday, commithour) values(?, ?, ?, ?, ?,?, ?, ?, ?, ?, ?, ?)",
+                            (revlog.revno, revlog.date, revlog.author, authorid, revlog.message,
+                             addedfiles, changedfiles, deletedfiles, commitepoch) + localcommittime)
+        self.updcur.execute("UPDATE SVNDailyCommits SET commits=commits+1 WHERE commitday IS ? and authorid IS ?",
+                            (localcommittime[0], authorid))
+        if(self.updcur.rowcount == 0):
+            self.updcur.execute("INSERT INTO SVNDailyCommits(commitday, authorid, commits) values(?,?,1)",
+                                (localcommittime[0], authorid))
 
-    def addRevisionDetails(self, revno, change_entry, lc_updated):
+    @profiled('db.addRevisionDetails')
+    def addRevisionDetails(self, revno, change_entries, lc_updated):
         '''
-        add the revision details in the SVNlogDetails table
+        add the revision details (i.e. all the change entries of the revision) in the SVNlogDetails table
         '''
-        filename = change_entry.filepath_unicode()
-        changetype = change_entry.change_type()
-        linesadded = change_entry.lc_added()
-        linesdeleted = change_entry.lc_deleted()
-        copyfrompath, copyfromrev = change_entry.copyfrom()
         entry_type = 'R'  # Real log entry.
-        pathtype = change_entry.pathtype()
-        if(pathtype == 'D'):
-            assert(filename.endswith('/') == True)
-        changepathid = self.getFilePathId(filename)
-        copyfromid = self.getFilePathId(copyfrompath)
-        if (changetype == 'R'):
-            logging.debug("Replace linecount (revno : %d): %s %d" %
-                          (revno, filename, linesadded))
-        self.updcur.execute("INSERT into SVNLogDetail(revno, changedpathid, changetype, copyfrompathid, copyfromrev, \
+        details = []
+        for change_entry in change_entries:
+            filename = change_entry.filepath_unicode()
+            changetype = change_entry.change_type()
+            linesadded = change_entry.lc_added()
+            linesdeleted = change_entry.lc_deleted()
+            copyfrompath, copyfromrev = change_entry.copyfrom()
+            pathtype = change_entry.pathtype()
+            if(pathtype == 'D'):
+                assert(filename.endswith('/') == True)
+            if (changetype == 'R'):
+                logging.debug("Replace linecount (revno : %d): %s %d" %
+                              (revno, filename, linesadded))
+            details.append((filename, changetype, copyfrompath, copyfromrev,
+                            linesadded, linesdeleted, pathtype))
+
+        pathids = self.getFilePathIds(
+            [detail[0] for detail in details] + [detail[2] for detail in details])
+        pathids[None] = None
+        lastrowid = self.__getLastDetailRowId()
+        self.updcur.executemany("INSERT into SVNLogDetail(revno, changedpathid, changetype, copyfrompathid, copyfromrev, \
                             linesadded, linesdeleted, lc_updated, pathtype, entrytype) \
-                    values(?, ?, ?, ?,?,?, ?,?,?,?)", (revno, changepathid, changetype, copyfromid, copyfromrev,
-                                                       linesadded, linesdeleted, lc_updated, pathtype, entry_type))
+                    values(?, ?, ?, ?,?,?, ?,?,?,?)",
+                                [(revno, pathids[filename], changetype, pathids[makeunicode(copyfrompath) or None], copyfromrev,
+                                  linesadded, linesdeleted, lc_updated, pathtype, entry_type)
+                                 for filename, changetype, copyfrompath, copyfromrev, linesadded, linesdeleted, pathtype in details])
+        self.__updateDailyStats("SVNLogDetail.rowid > ?", (lastrowid,))
 
     def updateNumFiles(self, revno, addedfiles, deletedfiles):
         '''
@@ -184,239 +747,386 @@ class SVNLogDB(object):
         self.updcur.execute("UPDATE SVNLog SET addedfiles=?, deletedfiles=? where revno=?",
                             (addedfiles, deletedfiles, revno))
 
-    def createRevFileListForDir(self, revno, dirname):
+    @profiled('db.createRevFileList')
+    def createRevFileList(self, revlog, copied_dirlist, deleted_dirlist):
         '''
-        create the file list for a revision in a temporary table.
+        create the list of files added by copying the directories in the revision in a temporary table
+        (TempRevFileList). Files are taken from the live tree at the 'copy from' revision. Returns the
+        list of deleted directories which are not part of the copied directories.
         '''
-        assert(dirname.endswith('/'))
-        self.updcur.execute('DROP TABLE IF EXISTS TempRevDirFileList')
-        self.updcur.execute('DROP VIEW IF EXISTS TempRevDirFileListVw')
-        self.updcur.execute(
-            'CREATE TEMP TABLE TempRevDirFileList(path text, pathid integer, addrevno integer)')
-        self.updcur.execute(
-            'CREATE INDEX revdirfilelistidx ON TempRevDirFileList (addrevno ASC, path ASC)')
-        sqlquery = 'SELECT DISTINCT SVNPaths.path, changedpathid, SVNLogDetail.revno FROM SVNLogDetail,SVNPaths WHERE \
-                    pathtype="F" and SVNLogDetail.revno <=%d and (changetype== "A" or changetype== "R") \
-                    and SVNLogDetail.changedpathid = SVNPaths.id and \
-                    (SVNPaths.path like "%s%%" and SVNPaths.path != "%s")' \
-                    % (revno, dirname, dirname)
+        self.updcur.execute('DROP TABLE IF EXISTS TempRevFileList')
+        self.updcur.execute('CREATE TEMP TABLE TempRevFileList(path text PRIMARY KEY, addrevno integer, \
+                    copyfrom_path text, copyfrom_pathid integer, copyfrom_rev integer, linecount integer)')
 
-        with closing(self._new_cursor()) as querycur:
-            querycur.execute(sqlquery)
-            for sourcepath, sourcepathid, addrevno in querycur:
-                self.updcur.execute('INSERT INTO TempRevDirFileList(path, pathid, addrevno) \
-                            VALUES(?,?,?)', (sourcepath, sourcepathid, addrevno))
-            self.commit()
+        filelist = dict()
+        for change in copied_dirlist:
+            copiedfrom_path, copiedfrom_rev = change.copyfrom()
+            dirpath = change.filepath_unicode()
+            assert(copiedfrom_path.endswith('/') == dirpath.endswith('/'))
+            for sourcepath, sourcepathid, addrevno, linecount in self.getLiveTreeFiles(copiedfrom_path, copiedfrom_rev):
+                path = dirpath + sourcepath[len(copiedfrom_path):]
+                # if same path is added by multiple copies, use the latest added file.
+                if(path not in filelist or filelist[path][1] < addrevno):
+                    filelist[path] = (path, addrevno, sourcepath,
+                                      sourcepathid, copiedfrom_rev, linecount)
 
-            # Now delete the already deleted files from the file list.
-            sqlquery = 'SELECT DISTINCT SVNPaths.path, SVNLogDetail.changedpathid, SVNLogDetail.revno FROM SVNLogDetail,SVNPaths \
-                       WHERE pathtype="F" and SVNLogDetail.revno <=%d and changetype== "D" \
-                       and SVNLogDetail.changedpathid = SVNPaths.id \
-                        and (SVNPaths.path like "%s%%" and SVNPaths.path!= "%s")' \
-                        % (revno, dirname, dirname)
-            querycur.execute(sqlquery)
-            for sourcepath, sourcepathid, delrevno in querycur:
-                self.updcur.execute(
-                    'DELETE FROM TempRevDirFileList WHERE path=? and addrevno < ?', (sourcepath, delrevno))
+        # Now delete the entries for which 'real' entry is already created in
+        # this 'revision' update.
+        for change_entry in revlog.getFileChangeEntries():
+            filelist.pop(change_entry.filepath_unicode(), None)
+        self.updcur.executemany('INSERT INTO TempRevFileList(path, addrevno, copyfrom_path, copyfrom_pathid, \
+                    copyfrom_rev, linecount) VALUES(?,?,?,?,?,?)', filelist.values())
 
-            # in rare case there is a possibility of duplicate values in the TempRevFileList
-            # hence try to create a temporary view to get the unique values
-            self.updcur.execute('CREATE TEMP VIEW TempRevDirFileListVw AS SELECT DISTINCT \
-                path, pathid, addrevno FROM TempRevDirFileList')
-            self.commit()
+        upd_del_dirlist = []
+        for change in deleted_dirlist:
+            # first check if 'deleted' directory entry is there in the revision filelist
+            # if yes, remove those rows.
+            pathrange = getPathPrefixRange(change.filepath_unicode())
+            self.updcur.execute(
+                'DELETE FROM TempRevFileList WHERE path >= ? and path < ?', pathrange)
+            if(self.updcur.rowcount <= 0):
+                # if deletion path is not there in the addition path, it has to be
+                # handled seperately. Hence add it into different list
+                upd_del_dirlist.append(change)
+        self.commit()
+        return(upd_del_dirlist)
 
-    def createRevFileList(self, revlog, copied_dirlist, deleted_dirlist):
+    @profiled('db.addDummyAdditionDetails')
+    def addDummyAdditionDetails(self, revno):
         '''
-        create the file list for a revision for a specific directory in a temporary table.
+        add the dummy file addition entries for the files in the copied directories (see createRevFileList).
+        Lines added is the line count of the source file at the 'copy from' revision.
         '''
-        try:
-            upd_del_dirlist = deleted_dirlist
-            self.updcur.execute('DROP TABLE IF EXISTS TempRevFileList')
-            self.updcur.execute('DROP VIEW IF EXISTS TempRevFileListVw')
-            self.updcur.execute('CREATE TEMP TABLE TempRevFileList(path text, addrevno integer, \
-                        copyfrom_path text, copyfrom_pathid integer, copyfrom_rev integer)')
-            self.updcur.execute(
-                'CREATE INDEX revfilelistidx ON TempRevFileList (addrevno ASC, path ASC)')
+        entries = []
+        total_lc_added = 0
+        with closing(self._new_cursor()) as querycur:
+            querycur.execute("SELECT path, copyfrom_path, copyfrom_pathid, copyfrom_rev, linecount \
+                        FROM TempRevFileList ORDER BY path")
+            filelist = querycur.fetchall()
+        pathids = self.getFilePathIds([row[0] for row in filelist])
+        for changedpath, copyfrompath, copyfrompathid, copyfromrev, lc_added in filelist:
+            if(lc_added < 0):
+                logging.error(
+                    "Found negative linecount for %s(rev %d)" % (copyfrompath, copyfromrev))
+                lc_added = 0
+            total_lc_added = total_lc_added + lc_added
+            entries.append((revno, pathids[changedpath], copyfrompathid,
+                            copyfromrev, lc_added))
 
-            with closing(self._new_cursor()) as querycur:
-                for change in copied_dirlist:
-                    copiedfrom_path, copiedfrom_rev = change.copyfrom()
-                    # collect all files added to this directory.
-                    assert(copiedfrom_path.endswith('/') ==
-                           change.filepath_unicode().endswith('/'))
-
-                    sqlquery = 'SELECT DISTINCT SVNPaths.path, changedpathid, revno FROM SVNLogDetail, SVNPaths \
-                        WHERE pathtype="F" and revno <=%d and (changetype== "A" or changetype== "R") and \
-                        SVNPaths.id = SVNLogDetail.changedpathid and \
-                        (SVNPaths.path like "%s%%" and SVNPaths.path!= "%s") \
-                        ' % (copiedfrom_rev, copiedfrom_path, copiedfrom_path)
-                    querycur.execute(sqlquery)
-                    for sourcepath, sourcepathid, addrevno in querycur:
-                        path = sourcepath.replace(
-                            copiedfrom_path, change.filepath_unicode())
-                        self.updcur.execute('INSERT INTO TempRevFileList(path, addrevno, copyfrom_path, copyfrom_pathid,copyfrom_rev) \
-                            VALUES(?,?,?,?,?)', (path, addrevno, sourcepath, sourcepathid, copiedfrom_rev))
-                self.commit()
-
-                # Now delete the already deleted files from the file list.
-                for change in copied_dirlist:
-                    copiedfrom_path, copiedfrom_rev = change.copyfrom()
-                    sqlquery = 'SELECT DISTINCT SVNPaths.path, changedpathid, revno FROM SVNLogDetail,SVNPaths WHERE \
-                        pathtype="F" and revno <=%d and changetype== "D" and \
-                        SVNPaths.id = SVNLogDetail.changedpathid and \
-                        (SVNPaths.path like "%s%%" and SVNPaths.path != "%s")' % (copiedfrom_rev, copiedfrom_path, copiedfrom_path)
-                    querycur.execute(sqlquery)
-                    for sourcepath, sourcepathid, delrevno in querycur:
-                        path = sourcepath.replace(
-                            copiedfrom_path, change.filepath_unicode())
-                        self.updcur.execute(
-                            'DELETE FROM TempRevFileList WHERE path=? and addrevno < ?', (path, delrevno))
-
-                self.commit()
-
-                # Now delete the entries for which 'real' entry is already created in
-                # this 'revision' update.
-                for change_entry in revlog.getFileChangeEntries():
-                    filepath = change_entry.filepath()
-                    self.updcur.execute(
-                        'DELETE FROM TempRevFileList WHERE path=?', (filepath,))
-
-                upd_del_dirlist = []
-                for change in deleted_dirlist:
-                    # first check if 'deleted' directory entry is there in the revision filelist
-                    # if yes, remove those rows.
-                    querycur.execute(
-                        'SELECT count(*) FROM TempRevFileList WHERE path like "%s%%"' % change.filepath())
-                    count = int(querycur.fetchone()[0])
-                    if(count > 0):
-                        self.updcur.execute(
-                            'DELETE FROM TempRevFileList WHERE path like "%s%%"' % change.filepath())
-                    else:
-                        # if deletion path is not there in the addition path, it has to be
-                        # handled seperately. Hence add it into different list
-                        upd_del_dirlist.append(change)
+        lastrowid = self.__getLastDetailRowId()
+        self.updcur.executemany("INSERT into SVNLogDetail(revno, changedpathid, changetype, copyfrompathid, copyfromrev, \
+                    linesadded, linesdeleted, entrytype, pathtype, lc_updated) \
+                    values(?, ?, 'A', ?, ?, ?, 0, 'D', 'F', 'Y')", entries)
+        self.__updateDailyStats("SVNLogDetail.rowid > ?", (lastrowid,))
+        # Now commit the changes
+        self.commit()
+        logging.debug("\t Total dummy line count : %d" % total_lc_added)
+        return len(entries)
 
-            # in rare case there is a possibility of duplicate values in the TempRevFileList
-            # hence try to create a temporary view to get the unique values
-            self.updcur.execute('CREATE TEMP VIEW TempRevFileListVw AS SELECT DISTINCT \
-                path, addrevno, copyfrom_path, copyfrom_pathid,copyfrom_rev FROM TempRevFileList \
-                group by path having addrevno=max(addrevno)')
+    @profiled('db.addDummyDeletionDetails')
+    def addDummyDeletionDetails(self, revno, deleted_dir):
+        '''
+        add the dummy file deletion entries for the files in the deleted directory. Lines deleted is
+        the line count of the file.
+        '''
+        assert(deleted_dir.endswith('/'))
+        logging.debug(
+            "Updating dummy file deletion entries for path %s" % deleted_dir)
+        entries = []
+        for changedpath, changedpathid, addrevno, lc_deleted in self.getLiveTreeFiles(deleted_dir, revno):
+            if(lc_deleted < 0):
+                logging.error(
+                    "Found negative linecount for %s(rev %d)" % (changedpath, revno))
+                lc_deleted = 0
+            entries.append((revno, changedpathid, lc_deleted))
 
-            self.commit()
+        lastrowid = self.__getLastDetailRowId()
+        self.updcur.executemany("INSERT into SVNLogDetail(revno, changedpathid, changetype,  \
+                    linesadded, linesdeleted, entrytype, pathtype, lc_updated) \
+                    values(?, ?, 'D', 0, ?, 'D', 'F', 'Y')", entries)
+        self.__updateDailyStats("SVNLogDetail.rowid > ?", (lastrowid,))
+        self.commit()
+        return len(entries)
 
-        except:
-            logging.exception(
-                "Found error while getting file list for revision")
+    def __getLastDetailRowId(self):
+        with closing(self._new_cursor()) as querycur:
+            querycur.execute("SELECT ifnull(max(rowid), 0) FROM SVNLogDetail")
+            return(querycur.fetchone()[0])
 
-        return(upd_del_dirlist)
+    def __getDailyStats(self, condition, params=()):
+        '''
+        return the rows of SVNDailyPathStats computed from the SVNLogDetail rows matching the condition
+        '''
+        with closing(self._new_cursor()) as querycur:
+            querycur.execute(DAILYSTATS_QUERY % condition, params)
+            return([row[:3] + tuple([int(value) for value in row[3:]]) for row in querycur.fetchall()])
 
-    def addDummyAdditionDetails(self, revno):
-        addedfiles = 0
-        path_type = 'F'
-        changetype = 'A'
-        entry_type = 'D'
-        lc_updated = 'Y'
-        total_lc_added = 0
+    @profiled('db.updateDailyStats')
+    def __updateDailyStats(self, condition, params=(), sign=1):
+        '''
+        add (sign=1) or subtract (sign=-1) the SVNLogDetail rows matching the condition to the daily
+        rollup table SVNDailyPathStats.
+        '''
+        for row in self.__getDailyStats(condition, params):
+            values = tuple([sign * value for value in row[3:]])
+            self.updcur.execute("UPDATE SVNDailyPathStats SET %s WHERE commitday IS ? and authorid IS ? and toppathid IS ?" %
+                                ', '.join(['%s=%s+?' % (column, column) for column in DAILYSTATS_COLUMNS]),
+                                values + row[:3])
+            if(self.updcur.rowcount == 0):
+                self.updcur.execute("INSERT INTO SVNDailyPathStats(commitday, authorid, toppathid, %s) \
+                            values(?,?,?,?,?,?,?,?)" % ', '.join(DAILYSTATS_COLUMNS), row[:3] + values)
 
-        with closing(self._new_cursor()) as querycur:
-            querycur.execute("SELECT count(*) from TempRevFileListVw")
-            logging.debug("Revision file count = %d" % querycur.fetchone()[0])
+    @profiled('db.rebuildDailyStats')
+    def rebuildDailyStats(self):
+        '''
+        build the daily rollup tables from SVNLog and SVNLogDetail tables (e.g. for databases created with
+        earlier versions or after the commit days are changed).
+        '''
+        self.updcur.execute("DELETE FROM SVNDailyCommits")
+        self.updcur.execute("DELETE FROM SVNDailyPathStats")
+        self.updcur.execute("INSERT INTO SVNDailyCommits(commitday, authorid, commits) \
+                    SELECT commitday, authorid, count(*) FROM SVNLog GROUP BY commitday, authorid")
+        self.updcur.executemany("INSERT INTO SVNDailyPathStats(commitday, authorid, toppathid, %s) \
+                    values(?,?,?,?,?,?,?,?)" % ', '.join(DAILYSTATS_COLUMNS), self.__getDailyStats("1"))
+        self.commit()
 
-            querycur.execute("SELECT * from TempRevFileListVw")
-            for changedpath, addrevno, copyfrompath, copyfrompathid, copyfromrev in querycur.fetchall():
-                querycur.execute("select sum(linesadded), sum(linesdeleted) from SVNLogDetail \
-                        where revno <= ? and changedpathid ==(select id from SVNPaths where path== ?) group by changedpathid",
-                                 (copyfromrev, copyfrompath))
+    def getLiveTreeRev(self):
+        '''
+        return the revision upto which the live tree is updated or None if the live tree is not valid.
+        '''
+        with closing(self._new_cursor()) as cur:
+            cur.execute("SELECT revno FROM SVNLiveTreeRev")
+            row = cur.fetchone()
+            if(row == None):
+                return(None)
+            return(row[0])
 
-                row = querycur.fetchone()
-                # set lines added to current line count
-                lc_added = 0
-                if row is not None:
-                    lc_added = row[0] - row[1]
-
-                if(lc_added < 0):
-                    logging.error(
-                        "Found negative linecount for %s(rev %d)" % (copyfrompath, copyfromrev))
-                    lc_added = 0
-                # set the lines deleted = 0
-                lc_deleted = 0
+    def invalidateLiveTree(self):
+        '''
+        clear the live tree and its snapshots (e.g. before the line counts of earlier revisions are changed).
+        Till the live tree is rebuilt (see rebuildLiveTree), files are computed from SVNLogDetail.
+        '''
+        self.updcur.execute("DELETE FROM SVNLiveTreeRev")
+        self.updcur.execute("DELETE FROM SVNLiveTree")
+        self.updcur.execute("DELETE FROM SVNLiveTreeSnapshot")
 
-                total_lc_added = total_lc_added + lc_added
-                #logging.debug("\tadded dummy addition entry for path %s linecount=%d" % (changedpath,lc_added))
-                changedpathid = self.getFilePathId(changedpath)
-                copyfrompathid = self.getFilePathId(copyfrompath)
-                assert(path_type != 'U')
-                self.updcur.execute("INSERT into SVNLogDetail(revno, changedpathid, changetype, copyfrompathid, copyfromrev, \
-                                        linesadded, linesdeleted, entrytype, pathtype, lc_updated) \
-                                values(?, ?, ?, ?,?,?, ?,?,?,?)", (revno, changedpathid, changetype, copyfrompathid, copyfromrev,
-                                                                   lc_added, lc_deleted, entry_type, path_type, lc_updated))
-                addedfiles = addedfiles + 1
-            # Now commit the changes
-            self.commit()
-        logging.debug("\t Total dummy line count : %d" % total_lc_added)
-        return addedfiles
+    @profiled('db.rebuildLiveTree')
+    def rebuildLiveTree(self):
+        '''
+        build the live tree from SVNLogDetail entries (e.g. for databases created with earlier versions).
+        '''
+        self.invalidateLiveTree()
+        self.updcur.execute("INSERT INTO SVNLiveTree(pathid, path, linecount, addrevno, lastrevno, alive) \
+                    SELECT changedpathid, SVNPaths.path, sum(linesadded)-sum(linesdeleted), max(addrevno), max(revno), \
+                    ifnull(max(addrevno) >= ifnull(max(CASE WHEN changetype='D' THEN revno END), 0), 0) \
+                    FROM (SELECT SVNLogDetail.*, CASE WHEN changetype='A' or changetype='R' THEN revno END as addrevno \
+                    FROM SVNLogDetail WHERE pathtype='F') as FileDetail, SVNPaths \
+                    WHERE FileDetail.changedpathid=SVNPaths.id GROUP BY changedpathid")
+        self.updcur.execute(
+            "INSERT INTO SVNLiveTreeRev(revno) SELECT ifnull(max(revno), 0) FROM SVNLog")
+        lastrevno = self.getLiveTreeRev()
+        if(lastrevno > 0):
+            self.__addLiveTreeSnapshot(lastrevno)
+        self.commit()
 
-    def addDummyDeletionDetails(self, revno, deleted_dir):
-        deletedfiles = 0
-        addedfiles = 0
-        path_type = 'F'
-        # set lines added to 0
-        lc_added = 0
-        changetype = 'D'
-        entry_type = 'D'
-        lc_updated = 'Y'
+    @profiled('db.updateLiveTree')
+    def updateLiveTree(self, revno):
+        '''
+        apply the file changes (real and dummy entries) of the revision to the live tree. Revisions must
+        be applied in revision order. A snapshot of the live tree is added after every
+        LIVETREE_SNAPSHOT_INTERVAL revisions.
+        '''
+        lastrevno = self.getLiveTreeRev()
+        if(lastrevno == None or revno <= lastrevno):
+            # live tree is not valid (will be rebuilt) or revision is already applied.
+            return
+        with closing(self._new_cursor()) as querycur:
+            querycur.execute("SELECT pathid, path, linecount, addrevno, lastrevno, alive FROM SVNLiveTree \
+                        WHERE pathid IN (SELECT changedpathid FROM SVNLogDetail WHERE revno=? and pathtype='F')",
+                             (revno,))
+            entries = dict([(row[0], list(row[1:]))
+                            for row in querycur.fetchall()])
+            querycur.execute(LIVETREE_CHANGES_QUERY + " WHERE SVNLogDetail.changedpathid=SVNPaths.id \
+                        and pathtype='F' and SVNLogDetail.revno=? " + LIVETREE_CHANGES_ORDER, (revno,))
+            applyLiveTreeChanges(entries, querycur)
+        self.updcur.executemany("INSERT OR REPLACE INTO SVNLiveTree(pathid, path, linecount, addrevno, lastrevno, alive) \
+                    VALUES(?,?,?,?,?,?)", [(pathid,) + tuple(entry) for pathid, entry in entries.iteritems()])
+        self.updcur.execute("UPDATE SVNLiveTreeRev SET revno=?", (revno,))
+        if(revno / LIVETREE_SNAPSHOT_INTERVAL > lastrevno / LIVETREE_SNAPSHOT_INTERVAL):
+            self.__addLiveTreeSnapshot(revno)
 
-        assert(deleted_dir.endswith('/'))
-        # now query the deleted folders from the sqlite database and get the
-        # file list
-        logging.debug(
-            "Updating dummy file deletion entries for path %s" % deleted_dir)
-        self.createRevFileListForDir(revno, deleted_dir)
+    def getLiveTreeFiles(self, dirpath, revno):
+        '''
+        return the list of (path, pathid, addrevno, linecount) of the files inside the directory 'dirpath'
+        after the given revision. Files are taken from the live tree if the revision is same as (or later
+        than) the live tree revision or the files in the directory are not changed after the revision.
+        Otherwise the files are computed from the latest snapshot before the revision and the changes
+        after the snapshot.
+        '''
+        pathrange = getPathPrefixRange(dirpath)
+        lastrevno = self.getLiveTreeRev()
+        with closing(self._new_cursor()) as querycur:
+            baserevno = None
+            if(lastrevno != None):
+                baserevno = lastrevno
+                if(revno < lastrevno):
+                    querycur.execute("SELECT count(*) FROM SVNLiveTree WHERE path >= ? and path < ? \
+                                and lastrevno > ?", pathrange + (revno,))
+                    if(querycur.fetchone()[0] > 0):
+                        baserevno = None
+                    else:
+                        baserevno = revno
+            if(baserevno != None):
+                querycur.execute("SELECT pathid, path, linecount, addrevno, lastrevno, alive FROM SVNLiveTree \
+                            WHERE path >= ? and path < ?", pathrange)
+            else:
+                querycur.execute("SELECT max(snaprevno) FROM SVNLiveTreeSnapshot WHERE snaprevno <= ?", (revno,))
+                baserevno = querycur.fetchone()[0] or 0
+                # latest snapshot row of every path upto the snapshot revision
+                querycur.execute("SELECT pathid, path, linecount, addrevno, lastrevno, alive, max(snaprevno) \
+                            FROM SVNLiveTreeSnapshot WHERE path >= ? and path < ? and snaprevno <= ? \
+                            GROUP BY pathid", pathrange + (baserevno,))
+            entries = dict([(row[0], list(row[1:6]))
+                            for row in querycur.fetchall()])
+            dirpathid = self.pathidcache.get(makeunicode(dirpath))
+            if(baserevno < revno and dirpathid != None):
+                # changes of the paths inside the directory (from path hierarchy)
+                querycur.execute(LIVETREE_CHANGES_QUERY + " WHERE SVNLogDetail.changedpathid=SVNPaths.id \
+                            and SVNLogDetail.changedpathid IN (SELECT pathid FROM SVNPathAncestors WHERE ancestorid=?) \
+                            and pathtype='F' and SVNLogDetail.revno > ? and SVNLogDetail.revno <= ? " + LIVETREE_CHANGES_ORDER,
+                                 (dirpathid, baserevno, revno))
+                applyLiveTreeChanges(entries, querycur)
+        return([(path, pathid, addrevno, linecount)
+                for pathid, (path, linecount, addrevno, lastrevno, alive) in entries.iteritems() if alive == 1])
 
+    def __addLiveTreeSnapshot(self, revno):
+        '''
+        store the live tree rows changed after the last snapshot
+        '''
         with closing(self._new_cursor()) as querycur:
-            querycur.execute('SELECT path FROM TempRevDirFileListVw')
-            for changedpath, in querycur.fetchall():
-                #logging.debug("\tDummy file deletion entries for path %s" % changedpath)
-                querycur.execute('select sum(linesadded), sum(linesdeleted)  from SVNLogDetail \
-                        where revno <= ? and changedpathid ==(select id from SVNPaths where path== ?) group by changedpathid',
-                                 (revno, changedpath))
+            querycur.execute(
+                "SELECT ifnull(max(snaprevno), 0) FROM SVNLiveTreeSnapshot")
+            lastsnaprevno = querycur.fetchone()[0]
+        self.updcur.execute("INSERT INTO SVNLiveTreeSnapshot(snaprevno, pathid, path, linecount, addrevno, lastrevno, alive) \
+                    SELECT ?, pathid, path, linecount, addrevno, lastrevno, alive FROM SVNLiveTree \
+                    WHERE lastrevno > ?", (revno, lastsnaprevno))
 
-                row = querycur.fetchone()
-                lc_deleted = 0
-                if row != None:
-                    # set lines deleted to current line count
-                    lc_deleted = row[0] - row[1]
-                if(lc_deleted < 0):
-                    logging.error(
-                        "Found negative linecount for %s(rev %d)" % (changedpath, revno))
-                    lc_deleted = 0
-
-                changedpathid = self.getFilePathId(changedpath)
-                self.updcur.execute("INSERT into SVNLogDetail(revno, changedpathid, changetype,  \
-                                        linesadded, linesdeleted, entrytype, pathtype, lc_updated) \
-                                values(?, ?,?,?, ?,?,?,?)", (revno, changedpathid, changetype,
-                                                             lc_added, lc_deleted, entry_type, path_type, lc_updated))
-                deletedfiles = deletedfiles + 1
-            self.commit()
-        return deletedfiles
+    def getLineCountNotUpdated(self, afterrowid, chunksize):
+        '''
+        return next chunk of SVNLogDetail rows where line count is not updated (i.e. lc_updated='N')
+        after the given rowid. Chunk contains approximately 'chunksize' rows, however all the
+        remaining rows of the last revision in the chunk are included. Returns the list of
+        (rowid, revno, changedpath, changetype, pathtype) tuples sorted on rowid.
+        '''
+        with closing(self._new_cursor()) as cur:
+            cur.execute("SELECT SVNLogDetail.rowid, revno, SVNPaths.path, changetype, pathtype \
+                        FROM SVNLogDetail, SVNPaths WHERE SVNLogDetail.changedpathid = SVNPaths.id \
+                        and lc_updated='N' and SVNLogDetail.rowid > ? and revno IN \
+                        (SELECT revno FROM SVNLogDetail WHERE lc_updated='N' and rowid > ? \
+                        ORDER BY rowid LIMIT ?) ORDER BY SVNLogDetail.rowid",
+                        (afterrowid, afterrowid, chunksize))
+            return(cur.fetchall())
 
-    def getRevsLineCountNotUpdated(self):
+    def getUnknownPathTypes(self):
         '''
-        return list of revision numbers where line count is not updated yet.
+        return the list of (rowid, revno, changedpath, changetype, copyfrompath) tuples of the SVNLogDetail
+        rows where the path type is not known (e.g. 'kind' is not available in 'svn log --xml' output)
         '''
         with closing(self._new_cursor()) as cur:
-            cur.execute("CREATE TEMP TABLE IF NOT EXISTS LCUpdateStatus \
-                        as select revno, changedpath, changetype from SVNLogDetail where lc_updated='N'")
-            self.commit()
-            cur.execute(
-                "select revno, changedpath, changetype from LCUpdateStatus")
+            cur.execute("SELECT SVNLogDetail.rowid, revno, ChangedPath.path, changetype, CopyFromPath.path \
+                        FROM SVNLogDetail JOIN SVNPaths as ChangedPath ON SVNLogDetail.changedpathid = ChangedPath.id \
+                        LEFT JOIN SVNPaths as CopyFromPath ON SVNLogDetail.copyfrompathid = CopyFromPath.id \
+                        WHERE pathtype IS NULL ORDER BY SVNLogDetail.rowid")
+            return(cur.fetchall())
 
-            yield cur.fetchone()
+    @profiled('db.updatePathTypes')
+    def updatePathTypes(self, pathtypes):
+        '''
+        update the unknown path types of SVNLogDetail rows. pathtypes is list of (rowid, revno, changedpath,
+        copyfrompath, pathtype) tuples. Paths (and 'copy from' paths) of directories are changed to
+        paths with trailing '/' and the file counts of the revisions are updated. The live tree
+        contains only the files, hence it is invalidated.
+        '''
+        details = []
+        for rowid, revno, path, copyfrompath, pathtype in pathtypes:
+            if(pathtype == 'D'):
+                path = path.rstrip(u'/') + u'/'
+                if(copyfrompath != None):
+                    copyfrompath = copyfrompath.rstrip(u'/') + u'/'
+            details.append((pathtype, path, copyfrompath, rowid))
+        pathids = self.getFilePathIds(
+            [detail[1] for detail in details] + [detail[2] for detail in details])
+        pathids[None] = None
+        revnos = sorted(set([pathtype[1] for pathtype in pathtypes]))
+        revnogroups = [revnos[idx:idx + MAX_QUERY_PARAMS]
+                       for idx in range(0, len(revnos), MAX_QUERY_PARAMS)]
+        # top level path of the changed path may change. Hence the daily rollups of the complete revisions
+        # are updated
+        for grouprevnos in revnogroups:
+            self.__updateDailyStats("SVNLogDetail.revno IN (%s)" % ','.join('?' * len(grouprevnos)), grouprevnos, -1)
+        self.updcur.executemany("UPDATE SVNLogDetail SET pathtype=?, changedpathid=?, copyfrompathid=? WHERE rowid=?",
+                                [(pathtype, pathids[makeunicode(path)], pathids[makeunicode(copyfrompath) or None], rowid)
+                                 for pathtype, path, copyfrompath, rowid in details])
+        for grouprevnos in revnogroups:
+            self.__updateDailyStats("SVNLogDetail.revno IN (%s)" % ','.join('?' * len(grouprevnos)), grouprevnos)
+        self.updcur.executemany("UPDATE SVNLog SET \
+                    addedfiles=(SELECT count(*) FROM SVNLogDetail WHERE SVNLogDetail.revno=SVNLog.revno \
+                        and pathtype='F' and changetype='A'), \
+                    changedfiles=(SELECT count(*) FROM SVNLogDetail WHERE SVNLogDetail.revno=SVNLog.revno \
+                        and pathtype='F' and (changetype='M' or changetype='R')), \
+                    deletedfiles=(SELECT count(*) FROM SVNLogDetail WHERE SVNLogDetail.revno=SVNLog.revno \
+                        and pathtype='F' and changetype='D') \
+                    WHERE revno=?", [(revno,) for revno in revnos])
+        self.invalidateLiveTree()
 
-    def updateLineCount(self, revno, changedpath, linesadded, linesdeleted):
-        sqlquery = "Update SVNLogDetail Set linesadded=%d, linesdeleted=%d, lc_updated='Y' \
-                    where revno=%d and changedpath='%s'" % (linesadded, linesdeleted, revno, changedpath)
-        self.updcur.execute(sqlquery)
+    @profiled('db.updateLineCounts')
+    def updateLineCounts(self, linecounts):
+        '''
+        update the line counts of SVNLogDetail rows. linecounts is list of (linesadded, linesdeleted, rowid)
+        tuples
+        '''
+        rowids = [rowid for linesadded, linesdeleted, rowid in linecounts]
+        rowidgroups = [rowids[idx:idx + MAX_QUERY_PARAMS]
+                       for idx in range(0, len(rowids), MAX_QUERY_PARAMS)]
+        # old line counts are removed from the daily rollups and new line counts are added
+        for grouprowids in rowidgroups:
+            self.__updateDailyStats("SVNLogDetail.rowid IN (%s)" % ','.join('?' * len(grouprowids)), grouprowids, -1)
+        self.updcur.executemany("UPDATE SVNLogDetail SET linesadded=?, linesdeleted=?, lc_updated='Y' \
+                    WHERE rowid=?", linecounts)
+        for grouprowids in rowidgroups:
+            self.__updateDailyStats("SVNLogDetail.rowid IN (%s)" % ','.join('?' * len(grouprowids)), grouprowids)
+
+    def addDummyUpdatePending(self):
+        '''
+        remember the revisions where the dummy entries for copied/deleted directories have
+        to be created after the line counts are updated (i.e. revisions with directory copy/delete
+        and line count not updated).
+        '''
+        self.updcur.execute("INSERT OR IGNORE INTO SVNDummyUpdatePending(revno) \
+                    SELECT DISTINCT revno FROM SVNLogDetail WHERE lc_updated='N' and pathtype='D' \
+                    and (changetype='D' or copyfrompathid IS NOT NULL)")
+        self.commit()
+
+    def getDummyUpdatePending(self):
+        '''
+        return the sorted list of revisions where the dummy entries are pending and the line counts
+        of all the revisions upto that revision are updated.
+        '''
+        with closing(self._new_cursor()) as cur:
+            cur.execute("SELECT revno FROM SVNDummyUpdatePending WHERE revno < \
+                    (SELECT ifnull(min(revno), 1+(SELECT max(revno) FROM SVNDummyUpdatePending)) \
+                    FROM SVNLogDetail WHERE lc_updated='N') ORDER BY revno")
+            return([revno for revno, in cur.fetchall()])
+
+    def removeDummyUpdatePending(self, revno):
+        self.updcur.execute("DELETE FROM SVNDummyUpdatePending WHERE revno=?", (revno,))
+
+    def deleteDummyDetails(self, revno):
+        '''
+        delete the dummy entries (created for copied/deleted directories) of the revision.
+        '''
+        self.__updateDailyStats("SVNLogDetail.revno=? and entrytype='D'", (revno,), -1)
+        self.updcur.execute("DELETE FROM SVNLogDetail WHERE revno=? and entrytype='D'", (revno,))
 
     def _connect(self):
         '''
@@ -425,12 +1135,18 @@ class SVNLogDB(object):
         self.__dbpath = self.connection_params['dbpath']
         # initialize all cursor variables to None
         self._updcur = None
+        self._intransaction = False
+        # python sqlite3 module commits the running transaction before statements like SAVEPOINT.
+        # Hence transactions are started explicitly (see _begin)
         self.dbcon = sqlite3.connect(
-            self.__dbpath, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+            self.__dbpath, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            isolation_level=None)
+        if(self.bulkload == True):
+            for pragma in BULKLOAD_PRAGMAS:
+                self.dbcon.execute("PRAGMA %s" % pragma)
         # create a seperate update cursor. If same cursor is used for updates and select(query),
         # then it closes current query and hence gives wrong results
         self._updcur = self.dbcon.cursor()
-        self.CreateTables()
 
     def _new_cursor(self):
         '''
@@ -438,16 +1154,26 @@ class SVNLogDB(object):
         '''
         return self.dbcon.cursor()
 
+    def _begin(self):
+        '''
+        start a transaction if it is not already started.
+        '''
+        if(self._intransaction == False):
+            self.dbcon.execute("BEGIN")
+            self._intransaction = True
+
     def _commit(self):
         '''
         commit the running transaction at this point
         '''
         assert(self.dbcon != None)
         self.dbcon.commit()
+        self._intransaction = False
 
     def _rollback(self):
         assert(self.dbcon != None)
         self.dbcon.rollback()
+        self._intransaction = False
 
     def _close(self):
         self.dbcon.close()
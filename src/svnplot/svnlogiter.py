@@ -26,17 +26,35 @@ import tempfile
 from operator import itemgetter
 from StringIO import StringIO
 from svnlogclient import *
+from svnlogprofile import profiled
 from util import *
 
+# maximum number of files added/deleted in a revision for which line counts are computed from
+# a single revision diff.
+MAX_REVDIFF_ADDDEL_FILES = 10
+
 
 class SVNRevLogIter(object):
 
-    def __init__(self, logclient, startRevNo, endRevNo, cachesize=50, bUseFileDiff=False):
+    '''
+    iterate over the revision logs. Revision logs are queried in batches. The first batch contains
+    'cachesize' revisions. Size of later batches is adjusted (between mincachesize and maxcachesize)
+    so that one batch query takes approximately 'targetlatency' seconds and the batch is not
+    expected to contain more than 'maxchangedpaths' changed paths. Hence a revision with very large
+    number of changed paths (e.g. tag or vendor import) reduces the next batch size.
+    '''
+
+    def __init__(self, logclient, startRevNo, endRevNo, cachesize=50, bUseFileDiff=False,
+                 mincachesize=1, maxcachesize=500, maxchangedpaths=50000, targetlatency=5.0):
         self.logclient = logclient
         self.startrev = startRevNo
         self.endrev = endRevNo
         self.revlogcache = None
-        self.cachesize = cachesize
+        self.mincachesize = max(1, mincachesize)
+        self.maxcachesize = max(self.mincachesize, maxcachesize)
+        self.cachesize = min(max(cachesize, self.mincachesize), self.maxcachesize)
+        self.maxchangedpaths = maxchangedpaths
+        self.targetlatency = targetlatency
         self.bUseFileDiff = bUseFileDiff
 
     def __iter__(self):
@@ -49,14 +67,18 @@ class SVNRevLogIter(object):
             self.startrev = self.endrev
 
         while (self.startrev <= self.endrev):
-            logging.info("updating logs %d to %d" %
-                         (self.startrev, self.endrev))
+            logging.info("updating logs %d to %d (batch size %d)" %
+                         (self.startrev, self.endrev, self.cachesize))
+            starttime = time.time()
             self.revlogcache = self.logclient.getLogs(self.startrev, self.endrev,
                                                       cachesize=self.cachesize, detailedLog=True)
+            elapsed = time.time() - starttime
             if(self.revlogcache == None or len(self.revlogcache) == 0):
                 raise StopIteration
 
             self.startrev = self.revlogcache[-1].revision.number + 1
+            self.cachesize = self.getNextBatchSize(
+                self.cachesize, elapsed, self.revlogcache)
             for revlog in self.revlogcache:
                 # since reach revision log entry is a dictionary. If the dictionary is empty
                 # then log is not available or its end of log entries
@@ -64,8 +86,38 @@ class SVNRevLogIter(object):
                     raise StopIteration
                 svnrevlog = SVNRevLog(
                     self.logclient, revlog, self.bUseFileDiff)
+                self.logclient.addRevisionChanges(
+                    svnrevlog.revno, revlog.changed_paths)
                 yield svnrevlog
 
+    def getNextBatchSize(self, batchsize, elapsed, revlogs):
+        '''
+        compute the size of next batch from the time taken by the last batch query and the number
+        of changed paths in the revisions of last batch.
+        '''
+        revcount = len(revlogs)
+        maxrevpaths = 1
+        for revlog in revlogs:
+            try:
+                maxrevpaths = max(maxrevpaths, len(revlog.changed_paths))
+            except (AttributeError, KeyError):
+                pass
+
+        nextsize = batchsize
+        if(elapsed > 0 and revcount > 0):
+            # adjust the batch size to reach the target latency. But change it gradually so that
+            # one slow (or fast) query doesnot change the batch size drastically
+            nextsize = int(revcount * self.targetlatency / elapsed)
+            nextsize = max(batchsize / 2, min(batchsize * 2, nextsize))
+        # every revision in next batch may have as many changed paths as largest revision
+        # in the last batch.
+        nextsize = min(nextsize, self.maxchangedpaths / maxrevpaths)
+        nextsize = min(max(nextsize, self.mincachesize), self.maxcachesize)
+        if(nextsize != batchsize):
+            logging.debug("log batch size changed from %d to %d (%.2f sec, max %d changed paths)" %
+                          (batchsize, nextsize, elapsed, maxrevpaths))
+        return(nextsize)
+
 
 class SVNChangeEntry(object):
 
@@ -87,29 +139,41 @@ class SVNChangeEntry(object):
         Update the path type of change entry. 
         '''
         if('pathtype' not in self.changedpath):
-            filepath = self.filepath()
-            action = self.change_type()
-            revno = self.revno
-            if(action == 'D'):
-                # if change type is 'D' then reduce the 'revno' to
-                # appropriately detect the binary file type.
-                logging.debug("Found file deletion for <%s>" % filepath)
-                filepath = self.prev_filepath()
-                assert(filepath != None)
-                revno = self.prev_revno()
+            filepath, revno = self.getExistingPathRev()
+            assert(filepath != None)
 
             # see if directory check is alredy done on this path. If not, then
             # check with the repository
             pathtype = 'F'
             if(self.logclient.isDirectory(revno, filepath) == True):
                 pathtype = 'D'
-            self.changedpath['pathtype'] = pathtype
-            # filepath may changed in case of 'delete' action.
-            filepath = self.filepath()
-            if(pathtype == 'D' and not filepath.endswith('/')):
-                # if it is directory then add trailing '/' to the path to
-                # denote the directory.
-                self.changedpath['path'] = filepath + u'/'
+            self.setPathType(pathtype)
+
+    def hasPathType(self):
+        return('pathtype' in self.changedpath)
+
+    def setPathType(self, pathtype):
+        '''
+        set the path type ('F' or 'D') of the change entry.
+        '''
+        self.changedpath['pathtype'] = pathtype
+        filepath = self.filepath()
+        if(pathtype == 'D' and not filepath.endswith('/')):
+            # if it is directory then add trailing '/' to the path to
+            # denote the directory.
+            self.changedpath['path'] = filepath + u'/'
+
+    def getLogPathType(self):
+        '''
+        return the path type from the node kind in revision log ('node_kind' is returned by
+        subversion 1.6 and later servers). Returns None if node kind is not available.
+        '''
+        nodekind = self.changedpath.get('node_kind')
+        if(nodekind == pysvn.node_kind.dir):
+            return('D')
+        elif(nodekind == pysvn.node_kind.file):
+            return('F')
+        return(None)
 
     def isValidChange(self):
         '''
@@ -208,6 +272,22 @@ class SVNChangeEntry(object):
             pathtype == 'D' and self.filepath().endswith('/')))
         return(pathtype)
 
+    def getExistingPathRev(self):
+        '''
+        return (filepath, revno) where the path exists (e.g. to check the path type or the file
+        properties). For deleted paths, it is the path before deletion.
+        '''
+        revno = self.revno
+        filepath = self.filepath()
+
+        if(self.change_type() == 'D'):
+            # if change type is 'D' then reduce the 'revno' to
+            # appropriately detect the binary file type.
+            logging.debug("Found file deletion for <%s>" % filepath)
+            filepath = self.prev_filepath()
+            revno = self.prev_revno()
+        return(filepath, revno)
+
     def isBinaryFile(self):
         '''
         if the change is in a binary file.        
@@ -215,15 +295,7 @@ class SVNChangeEntry(object):
         binary = False
         # check detailed binary check only if the change entry is of a file.
         if(self.pathtype() == 'F'):
-            revno = self.revno
-            filepath = self.filepath()
-
-            if(self.change_type() == 'D'):
-                # if change type is 'D' then reduce the 'revno' to
-                # appropriately detect the binary file type.
-                logging.debug("Found file deletion for <%s>" % filepath)
-                filepath = self.prev_filepath()
-                revno = self.prev_revno()
+            filepath, revno = self.getExistingPathRev()
             binary = self.logclient.isBinaryFile(filepath, revno)
 
         return(binary)
@@ -313,6 +385,7 @@ class SVNRevLog(object):
             self.revlog = revnolog
         assert(self.revlog == None or isinstance(
             revnolog, pysvn.PysvnLog) == True)
+        self.__diffcountdict = None
         if(self.revlog):
             self.__normalizePaths()
             self.__updateCopyFromPaths()
@@ -338,43 +411,11 @@ class SVNRevLog(object):
 
     def __updateCopyFromPaths(self):
         '''
-        If you create a branch/tag from the working copy and working copy has 'deleted files or directories.
-        In this case, just lower revision number is not going to have that file in the same path and hence
-        we will get 'unknown node kind' error. Hence we have to update the 'copy from path' and 'copy
-        from revision' entries to the changed_path entries.
-        Check Issue 44.
+        update the 'copy from path' and 'copy from revision' of the changed paths inside the
+        copied directories. See util.updateCopyFromPaths
         '''
         assert(self.revlog is not None)
-        # First check if there are any additions with 'copy_from'
-
-        copyfrom = [(change['path'], change['copyfrom_path'], change['copyfrom_revision'])
-                    for change in self.revlog.changed_paths
-                    if(change['copyfrom_path'] != None and len(change['copyfrom_path']) > 0)]
-
-        if(len(copyfrom) > 0):
-            copyfrom = sorted(copyfrom, key=itemgetter(0), reverse=True)
-
-            for change in self.revlog.changed_paths:
-                # check other modified or deleted paths (i.e. all actions other
-                # than add)
-                if(change['action'] != 'A'):
-                    curfilepath = change['path']
-                    for curpath, copyfrompath, copyfromrev in copyfrom:
-                        # change the curpath to 'directory name'. otherwise it doesnot make sense to add a copy path entry
-                        # for example 'curpath' /trunk/xxx and there is also a deleted entry called '/trunk/xxxyyy'. then in such
-                        # case don't replace the 'copyfrom_path'. replace it
-                        # only if entry is '/trunk/xxx/yyy'
-                        if(not curpath.endswith('/')):
-                            curpath = curpath + '/'
-                        if(curfilepath.startswith(curpath) and change['copyfrom_path'] is None):
-                            # make sure that copyfrom path also ends with '/' since we are replacing directories
-                            # curpath ends with '/'
-                            if(not copyfrompath.endswith('/')):
-                                copyfrompath = copyfrompath + '/'
-                            assert(change['copyfrom_revision'] is None)
-                            change['copyfrom_path'] = normurlpath(
-                                curfilepath.replace(curpath, copyfrompath, 1))
-                            change['copyfrom_revision'] = copyfromrev
+        updateCopyFromPaths(self.revlog.changed_paths)
 
     def getChangeEntries(self):
         '''
@@ -393,6 +434,64 @@ class SVNRevLog(object):
             if change_entry.isDirectory() == False:
                 yield change_entry
 
+    @property
+    def profiler(self):
+        return(self.logclient.profiler)
+
+    @profiled('revlog.updatePathTypes')
+    def updatePathTypes(self):
+        '''
+        detect the path type (file or directory) of all the change entries. Path type is taken from
+        the revision log if the server returns the node kind. Otherwise paths which are parents of other
+        changed paths are directories and remaining paths are checked with one 'list' call per parent
+        directory (see SVNLogClient.getDirectoryFlags). Paths which still cannot be detected are checked
+        individually using the logclient worker pool.
+        '''
+        # parent directories of added/modified paths exist as directories in this revision.
+        parentdirs = set()
+        for change in self.revlog.changed_paths:
+            if(change['action'] != 'D'):
+                path = change['path'].rstrip('/')
+                while '/' in path:
+                    path = path.rsplit('/', 1)[0]
+                    parentdirs.add(path)
+
+        changelist = []
+        for change in self.getChangeEntries():
+            if(change.hasPathType() == False):
+                pathtype = change.getLogPathType()
+                if(pathtype == None and change.change_type() != 'D' and
+                   change.filepath().rstrip('/') in parentdirs):
+                    pathtype = 'D'
+                if(pathtype != None):
+                    change.setPathType(pathtype)
+                else:
+                    changelist.append(change)
+
+        if(len(changelist) > 1):
+            pathrevs = [change.getExistingPathRev() for change in changelist]
+            dirflags = self.logclient.getDirectoryFlags(pathrevs)
+            for change, pathrev in zip(changelist, pathrevs):
+                isDir = dirflags.get(pathrev)
+                if(isDir != None):
+                    change.setPathType('D' if isDir else 'F')
+
+        self.logclient.mapParallel(SVNChangeEntry.pathtype,
+                                   [change for change in changelist if change.hasPathType() == False])
+
+    def setPathTypes(self, pathtypes):
+        '''
+        set the path types which are already known (e.g. stored in the database), so that these
+        are not queried from the repository. pathtypes is dictionary of path -> 'F' or 'D'.
+        '''
+        for change in self.revlog.changed_paths:
+            path = change['path'].rstrip('/')
+            pathtype = pathtypes.get(path, pathtypes.get(path + '/'))
+            if(pathtype != None and 'pathtype' not in change):
+                change['pathtype'] = pathtype
+                if(pathtype == 'D'):
+                    change['path'] = path + u'/'
+
     def changedFileCount(self):
         '''includes directory and files. Initially I wanted to only add the changed file paths.
         however it is not possible to detect if the changed path is file or directory from the
@@ -407,6 +506,7 @@ class SVNRevLog(object):
         filesdeleted = 0
         logging.debug("Changed path count : %d" %
                       len(self.revlog.changed_paths))
+        self.updatePathTypes()
 
         for change in self.getChangeEntries():
             isdir = change.isDirectory()
@@ -431,7 +531,7 @@ class SVNRevLog(object):
         """
         diffCountDict = None
         if(bUpdLineCount == True):
-            diffCountDict = self.__updateDiffCount()
+            diffCountDict = self.__getDiffCountDict()
 
         # get change entries sorted in the order of actions, and then paths.
 
@@ -445,6 +545,16 @@ class SVNRevLog(object):
                 self.revno, filename, change.change_type(), linesadded, linesdeleted))
             yield change
 
+    def fetchDetails(self, bUpdLineCount=True):
+        '''
+        query all the data required from the repository for this revision (i.e. path types
+        and line counts). After this call, writing the revision to database doesnot require
+        any further calls to the repository.
+        '''
+        self.changedFileCount()
+        if(bUpdLineCount == True):
+            self.__getDiffCountDict()
+
     def getCopiedDirs(self):
         '''
         return a list of change entries where directory is added/replaced during
@@ -510,49 +620,77 @@ class SVNRevLog(object):
         if self.bUseFileDiff == True:
             return True
 
-        # repourl is not same as repository root (e.g. <root>/trunk) then we have to
-        # use the file revision diffs.
-        usefilerevdiff = True
-        if(self.logclient.isRepoUrlSameAsRoot()):
-            usefilerevdiff = False
+        # for local repositories (file://) repository calls are cheap. Hence use file level diff
+        usefilerevdiff = False
         rooturl = self.logclient.getRootUrl()
         if(rooturl.startswith('file://')):
             usefilerevdiff = True
         if(not usefilerevdiff):
-            # check if there are additions or deletions. If yes, then use 'file level diff' to
-            # avoid memory errors in large number of file additions or
-            # deletions.
+            # revision diff contains the full contents of added/deleted files and of all the files inside
+            # copied/deleted directories. Hence use 'file level diff' in such cases to avoid
+            # memory errors.
             fadded, fchanged, fdeleted = self.changedFileCount()
-            if(fadded > 1 or fdeleted > 1 or fchanged > 5):
+            if(fadded + fdeleted > MAX_REVDIFF_ADDDEL_FILES or len(self.getCopiedDirs()) > 0 or
+               len(self.getDeletedDirs()) > 0):
                 usefilerevdiff = True
 
-        # For the time being always return True, as in case of 'revision level' diff filenames returned
-        # in the diff are different than the filename returned by the svn log. hence this will result
-        # wrong linecount computation. So far, I don't have good fix for this condition. Hence falling
-        # back to using 'file level' diffs. This will result in multiple calls to repository and hence
-        # will be slower but linecount data will be  more reliable. -- Nitin (15 Dec 2010)
-        # usefilerevdiff=True
+        # Earlier (Dec 2010) revision level diff was not used as filenames returned in the diff are
+        # different than the filenames returned by the svn log. Now the diff paths are mapped to log
+        # paths (see svnlogclient.reconcileDiffPaths) and the files which still cannot be matched
+        # use the file level diff.
         return(usefilerevdiff)
 
+    def __getDiffCountDict(self):
+        '''
+        diff count is computed only once for a revision.
+        '''
+        if(self.__diffcountdict == None):
+            self.__diffcountdict = self.__updateDiffCount()
+        return(self.__diffcountdict)
+
+    @profiled('revlog.updateDiffCount')
     def __updateDiffCount(self):
         diffcountdict = dict()
         try:
             revno = self.getRevNo()
             logging.debug("Updating line count for revision %d" % revno)
-            if(self.__useFileRevDiff()):
-                logging.debug("Using file level revision diff")
-                for change in self.getChangeEntries():
-                    filename = change.filepath()
-                    diffcountdict[filename] = change.getDiffLineCount()
-            else:
-                # if the svnrepourl and root url are same then we can use 'revision level' diff calls
+            changelist = list(self.getChangeEntries())
+            if(self.logclient.filepropcache != None):
+                # binary file checks of all the files with batched properties queries.
+                self.logclient.prefetchFileProps([change.getExistingPathRev() for change in changelist
+                                                  if not change.isDirectory()])
+            if(not self.__useFileRevDiff()):
                 # get 'diff' of multiple files included in a 'revision' by a single svn api call.
-                # As All the changes are 'modifications' (M type) then directly call the 'getRevDiff'.
-                # getRevDiff fails if there are files added or 'deleted' and repository path is not
-                # the root path.
+                # Changed files which cannot be found in the diff are computed with file level diff.
                 logging.debug("Using entire revision diff at a time")
-                revdiff_log = self.logclient.getRevDiff(revno)
-                diffcountdict = getDiffLineCountDict(revdiff_log)
+                # line counts of the files with binary extensions are 0 (same as file level diff,
+                # see SVNLogClient.isBinaryFile). Hence these files are not included in the diff.
+                filepaths = []
+                for change in changelist:
+                    if(change.isDirectory() == False):
+                        if(change.getExistingPathRev()[0].endswith(self.logclient.binaryextlist)):
+                            diffcountdict[change.filepath()] = (0, 0)
+                        else:
+                            filepaths.append(change.filepath())
+                try:
+                    diffcountdict.update(self.logclient.getRevDiffLineCountDict(
+                        revno, filepaths))
+                except pysvn.ClientError, exp:
+                    # e.g. svnrepourl doesnot exist in previous revision.
+                    logging.debug("Revision diff failed for %d : %s" %
+                                  (revno, exp))
+                changelist = [change for change in changelist
+                              if change.filepath() not in diffcountdict]
+
+            if(len(changelist) > 0):
+                logging.debug("Using file level revision diff")
+                # diff/export/binary checks of individual files are independent of each
+                # other. Hence run them on the logclient worker pool. mapParallel returns
+                # the results in same order as change entries.
+                linecounts = self.logclient.mapParallel(
+                    SVNChangeEntry.getDiffLineCount, changelist)
+                for change, linecount in zip(changelist, linecounts):
+                    diffcountdict[change.filepath()] = linecount
 
         except Exception, expinst:
             logging.exception("Error in diffline count")
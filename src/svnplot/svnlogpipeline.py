@@ -0,0 +1,243 @@
+'''
+svnlogpipeline.py
+Copyright (C) 2009 Nitin Bhide (nitinbhide@gmail.com)
+
+This module is part of SVNPlot (http://code.google.com/p/svnplot) and is released under
+the New BSD License: http://www.opensource.org/licenses/bsd-license.php
+--------------------------------------------------------------------------------------
+
+Staged conversion pipeline for svnlog2sqlite. Conversion is split in three stages
+   1. fetch : one thread iterates over the revision logs (SVNRevLogIter)
+   2. enrich : 'N' worker threads query the path types and line counts from the repository
+   3. write : revisions are written to the database in the revision order.
+Stages are connected by bounded queues, so that the network and the database
+are busy at the same time while memory usage remains capped.
+'''
+
+import logging
+import threading
+import time
+import sys
+from Queue import Queue, Empty, Full
+
+# marks the end of the revision log stream in the queues
+_ENDMARKER = None
+
+
+class SVNLogPipelineStage(object):
+
+    '''
+    throughput counters of one pipeline stage
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.busytime = 0.0
+        self.__lock = threading.Lock()
+
+    def update(self, count, busytime):
+        with self.__lock:
+            self.count = self.count + count
+            self.busytime = self.busytime + busytime
+
+    def stats(self, elapsed):
+        '''
+        return dictionary of count, busy time and throughput (revisions/sec)
+        '''
+        rate = 0.0
+        if(elapsed > 0.0):
+            rate = self.count / elapsed
+        return(dict(count=self.count, busytime=self.busytime, rate=rate))
+
+
+class SVNLogPipeline(object):
+
+    '''
+    runs fetch, enrich and write stages concurrently.
+    revlogiter - iterable returning the revision log objects (in revision order).
+    enrichfunc - function called with the revision log in enrichment worker threads.
+    writefunc - function called with the revision log in the revision order. It is called
+        in the thread calling the 'run' function. Hence database connection created in the
+        calling thread can be used inside the writefunc.
+    numworkers - number of enrichment worker threads.
+    queuesize - maximum number of revisions waiting in each queue. Total number of revisions
+        in the pipeline are limited to 2*queuesize + numworkers.
+    '''
+
+    def __init__(self, revlogiter, enrichfunc, writefunc, numworkers=2, queuesize=50):
+        self.revlogiter = revlogiter
+        self.enrichfunc = enrichfunc
+        self.writefunc = writefunc
+        self.numworkers = max(1, numworkers)
+        self.queuesize = max(1, queuesize)
+        self.fetchqueue = Queue(self.queuesize)
+        self.writequeue = Queue(self.queuesize)
+        # revisions are enriched out of order. Writer stage keeps them till all previous
+        # revisions are written. Limit the total revisions 'in flight' so that
+        # one slow revision doesnot result in unlimited number of waiting revisions.
+        self.__inflight = threading.BoundedSemaphore(
+            2 * self.queuesize + self.numworkers)
+        self.__stopevent = threading.Event()
+        self.__pending = dict()
+        self.__error = None
+        self.__starttime = None
+        self.stages = [SVNLogPipelineStage('fetch'), SVNLogPipelineStage(
+            'enrich'), SVNLogPipelineStage('write')]
+
+    def run(self, progressfunc=None, progressinterval=10.0):
+        '''
+        run the pipeline till all the revisions are written. progressfunc (if given) is called
+        with the pipeline stats dictionary after every 'progressinterval' seconds.
+        Exceptions raised in any of the stages are raised again from this function.
+        '''
+        self.__starttime = time.time()
+        threads = [threading.Thread(target=self.__fetch, name='svnlogfetch')]
+        for idx in range(0, self.numworkers):
+            threads.append(threading.Thread(
+                target=self.__enrich, name='svnlogenrich%d' % idx))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            self.__write(progressfunc, progressinterval)
+        finally:
+            self.__stopevent.set()
+            # release the threads blocked on full queues
+            self.__drain(self.fetchqueue)
+            self.__drain(self.writequeue)
+            for thread in threads:
+                thread.join(1.0)
+
+        if(self.__error != None):
+            exc_type, exc_value, exc_tb = self.__error
+            raise exc_type, exc_value, exc_tb
+
+    def getStats(self):
+        '''
+        return the current queue depths and per stage throughput as dictionary
+        '''
+        elapsed = 0.0
+        if(self.__starttime != None):
+            elapsed = time.time() - self.__starttime
+        stats = dict(elapsed=elapsed, fetchqueue=self.fetchqueue.qsize(),
+                     writequeue=self.writequeue.qsize(), pending=len(self.__pending))
+        for stage in self.stages:
+            stats[stage.name] = stage.stats(elapsed)
+        return(stats)
+
+    def formatStats(self):
+        '''
+        return the stats as one line string.
+        '''
+        stats = self.getStats()
+        stagestr = ' '.join(['%s %d (%.2f rev/s)' % (stage.name, stats[stage.name]['count'],
+                                                     stats[stage.name]['rate']) for stage in self.stages])
+        return("%s | queues fetch %d write %d pending %d" %
+               (stagestr, stats['fetchqueue'], stats['writequeue'], stats['pending']))
+
+    def __setError(self):
+        if(self.__error == None):
+            self.__error = sys.exc_info()
+        self.__stopevent.set()
+
+    def __drain(self, queue):
+        try:
+            while True:
+                queue.get_nowait()
+        except Empty:
+            pass
+
+    def __put(self, queue, item):
+        '''
+        put the item in the queue. Give up if the pipeline is stopped.
+        '''
+        while not self.__stopevent.is_set():
+            try:
+                queue.put(item, True, 0.5)
+                return(True)
+            except Full:
+                # queue is full. Check the stop flag again
+                pass
+        return(False)
+
+    def __fetch(self):
+        fetchstage = self.stages[0]
+        seqno = 0
+        try:
+            starttime = time.time()
+            for revlog in self.revlogiter:
+                fetchstage.update(1, time.time() - starttime)
+                while not self.__inflight.acquire(False):
+                    if(self.__stopevent.wait(0.5)):
+                        return
+                if(not self.__put(self.fetchqueue, (seqno, revlog))):
+                    return
+                seqno = seqno + 1
+                starttime = time.time()
+        except:
+            logging.exception("Error in fetching revision logs")
+            self.__setError()
+        finally:
+            for idx in range(0, self.numworkers):
+                self.__put(self.fetchqueue, _ENDMARKER)
+
+    def __enrich(self):
+        enrichstage = self.stages[1]
+        try:
+            while not self.__stopevent.is_set():
+                try:
+                    item = self.fetchqueue.get(True, 0.5)
+                except Empty:
+                    continue
+                if(item == _ENDMARKER):
+                    break
+                seqno, revlog = item
+                starttime = time.time()
+                self.enrichfunc(revlog)
+                enrichstage.update(1, time.time() - starttime)
+                if(not self.__put(self.writequeue, (seqno, revlog))):
+                    break
+        except:
+            logging.exception("Error in enriching revision logs")
+            self.__setError()
+        finally:
+            self.__put(self.writequeue, _ENDMARKER)
+
+    def __write(self, progressfunc, progressinterval):
+        writestage = self.stages[2]
+        nextseqno = 0
+        runningworkers = self.numworkers
+        lastprogress = time.time()
+        while runningworkers > 0 and not self.__stopevent.is_set():
+            try:
+                item = self.writequeue.get(True, 0.5)
+            except Empty:
+                # no item in write queue. check the stop flag again.
+                continue
+            if(item == _ENDMARKER):
+                runningworkers = runningworkers - 1
+                continue
+            seqno, revlog = item
+            self.__pending[seqno] = revlog
+            # write all the revisions which are now in sequence.
+            while nextseqno in self.__pending:
+                revlog = self.__pending.pop(nextseqno)
+                starttime = time.time()
+                try:
+                    self.writefunc(revlog)
+                except:
+                    self.__setError()
+                    return
+                writestage.update(1, time.time() - starttime)
+                self.__inflight.release()
+                nextseqno = nextseqno + 1
+            if(progressfunc != None and time.time() - lastprogress > progressinterval):
+                progressfunc(self)
+                lastprogress = time.time()
+
+        if(self.__error == None and len(self.__pending) > 0):
+            # should never happen. All enriched revisions are written in sequence.
+            raise RuntimeError, "revisions %s were not written" % sorted(
+                self.__pending.keys())
@@ -0,0 +1,262 @@
+'''
+svnlogprofile.py
+Copyright (C) 2009 Nitin Bhide (nitinbhide@gmail.com)
+
+This module is part of SVNPlot (http://code.google.com/p/svnplot) and is released under
+the New BSD License: http://www.opensource.org/licenses/bsd-license.php
+--------------------------------------------------------------------------------------
+
+Optional instrumentation of the svnlog2sqlite conversion (enabled with --profile option).
+SVNProfiler collects the call count, total time, latency percentiles and bytes transferred
+for each operation type (repository calls like 'svn.diff', 'svn.info2' and database operations
+like 'db.addRevisionDetails'), the revisions/files converted per second over time and the peak
+memory usage. Summary is written as a JSON file and a one line progress report (with ETA) is
+printed on stderr periodically.
+'''
+
+import sys
+import os
+import time
+import json
+import threading
+import functools
+from array import array
+
+try:
+    import resource
+except ImportError:
+    # resource module is not available on windows. Peak memory is not reported.
+    resource = None
+
+
+def getPeakRSS():
+    '''
+    peak resident memory of the process in kilobytes (None if not available)
+    '''
+    if(resource == None):
+        return(None)
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if(sys.platform == 'darwin'):
+        # reported in bytes on Mac OS X
+        maxrss = maxrss / 1024
+    return(maxrss)
+
+
+def getResponseSize(response):
+    '''
+    approximate size of the repository call response in bytes (i.e. total length of the
+    strings in the response).
+    '''
+    if(isinstance(response, basestring)):
+        return(len(response))
+    if(isinstance(response, (list, tuple))):
+        return(sum([getResponseSize(item) for item in response]))
+    if(hasattr(response, 'items')):
+        return(sum([getResponseSize(item) for key, item in response.items()]))
+    return(0)
+
+
+def getPercentile(sortedvalues, percent):
+    '''
+    nearest rank percentile of the sorted values
+    '''
+    if(len(sortedvalues) == 0):
+        return(0.0)
+    rank = int(round(percent / 100.0 * len(sortedvalues) + 0.5)) - 1
+    return(sortedvalues[min(max(rank, 0), len(sortedvalues) - 1)])
+
+
+def formatDuration(seconds):
+    seconds = int(seconds)
+    return("%d:%02d:%02d" % (seconds / 3600, (seconds / 60) % 60, seconds % 60))
+
+
+def profiled(opname):
+    '''
+    decorator to record the time taken by the method in the profiler of the object
+    (i.e. 'self.profiler'). If the profiler is not set, method is called directly.
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            profiler = self.profiler
+            if(profiler == None):
+                return(func(self, *args, **kwargs))
+            starttime = time.time()
+            try:
+                return(func(self, *args, **kwargs))
+            finally:
+                profiler.addTiming(opname, time.time() - starttime)
+        return(wrapper)
+    return(decorator)
+
+
+class SVNProfileOp(object):
+
+    '''
+    timing data of one operation type.
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.totaltime = 0.0
+        self.bytes = 0
+        self.latencies = array('d')
+
+    def add(self, elapsed, nbytes):
+        self.count = self.count + 1
+        self.totaltime = self.totaltime + elapsed
+        self.bytes = self.bytes + nbytes
+        self.latencies.append(elapsed)
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        return({'count': self.count,
+                'total_sec': round(self.totaltime, 4),
+                'p50_ms': round(getPercentile(latencies, 50) * 1000, 3),
+                'p95_ms': round(getPercentile(latencies, 95) * 1000, 3),
+                'p99_ms': round(getPercentile(latencies, 99) * 1000, 3),
+                'max_ms': round(max(latencies or [0.0]) * 1000, 3),
+                'bytes': self.bytes})
+
+
+class SVNProfiler(object):
+
+    '''
+    collects the timing data of the conversion. Can be used from multiple threads (e.g. line
+    count workers and the pipeline stages).
+    '''
+
+    def __init__(self, outpath=None, interval=10.0, stream=sys.stderr):
+        self.outpath = outpath
+        self.interval = interval
+        self.stream = stream
+        self.ops = dict()
+        self.starttime = time.time()
+        self.totalrevs = 0
+        self.revcount = 0
+        self.filecount = 0
+        self.timeline = []
+        self.__lock = threading.Lock()
+        self.__lastreport = (self.starttime, 0, 0)
+
+    def addTiming(self, opname, elapsed, nbytes=0):
+        with self.__lock:
+            op = self.ops.get(opname)
+            if(op == None):
+                op = SVNProfileOp()
+                self.ops[opname] = op
+            op.add(elapsed, nbytes)
+
+    def setTotalRevisions(self, totalrevs):
+        '''
+        number of revisions to be converted (used to compute the ETA).
+        '''
+        self.totalrevs = totalrevs
+
+    def addRevision(self, filecount):
+        '''
+        update the revision/file count after a revision is converted and print the progress
+        after every 'interval' seconds.
+        '''
+        with self.__lock:
+            self.revcount = self.revcount + 1
+            self.filecount = self.filecount + filecount
+            if(time.time() - self.__lastreport[0] >= self.interval):
+                self.__addProgress()
+
+    def getSummary(self):
+        with self.__lock:
+            elapsed = max(time.time() - self.starttime, 1e-6)
+            ops = dict([(opname, op.summary())
+                        for opname, op in self.ops.items()])
+            return({'elapsed_sec': round(elapsed, 3),
+                    'revisions': self.revcount,
+                    'files': self.filecount,
+                    'revisions_per_sec': round(self.revcount / elapsed, 3),
+                    'files_per_sec': round(self.filecount / elapsed, 3),
+                    'peak_rss_kb': getPeakRSS(),
+                    'operations': ops,
+                    'timeline': list(self.timeline)})
+
+    def writeSummary(self):
+        '''
+        write the summary to the JSON file (if given) and print the operations sorted on total time.
+        '''
+        summary = self.getSummary()
+        if(self.outpath != None):
+            with open(self.outpath, 'w') as outfile:
+                json.dump(summary, outfile, indent=2, sort_keys=True)
+        ops = sorted(summary['operations'].items(),
+                     key=lambda item: item[1]['total_sec'], reverse=True)
+        for opname, op in ops:
+            print >> self.stream, "%-28s count %8d total %9.2fs p50 %8.2fms p95 %8.2fms p99 %8.2fms %12d bytes" % \
+                (opname, op['count'], op['total_sec'], op['p50_ms'],
+                 op['p95_ms'], op['p99_ms'], op['bytes'])
+        print >> self.stream, "%d revisions, %d files in %s (%.2f rev/s), peak memory %s KB" % \
+            (summary['revisions'], summary['files'], formatDuration(summary['elapsed_sec']),
+             summary['revisions_per_sec'], summary['peak_rss_kb'])
+        return(summary)
+
+    def __addProgress(self):
+        curtime = time.time()
+        lasttime, lastrevs, lastfiles = self.__lastreport
+        interval = max(curtime - lasttime, 1e-6)
+        revrate = (self.revcount - lastrevs) / interval
+        filerate = (self.filecount - lastfiles) / interval
+        peakrss = getPeakRSS()
+        self.timeline.append({'elapsed_sec': round(curtime - self.starttime, 3),
+                              'revisions': self.revcount, 'files': self.filecount,
+                              'revisions_per_sec': round(revrate, 3),
+                              'files_per_sec': round(filerate, 3),
+                              'peak_rss_kb': peakrss})
+        self.__lastreport = (curtime, self.revcount, self.filecount)
+
+        progress = "%d revisions" % self.revcount
+        eta = ''
+        if(self.totalrevs > 0):
+            progress = "%d/%d revisions (%.1f%%)" % (self.revcount, self.totalrevs,
+                                                     100.0 * self.revcount / self.totalrevs)
+            averagerate = self.revcount / max(curtime - self.starttime, 1e-6)
+            if(averagerate > 0):
+                eta = " ETA %s" % formatDuration(
+                    max(self.totalrevs - self.revcount, 0) / averagerate)
+        print >> self.stream, "%s %.1f rev/s %.1f files/s peak memory %s KB%s" % \
+            (progress, revrate, filerate, peakrss, eta)
+
+
+class SVNProfileClient(object):
+
+    '''
+    wrapper over pysvn client (or SVNRetryClient/SVNArchiveClient) which records the time taken
+    and the response size of every repository call as 'svn.<method name>'
+    '''
+
+    def __init__(self, client, profiler):
+        self.client = client
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if(not callable(attr)):
+            return(attr)
+
+        def profiledcall(*args, **kwargs):
+            starttime = time.time()
+            try:
+                response = attr(*args, **kwargs)
+            except:
+                # failed calls (e.g. path not found) also take time.
+                self.profiler.addTiming('svn.' + name, time.time() - starttime)
+                raise
+            elapsed = time.time() - starttime
+            if(name == 'export'):
+                destpath = kwargs.get('dest_path')
+                if(destpath == None):
+                    destpath = args[1]
+                nbytes = os.path.getsize(destpath)
+            else:
+                nbytes = getResponseSize(response)
+            self.profiler.addTiming('svn.' + name, elapsed, nbytes)
+            return(response)
+        return(profiledcall)
@@ -30,6 +30,8 @@ from matplotlib.font_manager import FontProperties
 
 import networkx as NX
 
+from svnlogdb import createSearchPathTable
+
 COOLINGRATE = 0.005 / 24.0  # degree per hour
 TEMPINCREMENT = 10.0  # degrees per commit
 
@@ -125,6 +127,10 @@ class SVNNetworkBase(NX.Graph):
         self.dbcon = sqlite3.connect(
             self._repodbpath, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
         try:
+            # ids of the paths matching the search path
+            cur = self.dbcon.cursor()
+            createSearchPathTable(cur, self._searchpath)
+            cur.close()
             self._getDeletedFilesList()
             self._addRevisionsSlow()
             print "Initial nodes in graph : %d" % self.number_of_nodes()
@@ -141,8 +147,8 @@ class SVNNetworkBase(NX.Graph):
     def _getDeletedFilesList(self):
         self._deletedFiles = set()
         cur = self.dbcon.cursor()
-        sqlquery = "select changedpath from SVNLogDetailVw where changedpath like '%s%%' and changetype=='D' \
-                    group by changedpath" % self._searchpath
+        sqlquery = "select changedpath from SVNLogDetailVw where changedpathid IN (SELECT pathid FROM SearchPaths) \
+                    and changetype=='D' group by changedpath"
         cur.execute(sqlquery)
 
         for changedpath in cur:
@@ -209,7 +215,7 @@ class SVNNetworkBase(NX.Graph):
     def _getMaxDate(self):
         cur = self.dbcon.cursor()
         sqlquery = "select max(commitdate) from SVNLog, SVNLogDetailVw \
-                  where SVNLog.revno= SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like '%s%%'"
+                  where SVNLog.revno= SVNLogDetailVw.revno and SVNLogDetailVw.changedpathid IN (SELECT pathid FROM SearchPaths)"
         cur.execute(sqlquery)
         row = cur.fetchone()
         maxdate = datetime.datetime.strptime(
@@ -297,8 +303,8 @@ class SVNNetworkBase(NX.Graph):
         # First add author and file connections.
         cur = self.dbcon.cursor()
         cur.execute("select SVNLog.author, SVNLogDetailVw.changedpath, count(*) as weight from SVNLog, SVNLogDetailVw \
-            where SVNLog.revno = SVNLogDetail.revno and SVNLogDetailVw.changedpath like '%s%%' \
-            group by SVNLog.author, SVNLogDetail.changedpath" % self._searchpath)
+            where SVNLog.revno = SVNLogDetail.revno and SVNLogDetailVw.changedpathid IN (SELECT pathid FROM SearchPaths) \
+            group by SVNLog.author, SVNLogDetail.changedpath")
         for author, filename, weight in cur:
             filenode = self.getFileNode(filename)
             authornode = self.getAuthorNode(author)
@@ -312,10 +318,9 @@ class SVNNetworkBase(NX.Graph):
         cur.execute("DROP VIEW IF EXISTS detail_view1")
         cur.execute("DROP VIEW IF EXISTS detail_view2")
         cur.execute("CREATE TEMP VIEW detail_view1 AS select SVNLogDetailVw.* from SVNLogDetailVw \
-                where SVNLogDetailVw.changedpath like '%s%%' \
-                " % self._searchpath)
+                where SVNLogDetailVw.changedpathid IN (SELECT pathid FROM SearchPaths)")
         cur.execute("CREATE TEMP VIEW detail_view2 AS select SVNLogDetailVw.* from SVNLogDetailVw \
-                where SVNLogDetailVw.changedpath like '%s%%'" % self._searchpath)
+                where SVNLogDetailVw.changedpathid IN (SELECT pathid FROM SearchPaths)")
         # now using the temporary view directly create edges and weights
         cur.execute('select detail_view1.changedpath,detail_view2.changedpath, count(*) as weight\
                 from detail_view1, detail_view2 where detail_view1.revno = detail_view2.revno \
@@ -336,8 +341,8 @@ class SVNNetworkBase(NX.Graph):
         cur = self.dbcon.cursor()
         cur.execute('select SVNLog.revno, date(SVNLog.commitdate) as "commitdate [date]", \
                     SVNLog.author, SVNLogDetailVw.changedpath from SVNLog, SVNLogDetailVw \
-            where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like "%s%%" \
-            order by SVNLog.revno ASC' % self._searchpath)
+            where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpathid IN (SELECT pathid FROM SearchPaths) \
+            order by SVNLog.revno ASC')
 
         prevrev = (-1, None, None, None)
         self.revfilelist = []
@@ -709,8 +714,8 @@ class SVNFileNetwork(SVNNetworkBase):
         logging.debug("From SVNFileNetwork.updateFileMetrics")
 
         cur = self.dbcon.cursor()
-        cur.execute("select count(*),changedpath from SVNLogDetailVw where changedpath like '%s%%'\
-            group by changedpath" % self._searchpath)
+        cur.execute("select count(*),changedpath from SVNLogDetailVw where changedpathid IN (SELECT pathid FROM SearchPaths) \
+            group by changedpath")
         for count, changedpath in cur:
             if(self._fileNodes.has_key(changedpath) == True):
                 self._fileNodes[changedpath].commitCount = count
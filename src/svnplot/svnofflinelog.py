@@ -0,0 +1,260 @@
+'''
+svnofflinelog.py
+Copyright (C) 2009 Nitin Bhide (nitinbhide@gmail.com)
+
+This module is part of SVNPlot (http://code.google.com/p/svnplot) and is released under
+the New BSD License: http://www.opensource.org/licenses/bsd-license.php
+--------------------------------------------------------------------------------------
+
+Revision log classes for the revision logs read from an 'offline' source (e.g. svnadmin
+dump file, 'svn log --xml' output or another svnlog database) instead of the repository. These classes implement the
+same interface as SVNRevLog and SVNChangeEntry classes from svnlogiter.py. Hence they can
+be added to svnlog database with the same code. Since all the values (path types, line counts)
+are already known, no calls to the repository are required.
+'''
+
+import logging
+import datetime
+from svnlogdb import SVNLogDB
+from util import *
+
+
+class SVNOfflineChangeEntry(object):
+
+    '''
+    one change log entry inside one offline revision log.
+    changedpath is a dictionary with same keys as pysvn changed_paths entry (i.e. 'action',
+    'path', 'copyfrom_path', 'copyfrom_revision') and with additional keys 'pathtype', 'lc_added'
+    and 'lc_deleted'. copyfrom_revision is revision number (integer) instead of pysvn.Revision.
+    Directory paths end with '/'. 'pathtype' is None if the path type is not known (e.g. 'kind' is
+    not available in 'svn log --xml' output)
+    '''
+
+    def __init__(self, parent, changedpath):
+        self.parent = parent
+        self.revno = parent.getRevNo()
+        self.changedpath = changedpath
+
+    def isValidChange(self):
+        return(True)
+
+    def is_branchtag(self):
+        '''
+        Is this entry represent a branch or tag.
+        '''
+        branchtag = False
+        if(self.changedpath['action'] == 'A'):
+            path = self.changedpath['copyfrom_path']
+            rev = self.changedpath['copyfrom_revision']
+            if(path != None or rev != None):
+                branchtag = True
+        return(branchtag)
+
+    def isDirectory(self):
+        return(self.pathtype() == 'D')
+
+    def change_type(self):
+        return(self.changedpath['action'])
+
+    def filepath(self):
+        return(normurlpath(self.changedpath['path']))
+
+    def prev_filepath(self):
+        prev_filepath = self.changedpath.get('copyfrom_path')
+        if(prev_filepath == None or len(prev_filepath) == 0):
+            prev_filepath = self.filepath()
+        return (prev_filepath)
+
+    def prev_revno(self):
+        prev_revno = self.changedpath.get('copyfrom_revision')
+        if(prev_revno == None):
+            prev_revno = self.revno - 1
+        return(prev_revno)
+
+    def filepath_unicode(self):
+        return(makeunicode(self.filepath()))
+
+    def lc_added(self):
+        return(self.changedpath.get('lc_added', 0))
+
+    def lc_deleted(self):
+        return(self.changedpath.get('lc_deleted', 0))
+
+    def setDiffLineCount(self, added, deleted):
+        self.changedpath['lc_added'] = added
+        self.changedpath['lc_deleted'] = deleted
+
+    def is_copied(self):
+        '''
+        return True if this change is copied from somewhere
+        '''
+        path = self.changedpath['copyfrom_path']
+        rev = self.changedpath['copyfrom_revision']
+        return(path != None and len(path) > 0 and rev != None)
+
+    def copyfrom_path(self):
+        '''
+        get corrected copy from path.
+        '''
+        path = self.changedpath['copyfrom_path']
+        if self.isDirectory() and path is not None and not path.endswith('/'):
+            path = path + '/'
+        return(makeunicode(path))
+
+    def copyfrom(self):
+        return(self.copyfrom_path(), self.changedpath['copyfrom_revision'])
+
+    def pathtype(self):
+        '''
+        path type is (F)ile or (D)irectory. None if path type is not known.
+        '''
+        pathtype = self.changedpath['pathtype']
+        assert(pathtype == None or pathtype == 'F' or (
+            pathtype == 'D' and self.filepath().endswith('/')))
+        return(pathtype)
+
+    def isBinaryFile(self):
+        return(self.changedpath.get('binary', False))
+
+    def getDiffLineCount(self):
+        return(self.lc_added(), self.lc_deleted())
+
+
+class SVNOfflineRevLog(object):
+
+    '''
+    revision log read from an offline source. 'date' is the commit time in seconds since epoch
+    (same as pysvn log) or datetime and changed_paths is a list of changed path dictionaries (see
+    SVNOfflineChangeEntry).
+    '''
+
+    def __init__(self, revno, author, date, message, changed_paths):
+        self.revno = revno
+        self.author = author
+        if(self.author == None):
+            self.author = ''
+        self.message = makeunicode(message)
+        if(self.message == None):
+            self.message = u''
+        self.date = date
+        if(date != None and not isinstance(date, datetime.datetime)):
+            self.date = seconds2datetime(date)
+        self.changed_paths = changed_paths
+        for change in self.changed_paths:
+            change['path'] = normurlpath(change['path'])
+            change['copyfrom_path'] = normurlpath(
+                change.get('copyfrom_path'))
+            change.setdefault('copyfrom_revision', None)
+        updateCopyFromPaths(self.changed_paths)
+
+    def isvalid(self):
+        '''
+        if the revision log is a valid log. Currently the log is invalid if the commit 'date' is not there.
+        '''
+        return(self.date != None)
+
+    def getRevNo(self):
+        return(self.revno)
+
+    def getChangeEntries(self):
+        for change in self.changed_paths:
+            yield SVNOfflineChangeEntry(self, change)
+
+    def getFileChangeEntries(self):
+        '''
+        filter the change entries to return only the file change entries. Entries with unknown
+        path type are not included.
+        '''
+        for change_entry in self.getChangeEntries():
+            if change_entry.pathtype() == 'F':
+                yield change_entry
+
+    def updatePathTypes(self):
+        pass
+
+    def fetchDetails(self, bUpdLineCount=True):
+        pass
+
+    def changedFileCount(self):
+        '''
+        return the number of files added, changed and deleted in this revision
+        '''
+        filesadded = 0
+        fileschanged = 0
+        filesdeleted = 0
+        for change in self.getFileChangeEntries():
+            action = change.change_type()
+            if(action == 'A'):
+                filesadded = filesadded + 1
+            elif(action == 'D'):
+                filesdeleted = filesdeleted + 1
+            else:
+                assert(action == 'M' or action == 'R')
+                fileschanged = fileschanged + 1
+        return(filesadded, fileschanged, filesdeleted)
+
+    def getDiffLineCount(self, bUpdLineCount=True):
+        '''
+        return the change entries. Line counts are already updated in the change entries.
+        '''
+        for change in self.getChangeEntries():
+            logging.debug("%d : %s : %s : %d : %d " % (
+                self.revno, change.filepath(), change.change_type(), change.lc_added(), change.lc_deleted()))
+            yield change
+
+    def getCopiedDirs(self):
+        '''
+        return a list of change entries where directory is added/replaced during
+        this revision changes.
+        '''
+        return [change for change in self.getChangeEntries()
+                if(change.is_copied() and change.isDirectory())]
+
+    def getDeletedDirs(self):
+        '''
+        return a list of change entries of where a directory is deleted
+        '''
+        return [change for change in self.getChangeEntries()
+                if(change.isDirectory() and change.change_type() == 'D')]
+
+    @property
+    def changedpathcount(self):
+        filesadded, fileschanged, filesdeleted = self.changedFileCount()
+        return(filesadded + fileschanged + filesdeleted)
+
+
+def getDBRevLog(db, revno, author=None, commitdate=None, msg=None):
+    '''
+    create SVNOfflineRevLog from the 'real' change entries of the revision stored in svnlog database
+    '''
+    changed_paths = [dict(path=path, action=changetype, copyfrom_path=copyfrompath,
+                          copyfrom_revision=copyfromrev, pathtype=pathtype,
+                          lc_added=linesadded, lc_deleted=linesdeleted)
+                     for path, changetype, copyfrompath, copyfromrev, pathtype, linesadded, linesdeleted
+                     in db.getRevisionDetails(revno)]
+    return(SVNOfflineRevLog(revno, author, commitdate, msg, changed_paths))
+
+
+class SVNLogDBIter(object):
+
+    '''
+    iterate over the revisions stored in one or more svnlog databases (e.g. shards created by
+    sharded conversion) in the given order of databases. Returns SVNOfflineRevLog objects with
+    the 'real' change entries (i.e. without the dummy entries)
+    '''
+
+    def __init__(self, dbpaths):
+        self.dbpaths = dbpaths
+
+    def __iter__(self):
+        return(self.next())
+
+    def next(self):
+        for dbpath in self.dbpaths:
+            db = SVNLogDB(dbpath=dbpath)
+            db.connect()
+            try:
+                for revno, commitdate, author, msg in db.getRevisions():
+                    yield getDBRevLog(db, revno, author, commitdate, msg)
+            finally:
+                db.close()
@@ -21,12 +21,16 @@ import re
 import math
 import operator
 from collections import Counter
+from contextlib import closing
 
 from util import *
+from svnlogdb import SVNLogDB, createSearchPathTable, getAuthorKey, getPathPrefixRange, getTopLevelPath
 
 COOLINGRATE = 0.06 / 24.0  # degree per hour
 TEMPINCREMENT = 10.0  # degrees per commit
 AMBIENT_TEMP = 1.1
+# number of revisions processed (and committed) together while updating the activity hotness
+ACTIVITY_CHUNK_REVS = 1000
 
 
 def getTemperatureAtTime(curTime, lastTime, lastTemp, coolingRate):
@@ -64,6 +68,10 @@ def _sqrt(num):
     return math.sqrt(num)
 
 
+# commitday column (date ordinal) is returned as datetime.date for columns named as 'xxx [dayordinal]'
+sqlite3.register_converter("dayordinal", lambda value: datetime.date.fromordinal(int(value)))
+
+
 def update_bin(binlist, binvalues, value):
     '''
     return the index of bin from the binlist, where the 'value' belongs.
@@ -160,6 +168,7 @@ class SVNStats(object):
         self.__startRev = None
         self.__endRev = None
         self.__endDate = None
+        self.__useDailyStats = False
         self.verbose = False
         self.bugfixkeywords = ['bug', 'fix']
         self.__invalidWordPattern = re.compile("\d+|an|the|me|my|we|you|he|she|it|are|is|am|\
@@ -174,6 +183,15 @@ class SVNStats(object):
         if(self.dbcon != None):
             self.closedb()
 
+        # statistics use SVNAuthors table, commit time columns of SVNLog table and daily rollup tables.
+        # These are added to the databases created by older versions when the database is connected
+        # with SVNLogDB.
+        if(self.__isOlderDatabase()):
+            logging.info("Updating the database %s created by older version" % self.svndbpath)
+            logdb = SVNLogDB(dbpath=self.svndbpath)
+            logdb.connect()
+            logdb.close()
+
         # InitSqlite
         self.dbcon = sqlite3.connect(
             self.svndbpath, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
@@ -187,6 +205,20 @@ class SVNStats(object):
 
         self.__init_start_end_revisions(firstrev, lastrev)
 
+    def __isOlderDatabase(self):
+        '''
+        return True if the database is created by older version (i.e. commit time columns or daily rollup
+        tables are not available)
+        '''
+        with closing(sqlite3.connect(self.svndbpath)) as dbcon:
+            cur = dbcon.cursor()
+            cur.execute("PRAGMA table_info(SVNLog)")
+            bHasCommitDay = 'commitday' in [row[1] for row in cur.fetchall()]
+            cur.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type='table' and name='SVNDailyPathStats'")
+            bHasDailyStats = cur.fetchone()[0] > 0
+        return(bHasCommitDay == False or bHasDailyStats == False)
+
     def __create_db_functions(self):
         '''
         create various database and aggregation functions required
@@ -199,30 +231,18 @@ class SVNStats(object):
         self.dbcon.create_function("sqrt", 1, _sqrt)
         self.dbcon.create_aggregate("deltastddev", 1, DeltaStdDev)
 
-        # it is possible, index is already there. in such cases ignore the
-        # exception
-        try:
-            # create an index based on author names as we need various author based
-            # statistics
-            self.cur.execute(
-                "CREATE TEMP INDEX SVNLogAuthIdx ON SVNLog (author ASC)")
-        except:
-            pass
-
     def __init_start_end_revisions(self, firstrev, lastrev):
         '''
         initialize the start and end revision numbers and start/end dates for queries 
         '''
-        self.cur.execute("select max(commitdate),min(commitdate) from SVNLog")
+        self.cur.execute("select max(commitday),min(commitday) from SVNLog")
         onedaydiff = datetime.timedelta(1)
         row = self.cur.fetchone()
         assert(row[0] != None)
         assert(row[1] != None)
 
-        self.__endDate = (
-            datetime.datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S") + onedaydiff).date()
-        self.__startDate = (
-            datetime.datetime.strptime(row[1], "%Y-%m-%d %H:%M:%S") - onedaydiff).date()
+        self.__endDate = datetime.date.fromordinal(row[0]) + onedaydiff
+        self.__startDate = datetime.date.fromordinal(row[1]) - onedaydiff
         self.cur.execute("select min(revno), max(revno) from SVNLog")
         row = self.cur.fetchone()
         onerev = row[0]
@@ -266,6 +286,22 @@ class SVNStats(object):
             #row = self.cur.fetchone()
             self.__startRev = firstrev
 
+    def __getDayBeforeEndDate(self, months):
+        '''
+        return the day number (date ordinal) of the date 'months' months before the end date.
+        '''
+        self.cur.execute("select date(?, ?)", (self.__endDate, '-%d month' % months))
+        return(datetime.datetime.strptime(self.cur.fetchone()[0], "%Y-%m-%d").toordinal())
+
+    def __getLocalTimeConverter(self):
+        '''
+        return the function converting commitepoch to the local time in the time zone used for the
+        commit time columns.
+        '''
+        self.cur.execute("select timezone from SVNTimeZone")
+        row = self.cur.fetchone()
+        return(localtimeconverter(row[0]))
+
     def closedb(self):
         if(self.dbcon != None):
             self.cur.close()
@@ -319,12 +355,18 @@ class SVNStats(object):
 
     def __createSearchParamView(self):
         '''
-        create temporary view with only the revisions matching the search parameters.
+        create temporary view with only the revisions matching the search parameters. Ids of the
+        paths matching the search path are stored in temporary table SearchPaths.
         '''
         assert(self.dbcon != None)
+        createSearchPathTable(self.cur, self.__searchpath)
+        # daily rollups (SVNDailyPathStats) are aggregated on top level paths. Hence these can be used
+        # only if the search path is root or a top level directory.
+        self.__useDailyStats = (self.__searchpath == '/' or
+                                (self.__searchpath.endswith('/') and getTopLevelPath(self.__searchpath) == self.__searchpath))
         self.cur.execute("DROP TABLE IF EXISTS search_view")
-        selQuery = "SELECT DISTINCT SVNLog.revno as revno from SVNLog, SVNLogDetailVw where (SVNLog.revno = SVNLogDetailVw.revno \
-                    and SVNLogDetailVw.changedpath like '%s%%'" % self.__searchpath
+        selQuery = "SELECT DISTINCT SVNLog.revno as revno from SVNLog, SVNLogDetail where (SVNLog.revno = SVNLogDetail.revno \
+                    and SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths) "
         if(self.__startRev != None):
             selQuery = selQuery + "and SVNLog.revno >= %s " % self.__startRev
         if(self.__endRev != None):
@@ -375,11 +417,23 @@ class SVNStats(object):
         for row in self.cur:
             yield row
 
+    def __getAuthorId(self, author):
+        '''
+        return the id of the author in SVNAuthors table (None if author is not found)
+        '''
+        self.cur.execute("select id from SVNAuthors where authorkey=?", (getAuthorKey(author),))
+        row = self.cur.fetchone()
+        if(row == None):
+            return(None)
+        return(row[0])
+
     def getAuthorList(self, numAuthors=None):
         # Find out the unique developers and their number of commit sorted in
         # 'descending' order
-        self.cur.execute("select SVNLog.author, count(*) as commitcount from SVNLog, search_view \
-                        where search_view.revno = SVNLog.revno group by SVNLog.author COLLATE NOCASE order by commitcount desc")
+        self.cur.execute("select SVNAuthors.name, commitcount from SVNAuthors, \
+                        (select SVNLog.authorid as authorid, count(*) as commitcount from SVNLog, search_view \
+                        where search_view.revno = SVNLog.revno group by SVNLog.authorid) as AuthorCommits \
+                        where SVNAuthors.id = AuthorCommits.authorid order by commitcount desc")
 
         # get the auhor list (ignore commitcount) and store it. Since LogGraphLineByDev also does an sql query. It will otherwise
         # get overwritten
@@ -401,13 +455,13 @@ class SVNStats(object):
         returns two lists (commit counts and weekday)
         '''
         if(months == None):
-            query = "select strftime('%w', SVNLog.commitdate, 'localtime') as dayofweek, count(SVNLog.revno) from SVNLog, search_view \
-                         where search_view.revno=SVNLog.revno group by dayofweek"
+            query = "select SVNLog.commitweekday as dayofweek, count(SVNLog.revno) from SVNLog, search_view \
+                         where search_view.revno=SVNLog.revno group by SVNLog.commitweekday"
 
         else:
-            query = "select strftime('%%w', SVNLog.commitdate, 'localtime') as dayofweek, count(SVNLog.revno) from SVNLog, search_view \
-                         where search_view.revno=SVNLog.revno and date('%s', '-%d month') < SVNLog.commitdate \
-                        group by dayofweek" % (self.__endDate, months)
+            query = "select SVNLog.commitweekday as dayofweek, count(SVNLog.revno) from SVNLog, search_view \
+                         where search_view.revno=SVNLog.revno and SVNLog.commitday >= %d \
+                        group by SVNLog.commitweekday" % self.__getDayBeforeEndDate(months)
 
         self.cur.execute(query)
 
@@ -431,13 +485,13 @@ class SVNStats(object):
         returns two lists (commit counts and time of day)
         '''
         if(months == None):
-            query = "select strftime('%H', SVNLog.commitdate,'localtime') as hourofday, count(SVNLog.revno) from SVNLog, search_view \
-                          where search_view.revno=SVNLog.revno group by hourofday"
+            query = "select SVNLog.commithour as hourofday, count(SVNLog.revno) from SVNLog, search_view \
+                          where search_view.revno=SVNLog.revno group by SVNLog.commithour"
 
         else:
-            query = "select strftime('%%H', SVNLog.commitdate,'localtime') as hourofday, count(SVNLog.revno) from SVNLog, search_view \
-                          where search_view.revno=SVNLog.revno and date('%s', '-%d month') < SVNLog.commitdate \
-                          group by hourofday " % (self.__endDate, months)
+            query = "select SVNLog.commithour as hourofday, count(SVNLog.revno) from SVNLog, search_view \
+                          where search_view.revno=SVNLog.revno and SVNLog.commitday >= %d \
+                          group by SVNLog.commithour" % self.__getDayBeforeEndDate(months)
 
         self.cur.execute(query)
         commits = dict()
@@ -457,10 +511,9 @@ class SVNStats(object):
         '''
         get pivot table of number of commits for weekday and hour combination
         '''
-        self.cur.execute("select strftime('%w', SVNLog.commitdate,'localtime') as weekday, \
-                         strftime('%H', SVNLog.commitdate,'localtime') as hourofday, \
+        self.cur.execute("select SVNLog.commitweekday as weekday, SVNLog.commithour as hourofday, \
                          count(SVNLog.revno) from SVNLog, search_view \
-                          where search_view.revno=SVNLog.revno group by weekday, hourofday")
+                          where search_view.revno=SVNLog.revno group by SVNLog.commitweekday, SVNLog.commithour")
         commits = dict()
         for weekday, hrofday, commitcount in self.cur:
             commits[(int(weekday), int(hrofday))] = commitcount
@@ -488,20 +541,24 @@ class SVNStats(object):
 # where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like ? \
 # group by "commitdate [date]" order by commitdate ASC', (self.sqlsearchpath,))
 
-        # create a temporary view with file counts for given change type for a
-        # revision
-        self.cur.execute('DROP TABLE IF EXISTS filestats')
-        self.cur.execute('CREATE TEMP TABLE filestats AS \
-                select SVNLogDetailVw.revno as revno, count(*) as addcount, 0 as delcount from SVNLogDetailVw where changetype= "A" and changedpath like "%s" and pathtype= "F" group by revno\
-                UNION \
-                select SVNLogDetailVw.revno as revno, 0 as addcount, count(*) as delcount from SVNLogDetailVw where changetype= "D" and changedpath like "%s" and pathtype= "F" group by revno'
-                         % (self.sqlsearchpath, self.sqlsearchpath))
-        self.cur.execute('CREATE INDEX filestatsidx ON filestats(revno)')
-        self.dbcon.commit()
-        self.cur.execute('select date(SVNLog.commitdate,"localtime") as "commitdate [date]", \
-                    total(filestats.addcount), total(filestats.delcount) \
-                    from SVNLog, filestats where SVNLog.revno = filestats.revno \
-                    group by "commitdate [date]" order by commitdate')
+        if(self.__useDailyStats == True):
+            self.cur.execute('select commitday as "commitdate [dayordinal]", total(filesadded), total(filesdeleted) \
+                    from SVNDailyPathStats where toppathid IN (SELECT pathid FROM SearchPaths) \
+                    group by commitday having total(filesadded) > 0 or total(filesdeleted) > 0 order by commitday')
+        else:
+            # create a temporary view with file counts for given change type for a
+            # revision
+            self.cur.execute('DROP TABLE IF EXISTS filestats')
+            self.cur.execute('CREATE TEMP TABLE filestats AS \
+                    select SVNLogDetail.revno as revno, count(*) as addcount, 0 as delcount from SVNLogDetail where changetype= "A" and changedpathid IN (SELECT pathid FROM SearchPaths) and pathtype= "F" group by revno\
+                    UNION \
+                    select SVNLogDetail.revno as revno, 0 as addcount, count(*) as delcount from SVNLogDetail where changetype= "D" and changedpathid IN (SELECT pathid FROM SearchPaths) and pathtype= "F" group by revno')
+            self.cur.execute('CREATE INDEX filestatsidx ON filestats(revno)')
+            self.dbcon.commit()
+            self.cur.execute('select SVNLog.commitday as "commitdate [dayordinal]", \
+                        total(filestats.addcount), total(filestats.delcount) \
+                        from SVNLog, filestats where SVNLog.revno = filestats.revno \
+                        group by SVNLog.commitday order by SVNLog.commitday')
         dates = []
         fc = []
         totalfiles = 0
@@ -543,11 +600,11 @@ class SVNStats(object):
 
         self.cur.execute("select ftype, (total(addedfiles)-total(deletedfiles)) as typecount from \
                          (select filetype(changedpath) as ftype, count(*) as addedfiles, 0 as deletedfiles from SVNLogDetailVw \
-                         where SVNLogDetailVw.changedpath like ? and pathtype == 'F' and changetype= 'A' group by ftype\
+                         where SVNLogDetailVw.changedpathid IN (SELECT pathid FROM SearchPaths) and pathtype == 'F' and changetype= 'A' group by ftype\
                          UNION ALL \
                          select filetype(changedpath) as ftype, 0 as addedfiles, count(*) as deletedfiles from SVNLogDetailVw \
-                         where SVNLogDetailVw.changedpath like ? and pathtype == 'F' and changetype= 'D' group by ftype\
-                         ) group by ftype order by typecount DESC limit 0,?", (self.sqlsearchpath, self.sqlsearchpath, numTypes))
+                         where SVNLogDetailVw.changedpathid IN (SELECT pathid FROM SearchPaths) and pathtype == 'F' and changetype= 'D' group by ftype\
+                         ) group by ftype order by typecount DESC limit 0,?", (numTypes,))
 
         ftypelist = []
         ftypecountlist = []
@@ -564,17 +621,22 @@ class SVNStats(object):
         get statistics of how average LoC is changing over time.
         returns two lists (dates and average loc on that date)
         '''
-        self.cur.execute('select commitdate as "commitdate [date]", sum(linesadded), sum(linesdeleted), total(addedfiles), total(deletedfiles) from \
-                    (select date(SVNLog.commitdate,"localtime") as commitdate, total(SVNLogDetailVw.linesadded) as LinesAdded, total(SVNLogDetailVw.linesdeleted) as LinesDeleted, \
-                        0 as addedfiles, 0 as deletedfiles from SVNLogDetailVw, SVNLog where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like ? group by commitdate \
-                        UNION ALL \
-                         select commitdate, 0 as linesadded, 0 as linesdeleted, total(addedfiles) as addedfiles, total(deletedfiles) as deletedfiles from \
-                             (select date(SVNLog.commitdate,"localtime") as commitdate, count(*) as addedfiles, 0 as deletedfiles from SVNLog, SVNLogDetailVw \
-                             where SVNLog.revno=SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like ? and SVNLogDetailVw.changetype="A" and SVNLogDetailVw.pathtype= "F" group by commitdate \
-                            union all \
-                            select date(SVNLog.commitdate,"localtime") as commitdate, 0 as addedfiles, count(*) as deletedfiles from SVNLog, SVNLogDetailVw \
-                             where SVNLog.revno=SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like ? and SVNLogDetailVw.changetype="D" and SVNLogDetailVw.pathtype= "F" group by commitdate) group by commitdate) \
-                            group by commitdate order by commitdate ASC', (self.sqlsearchpath, self.sqlsearchpath, self.sqlsearchpath))
+        if(self.__useDailyStats == True):
+            self.cur.execute('select commitday as "commitdate [dayordinal]", total(linesadded), total(linesdeleted), \
+                        total(filesadded), total(filesdeleted) from SVNDailyPathStats \
+                        where toppathid IN (SELECT pathid FROM SearchPaths) group by commitday order by commitday ASC')
+        else:
+            self.cur.execute('select commitdate as "commitdate [dayordinal]", sum(linesadded), sum(linesdeleted), total(addedfiles), total(deletedfiles) from \
+                        (select SVNLog.commitday as commitdate, total(SVNLogDetail.linesadded) as LinesAdded, total(SVNLogDetail.linesdeleted) as LinesDeleted, \
+                            0 as addedfiles, 0 as deletedfiles from SVNLogDetail, SVNLog where SVNLog.revno = SVNLogDetail.revno and SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths) group by commitdate \
+                            UNION ALL \
+                             select commitdate, 0 as linesadded, 0 as linesdeleted, total(addedfiles) as addedfiles, total(deletedfiles) as deletedfiles from \
+                                 (select SVNLog.commitday as commitdate, count(*) as addedfiles, 0 as deletedfiles from SVNLog, SVNLogDetail \
+                                 where SVNLog.revno=SVNLogDetail.revno and SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths) and SVNLogDetail.changetype="A" and SVNLogDetail.pathtype= "F" group by commitdate \
+                                union all \
+                                select SVNLog.commitday as commitdate, 0 as addedfiles, count(*) as deletedfiles from SVNLog, SVNLogDetail \
+                                 where SVNLog.revno=SVNLogDetail.revno and SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths) and SVNLogDetail.changetype="D" and SVNLogDetail.pathtype= "F" group by commitdate) group by commitdate) \
+                                group by commitdate order by commitdate ASC')
         dates = []
         avgloclist = []
         avgloc = 0
@@ -603,10 +665,11 @@ class SVNStats(object):
         numAuthors - number authors to return depending on the contribution of authors. 
         returns four lists (authors, percentage of added files, percentage of changed files and percentage of deleted files)
         '''
-        self.cur.execute("select SVNLog.author, sum(SVNLog.addedfiles), sum(SVNLog.changedfiles), \
-                         sum(SVNLog.deletedfiles), count(distinct SVNLog.revno) as commitcount from SVNLog, SVNLogDetailVw \
-                         where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like ? \
-                         group by SVNLog.author COLLATE NOCASE order by commitcount DESC LIMIT 0, ?", (self.sqlsearchpath, numAuthors,))
+        self.cur.execute("select SVNAuthors.name, sum(SVNLog.addedfiles), sum(SVNLog.changedfiles), \
+                         sum(SVNLog.deletedfiles), count(distinct SVNLog.revno) as commitcount from SVNLog, SVNLogDetail, SVNAuthors \
+                         where SVNLog.revno = SVNLogDetail.revno and SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths) \
+                         and SVNAuthors.id = SVNLog.authorid \
+                         group by SVNLog.authorid order by commitcount DESC LIMIT 0, ?", (numAuthors,))
 
         authlist = []
         addfraclist = []
@@ -643,11 +706,11 @@ class SVNStats(object):
 
         self.cur.execute('select dirpath, total(addedfiles) as addedfiles, total(deletedfiles) as deletedfiles from \
                              (select dirname(?, changedpath, ?) as dirpath, count(*) as addedfiles, 0 as deletedfiles from SVNLog, SVNLogDetailVw \
-                             where SVNLog.revno=SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like ? and SVNLogDetailVw.changetype="A" and SVNLogDetailVw.pathtype= "F" group by dirpath \
+                             where SVNLog.revno=SVNLogDetailVw.revno and SVNLogDetailVw.changedpathid IN (SELECT pathid FROM SearchPaths) and SVNLogDetailVw.changetype="A" and SVNLogDetailVw.pathtype= "F" group by dirpath \
                             union all \
                             select dirname(?, changedpath, ?) as dirpath, 0 as addedfiles, count(*) as deletedfiles from SVNLog, SVNLogDetailVw \
-                             where SVNLog.revno=SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like ? and SVNLogDetailVw.changetype="D" and SVNLogDetailVw.pathtype= "F" group by dirpath) \
-                            group by dirpath', (self.searchpath, dirdepth, self.sqlsearchpath, self.searchpath, dirdepth, self.sqlsearchpath))
+                             where SVNLog.revno=SVNLogDetailVw.revno and SVNLogDetailVw.changedpathid IN (SELECT pathid FROM SearchPaths) and SVNLogDetailVw.changetype="D" and SVNLogDetailVw.pathtype= "F" group by dirpath) \
+                            group by dirpath', (self.searchpath, dirdepth, self.searchpath, dirdepth))
 
         dirinfolist = []
         for dirname, addedfiles, deletedfiles in self.cur:
@@ -686,8 +749,8 @@ class SVNStats(object):
         '''
         self.cur.execute("select dirname(?, SVNLogDetailVw.changedpath, ?) as dirpath, sum(SVNLogDetailVw.linesadded), \
                          sum(SVNLogDetailVw.linesdeleted) from SVNLog, SVNLogDetailVw \
-                    where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like ? \
-                    group by dirpath", (self.searchpath, dirdepth, self.sqlsearchpath,))
+                    where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpathid IN (SELECT pathid FROM SearchPaths) \
+                    group by dirpath", (self.searchpath, dirdepth,))
 
         dirinfolist = []
         totalloc = 0
@@ -729,8 +792,8 @@ class SVNStats(object):
         gets the directory names upto depth (dirdepth) relative to searchpath.
         returns one list of directory names
         '''
-        self.cur.execute("select dirname(?, changedpath, ?) as dirpath from SVNLogDetailVw where changedpath like ? \
-                         group by dirpath", (self.searchpath, dirdepth, self.sqlsearchpath,))
+        self.cur.execute("select dirname(?, changedpath, ?) as dirpath from SVNLogDetailVw where changedpathid IN (SELECT pathid FROM SearchPaths) \
+                         group by dirpath", (self.searchpath, dirdepth,))
 
         dirlist = [dirname for dirname, in self.cur]
         return(dirlist)
@@ -739,10 +802,15 @@ class SVNStats(object):
         '''
         returns two lists (dates and total line count on that date)
         '''
-        self.cur.execute('select date(SVNLog.commitdate,"localtime") as "commitdate [date]", sum(SVNLogDetailVw.linesadded), sum(SVNLogDetailVw.linesdeleted) \
-                         from SVNLog, SVNLogDetailVw \
-                         where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like ? \
-                         group by "commitdate [date]" order by commitdate ASC', (self.sqlsearchpath,))
+        if(self.__useDailyStats == True):
+            self.cur.execute('select commitday as "commitdate [dayordinal]", sum(linesadded), sum(linesdeleted) \
+                         from SVNDailyPathStats where toppathid IN (SELECT pathid FROM SearchPaths) \
+                         group by commitday order by commitday ASC')
+        else:
+            self.cur.execute('select SVNLog.commitday as "commitdate [dayordinal]", sum(SVNLogDetail.linesadded), sum(SVNLogDetail.linesdeleted) \
+                         from SVNLog, SVNLogDetail \
+                         where SVNLog.revno = SVNLogDetail.revno and SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths) \
+                         group by SVNLog.commitday order by SVNLog.commitday ASC')
         dates = []
         loc = []
         totalloc = 0
@@ -773,10 +841,15 @@ class SVNStats(object):
         returns two lists (dates and churn data on that date)
         churn - total number of lines modifed (i.e. lines added + lines deleted + lines changed)
         '''
-        self.cur.execute('select date(SVNLog.commitdate,"localtime") as "commitdate [date]", sum(SVNLogDetailVw.linesadded+SVNLogDetailVw.linesdeleted) as churn \
-                         from SVNLog, SVNLogDetailVw \
-                         where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like ? \
-                         group by "commitdate [date]" order by commitdate ASC', (self.sqlsearchpath,))
+        if(self.__useDailyStats == True):
+            self.cur.execute('select commitday as "commitdate [dayordinal]", sum(linesadded+linesdeleted) as churn \
+                         from SVNDailyPathStats where toppathid IN (SELECT pathid FROM SearchPaths) \
+                         group by commitday order by commitday ASC')
+        else:
+            self.cur.execute('select SVNLog.commitday as "commitdate [dayordinal]", sum(SVNLogDetail.linesadded+SVNLogDetail.linesdeleted) as churn \
+                         from SVNLog, SVNLogDetail \
+                         where SVNLog.revno = SVNLogDetail.revno and SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths) \
+                         group by SVNLog.commitday order by SVNLog.commitday ASC')
         dates = []
         churnloclist = []
         tocalloc = 0
@@ -792,12 +865,11 @@ class SVNStats(object):
         gets LoC trend data for directory 'dirname'.
         returns two lists (dates and total LoC at that date) for the directory 'dirname'
         '''
-        sqlQuery = 'select date(SVNLog.commitdate,"localtime") as "commitdate [date]", \
-                        sum(SVNLogDetailVw.linesadded), sum(SVNLogDetailVw.linesdeleted) from SVNLog, SVNLogDetailVw \
-                         where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like "%s%%" \
-                         group by "commitdate [date]" order by commitdate ASC' % (dirname)
-
-        self.cur.execute(sqlQuery)
+        createSearchPathTable(self.cur, dirname, 'DirPaths')
+        self.cur.execute('select SVNLog.commitday as "commitdate [dayordinal]", \
+                        sum(SVNLogDetail.linesadded), sum(SVNLogDetail.linesdeleted) from SVNLog, SVNLogDetail \
+                         where SVNLog.revno = SVNLogDetail.revno and SVNLogDetail.changedpathid IN (SELECT pathid FROM DirPaths) \
+                         group by SVNLog.commitday order by SVNLog.commitday ASC')
         dates = []
         dirsizelist = []
         dirsize = 0
@@ -829,8 +901,10 @@ class SVNStats(object):
         get the commit activit by hour of day stats for author 'author'
         returns two lists (dates , time at which commits happened on that date) for author.
         '''
-        self.cur.execute('select strftime("%H", SVNLog.commitdate,"localtime"), date(SVNLog.commitdate,"localtime") as "commitdate [date]" \
-                    from SVNLog, search_view where search_view.revno=SVNLog.revno and SVNLog.author=? group by commitdate order by commitdate ASC', (author,))
+        self.cur.execute('select SVNLog.commithour, SVNLog.commitday as "commitdate [dayordinal]" \
+                    from SVNLog, search_view where search_view.revno=SVNLog.revno and SVNLog.authorid=? \
+                    group by SVNLog.commitepoch order by SVNLog.commitepoch ASC',
+                         (self.__getAuthorId(author),))
 
         dates = []
         committimelist = []
@@ -844,10 +918,15 @@ class SVNStats(object):
         get the trend of LoC contributed by the author 'author'
         return two lists (dates and loc on that date) contributed by the author
         '''
-        self.cur.execute('select date(SVNLog.commitdate,"localtime") as "commitdate [date]", sum(SVNLogDetailVw.linesadded),\
-                        sum(SVNLogDetailVw.linesdeleted) from SVNLog, SVNLogDetailVw \
-                         where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like ? and SVNLog.author=? \
-                         group by "commitdate [date]" order by commitdate ASC', (self.sqlsearchpath, author,))
+        if(self.__useDailyStats == True):
+            self.cur.execute('select commitday as "commitdate [dayordinal]", sum(linesadded), sum(linesdeleted) \
+                         from SVNDailyPathStats where toppathid IN (SELECT pathid FROM SearchPaths) and authorid=? \
+                         group by commitday order by commitday ASC', (self.__getAuthorId(author),))
+        else:
+            self.cur.execute('select SVNLog.commitday as "commitdate [dayordinal]", sum(SVNLogDetail.linesadded),\
+                        sum(SVNLogDetail.linesdeleted) from SVNLog, SVNLogDetail \
+                         where SVNLog.revno = SVNLogDetail.revno and SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths) and SVNLog.authorid=? \
+                         group by SVNLog.commitday order by SVNLog.commitday ASC', (self.__getAuthorId(author),))
         dates = []
         loc = []
         totalloc = 0
@@ -881,12 +960,15 @@ class SVNStats(object):
         is returned.
         returns 3 lists (date, total linesadded, total lines deleted, waste ratio)        
         '''
-        sqlquery = '''select date(SVNLog.commitdate,"localtime") as "commitdate [date]",
-            sum(linesadded), sum(linesdeleted) from SVNLog, SVNLogDetailVw
-            where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like "%s" 
-                        group by "commitdate [date]" order by commitdate ASC'''
-
-        sqlquery = sqlquery % self.sqlsearchpath
+        if(self.__useDailyStats == True):
+            sqlquery = '''select commitday as "commitdate [dayordinal]",
+                sum(linesadded), sum(linesdeleted) from SVNDailyPathStats
+                where toppathid IN (SELECT pathid FROM SearchPaths) group by commitday order by commitday ASC'''
+        else:
+            sqlquery = '''select SVNLog.commitday as "commitdate [dayordinal]",
+                sum(linesadded), sum(linesdeleted) from SVNLog, SVNLogDetail
+                where SVNLog.revno = SVNLogDetail.revno and SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths)
+                            group by SVNLog.commitday order by SVNLog.commitday ASC'''
 
         dates = []
         linesadded = []
@@ -917,9 +999,9 @@ class SVNStats(object):
         like 'bug', 'fix' etc.
         returns three lists (dates, total line count on that date, churn count on that date)
         '''
-        sqlquery = 'select date(SVNLog.commitdate,"localtime") as "commitdate [date]", count(*) as commitfilecount \
-                         from SVNLog, SVNLogDetailVw where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like "%s" \
-                         and %s group by "commitdate [date]" order by commitdate ASC' % (self.sqlsearchpath, self.__sqlForbugFixKeywordsInMsg())
+        sqlquery = 'select SVNLog.commitday as "commitdate [dayordinal]", count(*) as commitfilecount \
+                         from SVNLog, SVNLogDetail where SVNLog.revno = SVNLogDetail.revno and SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths) \
+                         and %s group by SVNLog.commitday order by SVNLog.commitday ASC' % self.__sqlForbugFixKeywordsInMsg()
 
         self.cur.execute(sqlquery)
         dates = []
@@ -968,8 +1050,8 @@ class SVNStats(object):
         get word frequency of log messages. Common words like 'a', 'the' are removed.
         returns a dictionary with words as key and frequency of occurance as value
         '''
-        self.cur.execute("select SVNLog.msg from SVNLog, SVNLogDetailVw where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like ? \
-                         group by SVNLogDetailVw.revno", (self.sqlsearchpath,))
+        self.cur.execute("select SVNLog.msg from SVNLog where SVNLog.revno IN \
+                         (select SVNLogDetail.revno from SVNLogDetail where SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths))")
 
         wordFreq = Counter()
         pattern = re.compile('\s+', re.UNICODE)
@@ -1000,9 +1082,9 @@ class SVNStats(object):
         '''
         authset = set(self.getAuthorList(numTopAuthors))
 
-        self.cur.execute('select SVNLog.revno, SVNLog.author, SVNLog.commitdate as "commitdate [timestamp]" from SVNLog,SVNLogDetailVw \
-                         where SVNLog.revno = SVNLogDetailVw.revno and SVNLogDetailVw.changedpath like ? \
-                         group by SVNLogDetailVw.revno order by SVNLogDetailVw.revno ASC', (self.sqlsearchpath,))
+        self.cur.execute('select SVNLog.revno, SVNAuthors.name, SVNLog.commitepoch from SVNLog,SVNAuthors \
+                         where SVNLog.revno IN (select SVNLogDetail.revno from SVNLogDetail where SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths)) \
+                         and SVNAuthors.id = SVNLog.authorid order by SVNLog.revno ASC')
 
         lastcommitdate = None
         revnolist = []
@@ -1015,8 +1097,7 @@ class SVNStats(object):
                 if(author not in authset):
                     author = 'others'
                 authlist.append(author)
-                timediff = commitdate - lastcommitdate
-                hrs = timediff.days * 24 + timediff.seconds / 3600.0
+                hrs = (commitdate - lastcommitdate) / 3600.0
                 timedeltalist.append(hrs)
             lastcommitdate = commitdate
 
@@ -1038,14 +1119,11 @@ class SVNStats(object):
         # get head revision
         # check if SVNLogDetailVw is updated. If yes, use the 'search_view'
         # query
-        self.cur.execute('select count(*) from SVNLogDetailVw')
+        self.cur.execute('select count(*) from SVNLogDetail')
 
         logdetailcount = self.cur.fetchone()[0]
         if logdetailcount > 0:
-            self.cur.execute('select min(revno), max(revno), count(*) from \
-                              (select search_view.revno as revno from search_view,SVNLogDetailVw \
-                                 where search_view.revno == SVNLogDetailVw.revno and \
-                                 SVNLogDetailVw.changedpath like ? group by search_view.revno)', (self.sqlsearchpath,))
+            self.cur.execute('select min(revno), max(revno), count(*) from search_view')
         else:
             self.cur.execute(
                 'select min(revno), max(revno), count(*) from SVNLog')
@@ -1058,29 +1136,28 @@ class SVNStats(object):
         stats['NumRev'] = numrev
         stats['FirstRev'] = firstrev
         # now get first and last revision dates
-        self.cur.execute('select datetime(SVNLog.commitdate,"localtime") as "commitdate [timestamp]" from SVNLog \
-                        where SVNLog.revno = ?', (firstrev,))
+        localtime = self.__getLocalTimeConverter()
+        self.cur.execute('select SVNLog.commitepoch from SVNLog where SVNLog.revno = ?', (firstrev,))
         row = self.cur.fetchone()
-        stats['FirstRevDate'] = row[0]
-        self.cur.execute('select datetime(SVNLog.commitdate,"localtime") as "commitdate [timestamp]" from SVNLog \
-                        where SVNLog.revno = ?', (lastrev,))
+        stats['FirstRevDate'] = localtime(row[0])
+        self.cur.execute('select SVNLog.commitepoch from SVNLog where SVNLog.revno = ?', (lastrev,))
         row = self.cur.fetchone()
-        stats['LastRevDate'] = row[0]
+        stats['LastRevDate'] = localtime(row[0])
         # get number of unique paths(files) (added and deleted)
-        self.cur.execute('select count(*) from SVNLogDetailVw where SVNLogDetailVw.changetype = "A" \
-                        and SVNLogDetailVw.changedpath like ? and SVNLogDetailVw.pathtype="F"', (self.sqlsearchpath,))
+        self.cur.execute('select count(*) from SVNLogDetail where SVNLogDetail.changetype = "A" \
+                        and SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths) and SVNLogDetail.pathtype="F"')
         row = self.cur.fetchone()
         filesAdded = row[0]
-        self.cur.execute('select count(*) from SVNLogDetailVw where SVNLogDetailVw.changetype = "D" \
-                        and SVNLogDetailVw.changedpath like ? and SVNLogDetailVw.pathtype="F"', (self.sqlsearchpath,))
+        self.cur.execute('select count(*) from SVNLogDetail where SVNLogDetail.changetype = "D" \
+                        and SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths) and SVNLogDetail.pathtype="F"')
         row = self.cur.fetchone()
         filesDeleted = row[0]
         stats['NumFiles'] = filesAdded - filesDeleted
         authors = self.getAuthorList()
         stats['NumAuthors'] = len(authors)
 
-        self.cur.execute("select sum(SVNLogDetailVw.linesadded-SVNLogDetailVw.linesdeleted) \
-                         from SVNLogDetailVw where SVNLogDetailVw.changedpath like ?", (self.sqlsearchpath,))
+        self.cur.execute("select sum(SVNLogDetail.linesadded-SVNLogDetail.linesdeleted) \
+                         from SVNLogDetail where SVNLogDetail.changedpathid IN (SELECT pathid FROM SearchPaths)")
         row = self.cur.fetchone()
         stats['LoC'] = row[0]
         return(stats)
@@ -1089,9 +1166,15 @@ class SVNStats(object):
         '''
         update the file activity as 'temparature' data. Every commit adds 10 degrees. Rate of temperature
         drop is 1 deg/day. The temparature is calculated using the 'newtons law of cooling'
+        New revisions are processed in revision order in chunks of ACTIVITY_CHUNK_REVS revisions. File
+        temperatures are kept in memory and changed rows are written and committed after every chunk.
+        Hence the update continues from the last committed revision (see RevisionActivity) next time.
         '''
         if(getattr(self, '_activity_hotness_updated', False) == False):
             #self._printProgress("updating file hotness table")
+            self.cur.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type='table' and name='ActivityHotness'")
+            bHasActivityHotness = self.cur.fetchone()[0] > 0
             self.cur.execute("CREATE TABLE IF NOT EXISTS ActivityHotness(filepath text, lastrevno integer, \
                              temperature real)")
             self.cur.execute("CREATE TABLE IF NOT EXISTS RevisionActivity(revno integer, \
@@ -1102,75 +1185,98 @@ class SVNStats(object):
                 "CREATE INDEX IF NOT EXISTS ActHotFileIdx On ActivityHotness(filepath ASC)")
             self.cur.execute(
                 "CREATE INDEX IF NOT EXISTS RevActivityIdx On RevisionActivity(revno ASC)")
+            if(bHasActivityHotness == False):
+                # ActivityHotness table is dropped (e.g. after fixing the paths). Hence update all the
+                # revisions again.
+                self.cur.execute("DELETE FROM RevisionActivity")
             self.dbcon.commit()
             self.cur.execute(
-                "select max(ActivityHotness.lastrevno) from ActivityHotness")
+                "select max(RevisionActivity.revno) from RevisionActivity")
             lastrevno = self.cur.fetchone()[0]
             if(lastrevno == None):
                 lastrevno = 0
 
-            # get the valid revision numbers from SVNLog table from lastrevno
-            self.cur.execute(
-                "select revno from SVNLog where revno > ?", (lastrevno,))
-            revnolist = [row[0] for row in self.cur]
-
-            for revno in revnolist:
-                self.cur.execute('select SVNLog.commitdate as "commitdate [timestamp]" from SVNLog \
-                                where SVNLog.revno=?', (revno,))
-                commitdate = self.cur.fetchone()[0]
-                self.cur.execute(
-                    'select changedpath from SVNLogDetailVw where revno=? and pathtype="F"', (revno,))
-                changedpaths = self.cur.fetchall()
-                self._updateRevActivityHotness(revno, commitdate, changedpaths)
+            filestates = None
+            while True:
+                # file changes of the next chunk of revisions (revisions without file changes are
+                # also included with filepath as None)
+                self.cur.execute('select SVNLog.revno, SVNLog.commitdate as "commitdate [timestamp]", SVNPaths.path \
+                            from SVNLog LEFT JOIN SVNLogDetail ON SVNLogDetail.revno=SVNLog.revno and SVNLogDetail.pathtype="F" \
+                            LEFT JOIN SVNPaths ON SVNPaths.id=SVNLogDetail.changedpathid \
+                            where SVNLog.revno IN (select revno from SVNLog where revno > ? order by revno LIMIT ?) \
+                            order by SVNLog.revno, SVNLogDetail.rowid', (lastrevno, ACTIVITY_CHUNK_REVS))
+                changes = self.cur.fetchall()
+                if(len(changes) == 0):
+                    break
+                if(filestates == None):
+                    filestates = self.__getFileActivityStates()
+                lastrevno = self.__updateActivityChunk(changes, filestates)
+                self._printProgress(
+                    "updated file activity hotness table upto revision %d" % lastrevno)
             setattr(self, '_activity_hotness_updated', True)
 
-    def _updateRevActivityHotness(self, revno, commitdate, changedpaths):
-        self._printProgress(
-            "updating file activity hotness table for revision %d" % revno)
+    def __getFileActivityStates(self):
+        '''
+        return the dictionary of filepath -> [temperature, lastrevno, last commit date, stored] of the
+        files in ActivityHotness table
+        '''
+        self.cur.execute('select ActivityHotness.filepath, ActivityHotness.temperature, ActivityHotness.lastrevno, \
+                    SVNLog.commitdate as "commitdate [timestamp]" from ActivityHotness \
+                    LEFT JOIN SVNLog ON SVNLog.revno=ActivityHotness.lastrevno')
+        return(dict([(filepath, [temperature, lastrevno, lastcommitdate, True])
+                     for filepath, temperature, lastrevno, lastcommitdate in self.cur]))
 
+    def __updateActivityChunk(self, changes, filestates):
+        '''
+        update the file temperatures in 'filestates' for the file changes (revno, commitdate, filepath)
+        sorted on revision. Changed files and revision temperatures are stored in ActivityHotness and
+        RevisionActivity tables and committed. Returns the last revision of the chunk.
+        '''
         # NOTE : in some cases where the subversion repository is created by converting it from other version control
         # systems, the dates can become confusing.
-
-        maxrev_temperature = 0.0
-
-        for filepathrow in changedpaths:
-            filepath = filepathrow[0]
-            temperature = TEMPINCREMENT
-            lastrevno = revno
-            self.cur.execute(
-                "select temperature, lastrevno from ActivityHotness where filepath=?", (filepath,))
-            try:
-                row = self.cur.fetchone()
-                temperature = row[0]
-                lastrevno = row[1]
-                # get last commit date
-                self.cur.execute(
-                    'select SVNLog.commitdate as "commitdate [timestamp]" from SVNLog where revno=?', (lastrevno,))
-                lastcommitdate = self.cur.fetchone()[0]
+        revactivity = []
+        changedfiles = set()
+        for revno, commitdate, filepath in changes:
+            if(len(revactivity) == 0 or revactivity[-1][0] != revno):
+                revactivity.append((revno, 0.0))
+            if(filepath == None):
+                continue
+            state = filestates.get(filepath)
+            if(state == None):
+                state = [TEMPINCREMENT, revno, commitdate, False]
+                filestates[filepath] = state
+            else:
                 # now calculate the new temperature.
-                temperature = TEMPINCREMENT + \
+                state[0] = TEMPINCREMENT + \
                     getTemperatureAtTime(
-                        commitdate, lastcommitdate, temperature, COOLINGRATE)
-                self.cur.execute("UPDATE ActivityHotness SET temperature=?, lastrevno=? \
-                                where lastrevno = ? and filepath=?", (temperature, revno, lastrevno, filepath,))
-            except:
-                self.cur.execute("insert into ActivityHotness(temperature, lastrevno, filepath) \
-                                values(?,?,?)", (temperature, revno, filepath))
-            if(temperature > maxrev_temperature):
-                maxrev_temperature = temperature
-
-            logging.debug("updated file %s revno=%d temp=%f" %
-                          (filepath, revno, temperature))
-
-        self.cur.execute(
-            "insert into RevisionActivity(revno, temperature) values(?,?)", (revno, maxrev_temperature))
+                        commitdate, state[2], state[0], COOLINGRATE)
+                state[1] = revno
+                state[2] = commitdate
+            changedfiles.add(filepath)
+            if(state[0] > revactivity[-1][1]):
+                revactivity[-1] = (revno, state[0])
+
+        updates = []
+        inserts = []
+        for filepath in changedfiles:
+            temperature, lastrevno, lastcommitdate, stored = filestates[filepath]
+            if(stored == True):
+                updates.append((temperature, lastrevno, filepath))
+            else:
+                inserts.append((temperature, lastrevno, filepath))
+                filestates[filepath][3] = True
+        self.cur.executemany("UPDATE ActivityHotness SET temperature=?, lastrevno=? where filepath=?", updates)
+        self.cur.executemany("insert into ActivityHotness(temperature, lastrevno, filepath) \
+                                values(?,?,?)", inserts)
+        self.cur.executemany(
+            "insert into RevisionActivity(revno, temperature) values(?,?)", revactivity)
         self.dbcon.commit()
-        return(maxrev_temperature)
+        return(revactivity[-1][0])
 
     def _getAuthActivityDict(self):
         self._updateActivityHotness()
-        self.cur.execute('select SVNLog.author, SVNLog.commitdate as "commitdate [timestamp]" from SVNLog, search_view \
-                    where SVNLog.revno = search_view.revno order by commitdate ASC')
+        self.cur.execute('select SVNAuthors.name, SVNLog.commitdate as "commitdate [timestamp]" from SVNLog, search_view, SVNAuthors \
+                    where SVNLog.revno = search_view.revno and SVNAuthors.id = SVNLog.authorid order by commitdate ASC')
 
         authActivityIdx = dict()
         for author, cmdate in self.cur:
@@ -1196,9 +1302,9 @@ class SVNStats(object):
         return revision activity as maximum temperature at each revision(using the newton's law of cooling)                                                                         
         '''
         self._updateActivityHotness()
-        self.cur.execute('select date(SVNLog.commitdate) as "commitdate [date]", max(RevisionActivity.temperature) \
+        self.cur.execute('select SVNLog.commitday as "commitdate [dayordinal]", max(RevisionActivity.temperature) \
                     from RevisionActivity, SVNLog where SVNLog.revno = RevisionActivity.revno \
-                    group by commitdate order by commitdate ASC')
+                    group by SVNLog.commitepoch order by SVNLog.commitepoch ASC')
         cmdatelist = []
         temperaturelist = []
         lastcommitdate = None
@@ -1226,7 +1332,8 @@ class SVNStats(object):
         '''
         authActivityIdx = self._getAuthActivityDict()
         self.cur.execute(
-            "select SVNLog.author, count(SVNLog.revno) as commitcount from SVNLog,search_view where search_view.revno=SVNLog.revno group by SVNLog.author")
+            "select SVNAuthors.name, count(SVNLog.revno) as commitcount from SVNLog,search_view,SVNAuthors \
+            where search_view.revno=SVNLog.revno and SVNAuthors.id = SVNLog.authorid group by SVNLog.authorid")
         authCloud = []
         for author, commitcount in self.cur:
             activity = authActivityIdx[author]
@@ -1263,8 +1370,8 @@ class SVNStats(object):
         returns list of tuples (filepath, temperature)
         '''
         def _getfilecount(fileparams):
-            self.cur.execute("select count(*) from SVNLogDetailVw where \
-                         changedpath=? group by changedpath", (fileparams[0],))
+            self.cur.execute("select count(*) from SVNLogDetail, SVNPaths where \
+                         SVNPaths.path=? and SVNLogDetail.changedpathid=SVNPaths.id", (fileparams[0],))
             count = self.cur.fetchone()[0]
             return((fileparams[0], fileparams[1], count))
 
@@ -1274,8 +1381,8 @@ class SVNStats(object):
         self.cur.execute("select ActivityHotness.filepath, \
                 getTemperatureAtTime(?,SVNLog.commitdate,ActivityHotness.temperature,?) as hotness \
                 from ActivityHotness,SVNLog \
-                where ActivityHotness.filepath like ? and ActivityHotness.lastrevno=SVNLog.revno \
-                order by hotness DESC LIMIT ?", (curTime, COOLINGRATE, self.sqlsearchpath, numFiles))
+                where ActivityHotness.filepath >= ? and ActivityHotness.filepath < ? and ActivityHotness.lastrevno=SVNLog.revno \
+                order by hotness DESC LIMIT ?", (curTime, COOLINGRATE) + getPathPrefixRange(self.searchpath) + (numFiles,))
         hotfileslist = [(filepath, hotness) for filepath, hotness in self.cur]
         hotfileslist = map(_getfilecount, hotfileslist)
 
@@ -1296,44 +1403,48 @@ class SVNStats(object):
         # row. These row ids will be used by subsquent queries to calculate the difference between
         # two rows.
 
-        author_filter_view = '''CREATE TEMP VIEW IF NOT EXISTS '%(author)s_view' AS
+        author_filter_view = '''CREATE TEMP VIEW IF NOT EXISTS Author%(authorid)d_view AS
                 select (select COUNT(0)
                 from SVNLog log_a
-                where log_a.revno >= log_b.revno and log_a.author = '%(author)s'
-                ) as rownum,  log_b.* from SVNLog log_b where log_b.author='%(author)s'
-                ORDER by log_b.commitdate ASC'''
+                where log_a.revno >= log_b.revno and log_a.authorid = %(authorid)d
+                ) as rownum,  log_b.* from SVNLog log_b where log_b.authorid=%(authorid)d
+                ORDER by log_b.commitepoch ASC'''
 
-        stddev_query = "select deltastddev(julianday(SVNLog.commitdate)) from SVNLog where SVNLog.author= ? \
-                    order by SVNLog.commitdate"
+        stddev_query = "select deltastddev(SVNLog.commitepoch / 86400.0) from SVNLog where SVNLog.authorid= ? \
+                    order by SVNLog.commitepoch"
 
-        author_filter_query = '''SELECT * FROM '%(author)s_view' ORDER by commitdate ASC'''
+        author_filter_query = '''SELECT * FROM Author%(authorid)d_view ORDER by commitepoch ASC'''
+        startday = None
 
         if months != None:
-            author_filter_query = '''SELECT * FROM '%(author)s_view'
-                WHERE date('%(endDate)s', '-%(months)s month') < commitdate
-                ORDER by commitdate ASC'''
+            startday = self.__getDayBeforeEndDate(months)
+            author_filter_query = '''SELECT * FROM Author%(authorid)d_view
+                WHERE commitday >= %(startday)d
+                ORDER by commitepoch ASC'''
 
-            stddev_query = "select deltastddev(julianday(SVNLog.commitdate)) from SVNLog where SVNLog.author= ? \
-                    and date('%s', '-%d month') < SVNLog.commitdate \
-                    order by SVNLog.commitdate" % (self.__endDate, months)
+            stddev_query = "select deltastddev(SVNLog.commitepoch / 86400.0) from SVNLog where SVNLog.authorid= ? \
+                    and SVNLog.commitday >= %d \
+                    order by SVNLog.commitepoch" % startday
 
-        avg_query_sql = '''SELECT AVG(IFNULL(julianday(SVNLog_B.commitdate) - julianday(SVNLog_A.commitdate), 0)) 
+        avg_query_sql = '''SELECT AVG(IFNULL((SVNLog_B.commitepoch - SVNLog_A.commitepoch) / 86400.0, 0)) 
                     FROM (%(auth_query)s) as SVNLog_A 
                     LEFT OUTER JOIN (%(auth_query)s) as SVNLog_B ON SVNLog_A.rownum= (SVNLog_B.rownum+1)
                     order by SVNLog_A.rownum'''
 
         for auth in authList:
-            auth_query = author_filter_view % {
-                'author': auth, 'endDate': self.__endDate, 'months': months}
+            authorid = self.__getAuthorId(auth)
+            if(authorid == None):
+                continue
+            auth_query = author_filter_view % {'authorid': authorid}
             self.cur.execute(auth_query)
 
             auth_query = author_filter_query % {
-                'author': auth, 'endDate': self.__endDate, 'months': months}
+                'authorid': authorid, 'startday': startday}
             avg_query = avg_query_sql % {'auth_query': auth_query}
             self.cur.execute(avg_query)
 
             avg, = self.cur.fetchone()
-            self.cur.execute(stddev_query, (auth,))
+            self.cur.execute(stddev_query, (authorid,))
             stddev, = self.cur.fetchone()
             if(avg != None and stddev != None):
                 finalAuthList.append(auth)
@@ -1370,11 +1481,12 @@ class SVNStats(object):
 
         for auth in authList:
             self.cur.execute(
-                'select SVNLog.commitdate from SVNLog where SVNLog.author= ? order by SVNLog.commitdate', (auth,))
+                'select SVNLog.commitepoch from SVNLog where SVNLog.authorid= ? order by SVNLog.commitepoch',
+                (self.__getAuthorId(auth),))
             prevval = None
             for cmdate, in self.cur:
                 if(prevval != None):
-                    deltaval = timedelta2days(cmdate - prevval)
+                    deltaval = (cmdate - prevval) / 86400.0
                     if(deltaval <= maxVal):
                         deltaList.append((deltaval))
                 prevval = cmdate
@@ -1388,7 +1500,7 @@ class SVNStats(object):
         plot daily commit count graph.
         '''
         self.cur.execute(
-            'select date(commitdate,"localtime") as "cmdate [date]", count(revno) from SVNLog group by "cmdate [date]" order by "cmdate [date]" ASC')
+            'select commitday as "cmdate [dayordinal]", sum(commits) from SVNDailyCommits group by commitday order by commitday ASC')
 
         datelist = []
         commitcountlist = []
@@ -0,0 +1,102 @@
+'''
+svnxmllogiter.py
+Copyright (C) 2009 Nitin Bhide (nitinbhide@gmail.com)
+
+This module is part of SVNPlot (http://code.google.com/p/svnplot) and is released under
+the New BSD License: http://www.opensource.org/licenses/bsd-license.php
+--------------------------------------------------------------------------------------
+
+Iterator over the revisions in the output of 'svn log --xml -v' command. This allows
+creating the svnlog database from a log fetched earlier (e.g. outside business hours), without
+connecting to the repository. The xml is parsed incrementally and each 'logentry' element is
+cleared after it is processed, so memory usage doesnot depend on the size of log.
+
+xml log contains only the revision metadata. Line counts are not available and have to be
+updated later. Path types which are not available in the log are also resolved during the line count update.
+'''
+
+import logging
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
+from svnofflinelog import SVNOfflineRevLog
+from util import *
+
+
+class SVNXmlLogIter(object):
+
+    '''
+    iterate over the 'logentry' elements of 'svn log --xml -v' output. Returns SVNOfflineRevLog
+    objects in the order of log entries in the file.
+    xmlfile - file object (or path of xml file, can be gzip compressed)
+    '''
+
+    def __init__(self, xmlfile):
+        if(isinstance(xmlfile, basestring)):
+            xmlfile = openinputfile(xmlfile)
+        self.xmlfile = xmlfile
+
+    def __iter__(self):
+        return(self.next())
+
+    def next(self):
+        root = None
+        for event, elem in ElementTree.iterparse(self.xmlfile, events=('start', 'end')):
+            if(event == 'start'):
+                if(root == None):
+                    root = elem
+            elif(elem.tag == 'logentry'):
+                revlog = self.__getRevLog(elem)
+                # free the memory used by processed log entries.
+                elem.clear()
+                root.clear()
+                yield revlog
+
+    def __getRevLog(self, logentry):
+        revno = int(logentry.get('revision'))
+        author = logentry.findtext('author')
+        date = logentry.findtext('date')
+        if(date != None):
+            date = svndate2seconds(date)
+        msg = logentry.findtext('msg', u'')
+
+        changed_paths = []
+        for pathelem in logentry.iterfind('paths/path'):
+            copyfrom_rev = pathelem.get('copyfrom-rev')
+            if(copyfrom_rev != None):
+                copyfrom_rev = int(copyfrom_rev)
+            changed_paths.append(dict(path=pathelem.text.strip(), action=pathelem.get('action'),
+                                      copyfrom_path=pathelem.get('copyfrom-path'), copyfrom_revision=copyfrom_rev,
+                                      pathtype=self.__getPathType(pathelem.get('kind'))))
+        self.__updateUnknownPathTypes(revno, changed_paths)
+        for change in changed_paths:
+            if(change['pathtype'] == 'D' and not change['path'].endswith('/')):
+                change['path'] = change['path'] + u'/'
+        return(SVNOfflineRevLog(revno, author, date, msg, changed_paths))
+
+    def __getPathType(self, kind):
+        pathtype = None
+        if(kind == 'file'):
+            pathtype = 'F'
+        elif(kind == 'dir'):
+            pathtype = 'D'
+        return(pathtype)
+
+    def __updateUnknownPathTypes(self, revno, changed_paths):
+        '''
+        older subversion servers donot return the 'kind' attribute. In such case, treat the
+        path as directory if other changed paths in the revision are inside this path. Otherwise
+        the path type is left unknown (None) and it is checked with the repository when the line
+        counts are updated.
+        '''
+        unknown = [change for change in changed_paths if change['pathtype'] == None]
+        if(len(unknown) > 0):
+            logging.debug("path kind not available for %d paths in revision %d" % (len(unknown), revno))
+            for change in unknown:
+                dirpath = change['path'].rstrip('/') + '/'
+                for other in changed_paths:
+                    if(other['path'].startswith(dirpath)):
+                        change['pathtype'] = 'D'
+                        break
@@ -9,13 +9,26 @@ various utility functions used by other stats classes
 '''
 
 import logging
+import sys
 import itertools
 import os.path
 import re
 import time
 import datetime
+import calendar
+import gzip
+from operator import itemgetter
+
+try:
+    import pytz
+except ImportError:
+    # time zone names (e.g. 'Europe/Paris') require pytz. 'local', 'UTC' and fixed offsets
+    # (e.g. '+05:30') are supported without it.
+    pytz = None
 
 URL_NORM_RE = re.compile('[/]+')
+TIMEZONE_OFFSET_RE = re.compile('^(?:UTC|GMT)?([+-])(\d{1,2}):?(\d\d)?$')
+GZIP_MAGIC = '\x1f\x8b'
 
 
 def filetype(path):
@@ -99,6 +112,170 @@ def seconds2datetime(seconds):
     return(datetime.datetime(gmt.tm_year, gmt.tm_mon, gmt.tm_mday, gmt.tm_hour, gmt.tm_min, gmt.tm_sec))
 
 
+def datetime2seconds(dt):
+    '''
+    convert the UTC datetime (e.g. returned by seconds2datetime) to seconds since epoch
+    '''
+    return(calendar.timegm(dt.utctimetuple()))
+
+
+def localtimeconverter(timezone='local'):
+    '''
+    return a function converting the seconds since epoch to the local time (datetime without tzinfo)
+    in the given time zone. timezone can be 'local' (time zone of this computer), 'UTC', an offset
+    from UTC (e.g. '+05:30', 'UTC-8') or a time zone name (e.g. 'Europe/Paris', requires pytz).
+    '''
+    if(timezone == None or timezone == 'local'):
+        return(lambda seconds: datetime.datetime(*time.localtime(seconds)[:6]))
+    if(timezone == 'UTC' or timezone == 'GMT'):
+        return(seconds2datetime)
+    match = TIMEZONE_OFFSET_RE.match(timezone)
+    if(match != None):
+        sign, hours, minutes = match.groups()
+        offset = (int(hours) * 60 + int(minutes or 0)) * 60
+        if(sign == '-'):
+            offset = -offset
+        return(lambda seconds: seconds2datetime(seconds + offset))
+    if(pytz == None):
+        raise ValueError, "time zone name '%s' requires pytz module" % timezone
+    tzinfo = pytz.timezone(timezone)
+    return(lambda seconds: datetime.datetime.fromtimestamp(seconds, tzinfo).replace(tzinfo=None))
+
+
+def localtimefields(localtime):
+    '''
+    return (day number, weekday, hour) of the local time. Day number is the date ordinal (see
+    datetime.date.toordinal) and weekday is 0 for Sunday (same as sqlite strftime('%w'))
+    '''
+    return((localtime.toordinal(), localtime.isoweekday() % 7, localtime.hour))
+
+
+def countlines(contents):
+    '''
+    count the lines in the file contents (byte string) without decoding or splitting the lines.
+    The count is same as len(file.readlines()), i.e. number of newline characters plus one if the
+    last line is not terminated by the newline character.
+    '''
+    linecount = 0
+    if(contents):
+        linecount = contents.count('\n')
+        if(not contents.endswith('\n')):
+            linecount = linecount + 1
+    return(linecount)
+
+
+def openinputfile(filepath):
+    '''
+    open the input file (e.g. dump file) for reading. Gzip compressed files are detected from the
+    file contents. '-' means read from the standard input.
+    '''
+    if(filepath == '-'):
+        return(sys.stdin)
+    infile = open(filepath, 'rb')
+    magic = infile.read(2)
+    infile.seek(0)
+    if(magic == GZIP_MAGIC):
+        infile = gzip.GzipFile(fileobj=infile, mode='rb')
+    return(infile)
+
+
+def svndate2seconds(datestr):
+    '''
+    convert the subversion date string (e.g. svn:date property value or 'date' from svn log xml
+    output 2010-01-02T10:20:30.123456Z) to seconds since epoch
+    '''
+    datestr = datestr.strip().rstrip('Z')
+    datestr, dot, fraction = datestr.partition('.')
+    seconds = calendar.timegm(time.strptime(datestr, '%Y-%m-%dT%H:%M:%S'))
+    if(fraction):
+        seconds = seconds + float('0.' + fraction)
+    return(seconds)
+
+
+def isTextMimeType(fmimetype):
+    '''
+    check if the mime-type is a text mime-type based on the standard svn text file logic.
+    '''
+    textMimeType = False
+    if(fmimetype.startswith('text/') or fmimetype == 'image/x-xbitmap' or fmimetype == 'image/x-xpixmap'):
+        textMimeType = True
+    return(textMimeType)
+
+
+# svn error codes which mean path doesnot exist at the given revision. (e.g. SVN_ERR_FS_NOT_FOUND,
+# SVN_ERR_RA_ILLEGAL_URL, SVN_ERR_RA_DAV_PATH_NOT_FOUND, SVN_ERR_CLIENT_UNRELATED_RESOURCES)
+SVN_PATH_NOT_FOUND_ERRCODES = (160013, 170000, 175007, 195012)
+
+
+def isPathNotFoundError(exp):
+    '''
+    check if the pysvn.ClientError is because path doesnot exist in the repository.
+    (exception_style of pysvn client is 1)
+    '''
+    notfound = False
+    if(len(exp.args) > 1):
+        for errmsg, code in exp.args[1]:
+            if(code in SVN_PATH_NOT_FOUND_ERRCODES):
+                notfound = True
+    return(notfound)
+
+
+def binaryexttuple(binextlist):
+    '''
+    convert the list of binary file extensions (without '.') to tuple of extensions which
+    can be used with str.endswith for lower and upper case extensions.
+    '''
+    binaryextlist = []
+    for binext in binextlist:
+        binext = binext.strip()
+        binext = u'.' + binext
+        binaryextlist.append(binext)
+        binext = binext.upper()
+        binaryextlist.append(binext)
+    return(tuple(binaryextlist))
+
+
+def updateCopyFromPaths(changed_paths):
+    '''
+    If you create a branch/tag from the working copy and working copy has 'deleted files or directories.
+    In this case, just lower revision number is not going to have that file in the same path and hence
+    we will get 'unknown node kind' error. Hence we have to update the 'copy from path' and 'copy
+    from revision' entries to the changed_path entries.
+    changed_paths is list of dictionaries with 'action', 'path', 'copyfrom_path' and 'copyfrom_revision'
+    keys (i.e. same as the changed_paths entries of pysvn log)
+    Check Issue 44.
+    '''
+    # First check if there are any additions with 'copy_from'
+    copyfrom = [(change['path'], change['copyfrom_path'], change['copyfrom_revision'])
+                for change in changed_paths
+                if(change['copyfrom_path'] != None and len(change['copyfrom_path']) > 0)]
+
+    if(len(copyfrom) > 0):
+        copyfrom = sorted(copyfrom, key=itemgetter(0), reverse=True)
+
+        for change in changed_paths:
+            # check other modified or deleted paths (i.e. all actions other
+            # than add)
+            if(change['action'] != 'A'):
+                curfilepath = change['path']
+                for curpath, copyfrompath, copyfromrev in copyfrom:
+                    # change the curpath to 'directory name'. otherwise it doesnot make sense to add a copy path entry
+                    # for example 'curpath' /trunk/xxx and there is also a deleted entry called '/trunk/xxxyyy'. then in such
+                    # case don't replace the 'copyfrom_path'. replace it
+                    # only if entry is '/trunk/xxx/yyy'
+                    if(not curpath.endswith('/')):
+                        curpath = curpath + '/'
+                    if(curfilepath.startswith(curpath) and change['copyfrom_path'] is None):
+                        # make sure that copyfrom path also ends with '/' since we are replacing directories
+                        # curpath ends with '/'
+                        if(not copyfrompath.endswith('/')):
+                            copyfrompath = copyfrompath + '/'
+                        assert(change['copyfrom_revision'] is None)
+                        change['copyfrom_path'] = normurlpath(
+                            curfilepath.replace(curpath, copyfrompath, 1))
+                        change['copyfrom_revision'] = copyfromrev
+
+
 def makeunicode(s):
     uns = s
 